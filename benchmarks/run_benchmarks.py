@@ -0,0 +1,284 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmarks for every workflow under config/workflows/.
+
+Runs IntelligenceCrew and WargamesCrew against the deterministic fake chat model and
+fake search / database tools, so no network access or API key is needed, and reports:
+config load and crew setup time, orchestration overhead per task (wall time minus
+model and tool time), peak memory (tracemalloc) and throughput under N concurrent runs.
+Each workflow gets one untimed warm-up repetition (lazy imports, client pool, thread
+pool), then --repeat timed repetitions whose median is reported.
+
+    python benchmarks/run_benchmarks.py                      # compare with benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --update-baseline    # store the current numbers as the baseline
+
+Exits with status 1 when a metric leaves its tolerance band (TOLERANCE_BANDS) around the baseline.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+TOPIC = "What is the likelihood of a military confrontation between Greece and Turkey in the coming month?"
+WARGAME_ACTION = "Impose targeted economic sanctions and move naval assets to the region."
+# רצועת הסבילות של כל מדד מול ה-baseline: (יחסית, מוחלטת). מדדי הזמן הקצרים רועשים בכמה מילישניות
+# בין ריצות, והזיכרון והתפוקה תלויים במכונה, אז סטייה קטנה בתוך הרצועה אינה נחשבת לרגרסיה
+TOLERANCE_BANDS = {
+    "config_load_ms": (0.5, 5.0),
+    "crew_setup_ms": (0.5, 5.0),
+    "overhead_per_task_ms": (0.5, 10.0),
+    "peak_memory_mb": (0.25, 0.5),
+    "throughput_runs_per_s": (0.3, 0.0),
+}
+# מדדים שבהם נמוך יותר = גרוע יותר; בכל השאר גבוה יותר = גרוע יותר
+HIGHER_IS_BETTER = ("throughput_runs_per_s",)
+
+
+def configure_environment(args):
+    """Must run before decisioncrew is imported: fake model, no disk caches, run memo, evidence store or metric files, quiet console."""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    os.environ["MODEL_NAME"] = "fake-benchmark"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["FAKE_LLM_TOKENS"] = str(args.llm_tokens)
+    os.environ["FAKE_LLM_TOOL_CALLS"] = "1"
+    os.environ["CREW_VERBOSE"] = "0"
+    os.environ["CREW_METRICS"] = "0"
+    os.environ["EVIDENCE_STORE"] = "0"
+    # כל ריצה מודדת הרצה מלאה - בלי memo של ריצות זהות
+    os.environ["CREW_RUN_MEMO_TTL"] = "0"
+    os.environ.pop("LLM_CACHE_PATH", None)
+
+
+def register_fake_tools(tool_latency: float):
+    """Replaces the network and database tools with deterministic fakes of the same names."""
+    from decisioncrew.tools.registry import register_tool
+    from decisioncrew.tools.search_cache import cached_tool
+    from decisioncrew.runtime.metrics import time_tool
+    try:
+        from crewai.tools import tool
+    except ImportError:
+        from crewai_tools import tool
+
+    def make_search_tool(tool_name):
+        def factory():
+            @tool(tool_name)
+            def fake_search(search_query: str) -> str:
+                """Searches the web (offline benchmark fake)."""
+                time.sleep(tool_latency)
+                return "\n".join(f"Result {i}: {search_query} - reported by source {i} (B2)" for i in range(5))
+            # דרך שכבת ה-SearchCache, כמו הכלים האמיתיים
+            return cached_tool(fake_search)
+        return factory
+
+    def make_db_tool(tool_name, argument):
+        def factory():
+            if argument:
+                @tool(tool_name)
+                def fake_db(sql_query: str) -> str:
+                    """Runs a read-only query on the internal database (offline benchmark fake)."""
+                    with time_tool(tool_name):
+                        time.sleep(tool_latency)
+                        return "country | year | events\nGreece | 2023 | 12\nTurkey | 2023 | 17"
+                return fake_db
+
+            @tool(tool_name)
+            def fake_schema() -> str:
+                """Lists the internal database tables (offline benchmark fake)."""
+                with time_tool(tool_name):
+                    return "events(country, year, events)"
+            return fake_schema
+        return factory
+
+    register_tool("serper_dev_tool", make_search_tool("serper_dev_tool"), override=True)
+    register_tool("website_search_tool", make_search_tool("website_search_tool"), override=True)
+    register_tool("db_query_tool", make_db_tool("db_query_tool", argument=True), override=True)
+    register_tool("db_schema_tool", make_db_tool("db_schema_tool", argument=False), override=True)
+
+
+def workflow_names():
+    workflows_dir = os.path.join("config", "workflows")
+    return sorted(name for name in os.listdir(workflows_dir) if os.path.isdir(os.path.join(workflows_dir, name)))
+
+
+def make_crew(workflow_name):
+    from decisioncrew.crews.intelligence_crew import IntelligenceCrew
+    from decisioncrew.crews.wargames_crew import WargamesCrew
+    return WargamesCrew() if workflow_name == "wargames" else IntelligenceCrew(workflow_name=workflow_name)
+
+
+def run_crew(crew):
+    if crew.workflow_name == "wargames":
+        result = crew.run(intelligence_context=f"Intelligence briefing.\n{TOPIC}\n" * 40, user_action=WARGAME_ACTION)
+    else:
+        result = crew.run(topic=TOPIC)
+    if str(result).startswith("An error occurred"):
+        raise RuntimeError(str(result))
+    return crew.run_metrics
+
+
+def measure_once(workflow_name, args) -> dict:
+    """One repetition: cold config load, crew setup, one run for overhead, one traced run for memory, and N concurrent runs."""
+    from decisioncrew.crews.registry import workflow_registry
+    from decisioncrew.crews.context_budget import get_compactor
+    from decisioncrew.tools.search_cache import search_cache
+
+    # טעינה קרה של התצורה (ללא המטמון של ה-registry)
+    workflow_registry.invalidate(workflow_name)
+    started = time.perf_counter()
+    workflow_registry.get(workflow_name)
+    config_load = time.perf_counter() - started
+
+    crew = make_crew(workflow_name)
+    started = time.perf_counter()
+    if workflow_name == "wargames":
+        crew.setup_crew("Intelligence briefing.", WARGAME_ACTION)
+    else:
+        crew.setup_crew(TOPIC)
+    crew_setup = time.perf_counter() - started
+
+    # ריצה אחת למדידת תקורה ואחת למדידת זיכרון (tracemalloc מאט את הריצה), בלי מטמונים חמים מהריצה הקודמת
+    search_cache.clear()
+    get_compactor()._summaries.clear()
+    metrics = run_crew(make_crew(workflow_name))
+    search_cache.clear()
+    get_compactor()._summaries.clear()
+    tracemalloc.start()
+    run_crew(make_crew(workflow_name))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    record = metrics.to_dict()
+    model_seconds = sum(stats["latency"] for stats in record["agents"].values())
+    tool_seconds = sum(stats["seconds"] for stats in record["tools"].values())
+    task_runs = sum(stats["runs"] for stats in record["tasks"].values()) or 1
+    overhead = max(0.0, record["seconds"] - model_seconds - tool_seconds) / task_runs
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda _: run_crew(make_crew(workflow_name)), range(args.runs)))
+    throughput = args.runs / (time.perf_counter() - started)
+
+    return {
+        "config_load_ms": config_load * 1000,
+        "crew_setup_ms": crew_setup * 1000,
+        "overhead_per_task_ms": overhead * 1000,
+        "peak_memory_mb": peak / 1024 / 1024,
+        "throughput_runs_per_s": throughput,
+        "tasks": task_runs,
+        "llm_calls": sum(stats["calls"] for stats in record["agents"].values()),
+        "tool_calls": sum(stats["calls"] for stats in record["tools"].values()),
+    }
+
+
+def benchmark_workflow(workflow_name, args) -> dict:
+    """Median of --repeat repetitions, after an untimed warm-up repetition."""
+    # חזרת חימום שלא נספרת: ייבוא עצל (crewai, pandas, הכלים), יצירת הלקוחות במאגר וה-thread pool
+    measure_once(workflow_name, args)
+    samples = [measure_once(workflow_name, args) for _ in range(args.repeat)]
+    result = {}
+    for metric in samples[0]:
+        value = statistics.median(sample[metric] for sample in samples)
+        result[metric] = round(value, 3 if metric == "throughput_runs_per_s" else 2)
+    return result
+
+
+def compare(results, baseline, scale: float = 1.0):
+    """Returns a list of regression messages; a metric regresses only when it leaves its tolerance band (TOLERANCE_BANDS, times scale)."""
+    regressions = []
+    for workflow_name, metrics in results["workflows"].items():
+        reference = baseline.get("workflows", {}).get(workflow_name)
+        if not reference:
+            continue
+        for metric, (relative, absolute) in TOLERANCE_BANDS.items():
+            if metric not in reference:
+                continue
+            band = f"{relative * scale:.0%} + {absolute * scale:g}"
+            if metric in HIGHER_IS_BETTER:
+                limit = reference[metric] * (1 - relative * scale) - absolute * scale
+                if metrics[metric] < limit:
+                    regressions.append(f"{workflow_name}.{metric}: {metrics[metric]} < baseline {reference[metric]} (-{band})")
+            else:
+                limit = reference[metric] * (1 + relative * scale) + absolute * scale
+                if metrics[metric] > limit:
+                    regressions.append(f"{workflow_name}.{metric}: {metrics[metric]} > baseline {reference[metric]} (+{band})")
+        for metric in ("tasks", "llm_calls", "tool_calls"):
+            if metric in reference and metrics[metric] != reference[metric]:
+                print(f"Warning: {workflow_name}.{metric} is {metrics[metric]} but the baseline has {reference[metric]}; "
+                      f"re-record the baseline if the workflow changed.")
+    return regressions
+
+
+def print_table(results):
+    columns = ("config_load_ms", "crew_setup_ms", "overhead_per_task_ms", "peak_memory_mb", "throughput_runs_per_s",
+               "tasks", "llm_calls", "tool_calls")
+    print(f"{'workflow':<12}" + "".join(f"{column:>24}" for column in columns))
+    for workflow_name, metrics in results["workflows"].items():
+        print(f"{workflow_name:<12}" + "".join(f"{metrics[column]:>24}" for column in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline DecisionCrew benchmarks with a fake LLM and fake tools.")
+    parser.add_argument("--workflows", nargs="*", help="Workflows to run (default: every directory in config/workflows).")
+    parser.add_argument("--runs", type=int, default=8, help="Runs per workflow for the throughput measurement.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent runs for the throughput measurement.")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Fake model latency per call, in seconds.")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="Fake model completion length, in tokens.")
+    parser.add_argument("--tool-latency", type=float, default=0.01, help="Fake tool latency per call, in seconds.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per workflow; the median is reported.")
+    parser.add_argument("--tolerance-scale", type=float, default=1.0,
+                        help="Multiplies every tolerance band in TOLERANCE_BANDS (e.g. 2 on a noisy CI machine).")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    configure_environment(args)
+    register_fake_tools(args.tool_latency)
+
+    results = {
+        "settings": {key: getattr(args, key) for key in ("runs", "concurrency", "repeat", "llm_latency", "llm_tokens", "tool_latency")},
+        "python": sys.version.split()[0],
+        "workflows": {},
+    }
+    for workflow_name in args.workflows or workflow_names():
+        print(f"Benchmarking '{workflow_name}'...")
+        results["workflows"][workflow_name] = benchmark_workflow(workflow_name, args)
+    print()
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != results["settings"]:
+        print("\nWarning: the baseline was recorded with different settings; comparison may not be meaningful.")
+    regressions = compare(results, baseline, args.tolerance_scale)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# decisioncrew/batch.py
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+DEFAULT_WORKFLOW = "osint"
+DEFAULT_BATCH_WORKERS = 4
+
+
+def row_id(row: dict) -> str:
+    """The row's 'id', or a stable hash of its workflow, topic and CSV path so re-runs recognise it."""
+    if row.get("id") not in (None, ""):
+        return str(row["id"])
+    key = f"{row.get('workflow') or ''}\n{row.get('topic') or ''}"
+    if row.get("csv"):
+        # אותה שאלה על קבצי נתונים שונים היא שורות שונות
+        key += f"\n{row['csv']}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def read_rows(path: str, default_workflow: str = DEFAULT_WORKFLOW):
+    """
+    Yields the KIRs of a JSONL or CSV file as dicts with 'id', 'topic', 'workflow' and
+    an optional 'csv' (path to a data file for the 'combined' workflow). 'kir' is
+    accepted as an alias for 'topic'.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for number, record in enumerate(records, start=1):
+            topic = (record.get("topic") or record.get("kir") or "").strip()
+            if not topic:
+                print(f"Warning: row {number} of '{path}' has no topic. Skipping.")
+                continue
+            row = {
+                "topic": topic,
+                "workflow": (record.get("workflow") or default_workflow).strip(),
+                "csv": record.get("csv") or None,
+                "id": record.get("id"),
+            }
+            row["id"] = row_id(row)
+            yield row
+
+
+def completed_ids(output_path: str, retry_failed: bool = True) -> set:
+    """Ids already in the output file. A torn last line (crash while writing) is ignored."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(record.get("id"))
+    return done
+
+
+def _truncate_torn_tail(output_path: str):
+    """Cuts a partial last record (crash while writing), so the next append starts on a line of its own."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # מחפשים אחורה את סוף השורה השלמה האחרונה
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            position -= step
+            f.seek(position)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def _init_worker(workers: int = 1):
+    # כל תהליך טוען את משתני הסביבה בעצמו (גם ב-spawn של Windows)
+    load_dotenv()
+    # מגבלות הקצב של ה-LLM הן לתהליך, לכן מחלקים את המכסה בין תהליכי ה-batch
+    for name in ("LLM_RPM", "LLM_TPM"):
+        if os.getenv(name):
+            os.environ[name] = str(float(os.environ[name]) / workers)
+
+
+def run_row(row: dict) -> dict:
+    """Runs one KIR in a worker process and returns its output record."""
+    from decisioncrew.crews.intelligence_crew import IntelligenceCrew
+    from decisioncrew.llm.limiter import priority_lane
+
+    started = time.perf_counter()
+    record = {"id": row["id"], "workflow": row["workflow"], "topic": row["topic"]}
+    try:
+        topic, csv_index = row["topic"], None
+        if row.get("csv"):
+            from decisioncrew.ingest.csv_profiler import profile_csv
+            from decisioncrew.tools.csv_index import CsvIndex
+            # אותו קונטקסט שה-UI בונה לקובץ CSV שהועלה
+            topic = f"{topic}\n\n{profile_csv(row['csv']).to_context()}"
+            csv_index = CsvIndex.build(row["csv"], name=os.path.basename(row["csv"]))
+        with priority_lane("batch"):
+            result = str(IntelligenceCrew(workflow_name=row["workflow"], csv_index=csv_index).run(topic=topic))
+        if result.startswith("An error occurred"):
+            record.update(status="error", error=result)
+        else:
+            record.update(status="ok", result=result)
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["seconds"] = round(time.perf_counter() - started, 2)
+    record["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return record
+
+
+def run_batch(input_path: str, output_path: str, workflow: str = DEFAULT_WORKFLOW, workers: int = None,
+              retry_failed: bool = True) -> dict:
+    """
+    Runs every pending row of input_path on a process pool of at most 'workers'
+    processes, appending each record to output_path as soon as its row finishes.
+    Returns counts of ok / error / skipped rows.
+    """
+    if workers is None:
+        workers = int(os.getenv("CREW_BATCH_WORKERS", DEFAULT_BATCH_WORKERS))
+    done = completed_ids(output_path, retry_failed)
+    rows, skipped, seen = [], 0, set()
+    for row in read_rows(input_path, workflow):
+        if row["id"] in done or row["id"] in seen:
+            skipped += 1
+            continue
+        seen.add(row["id"])
+        rows.append(row)
+    counts = {"ok": 0, "error": 0, "skipped": skipped}
+    print(f"--- DecisionCrew batch: {len(rows)} rows to run, {skipped} skipped (already done or duplicate), {workers} workers ---")
+    if not rows:
+        return counts
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # השורה שנקטעה לא נספרה כהושלמה ב-completed_ids, כך שהיא תרוץ שוב
+    _truncate_torn_tail(output_path)
+    pending = iter(rows)
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+        # לא שולחים את כל השורות מראש - רק כמה שממתינות לכל תהליך, כדי ש-Ctrl+C יעצור מהר
+        running = {}
+
+        def fill():
+            while len(running) < workers * 2:
+                row = next(pending, None)
+                if row is None:
+                    return
+                running[pool.submit(run_row, row)] = row
+
+        fill()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row = running.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # התהליך עצמו נפל (למשל חוסר זיכרון) - השורה תנוסה שוב בריצה הבאה
+                    record = {"id": row["id"], "workflow": row["workflow"], "topic": row["topic"],
+                              "status": "error", "error": f"Worker failed: {e}"}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                counts[record["status"]] += 1
+                print(f"[{sum(counts.values()) - skipped}/{len(rows)}] {record['status']}: {row['id']} ({row['workflow']})")
+            fill()
+    return counts
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Runs a file of intelligence requirements through DecisionCrew without the UI.")
+    parser.add_argument("input", help="JSONL or CSV file with a 'topic' (or 'kir') per row, and optional 'id', 'workflow' and 'csv'.")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file the results are appended to. Rows already in it are skipped.")
+    parser.add_argument("-w", "--workflow", default=DEFAULT_WORKFLOW, help=f"Workflow for rows without one (default: {DEFAULT_WORKFLOW}).")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help=f"Maximum number of rows running at once (default: CREW_BATCH_WORKERS or {DEFAULT_BATCH_WORKERS}).")
+    parser.add_argument("--no-retry-failed", action="store_true", help="Also skip rows that failed in an earlier run.")
+    args = parser.parse_args(argv)
+
+    counts = run_batch(args.input, args.output, args.workflow, args.workers, retry_failed=not args.no_retry_failed)
+    print(f"--- Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped ---")
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# decisioncrew/crews/context_budget.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from crewai import Crew
+from pydantic import PrivateAttr
+
+from decisioncrew.crews.scheduler import CONTEXT_SEPARATOR
+from decisioncrew.runtime.metrics import record_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_encoders = {}
+
+COMPACTION_PROMPT = """You compress intelligence material for another analyst who will not see the original.
+Rewrite the material below as a structured summary of at most {max_words} words, in the same language as the material.
+Use these Markdown sections: 'Key Judgments', 'Evidence' (keep source names, URLs and Admiralty grades such as B2), 'Numbers & Dates', 'Open Questions'.
+Keep every concrete fact, figure, probability and named actor that a downstream analyst could need. Drop repetition, methodology narration and filler.
+{purpose}
+--- MATERIAL ---
+{text}
+--- END OF MATERIAL ---"""
+
+
+def count_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    """Counts tokens with tiktoken when available, otherwise estimates ~4 characters per token."""
+    if not text:
+        return 0
+    encoder = _encoders.get(model_name)
+    if encoder is None and tiktoken is not None and model_name not in _encoders:
+        try:
+            try:
+                encoder = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken מוריד את קבצי הקידוד בפעם הראשונה - בלי רשת נסתפקים בהערכה
+            print(f"Warning: tiktoken encoding unavailable ({e}); estimating token counts instead.")
+        _encoders[model_name] = encoder
+    if encoder is None:
+        return max(1, len(text) // 4)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    """Keeps the head and tail of text within roughly max_tokens (fallback when no summary is possible)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(200, max_tokens * 4)
+    marker = "\n\n[... middle of the text omitted to fit the context budget ...]\n\n"
+    head = (max_chars - len(marker)) * 2 // 3
+    tail = max_chars - len(marker) - head
+    return text[:head] + marker + text[-tail:]
+
+
+class ContextCompactor:
+    """
+    Shrinks oversized texts to a token budget with an LLM-written structured summary.
+    Summaries are cached by (text hash, budget), so an upstream output or a briefing that
+    is compacted for several tasks, runs or wargame branches is only summarized once.
+    """
+
+    def __init__(self, llm=None, max_entries: int = 256):
+        self.llm = llm
+        self.max_entries = max_entries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, text: str, max_tokens: int, purpose: str = "") -> str:
+        if not text or max_tokens is None or count_tokens(text) <= max_tokens:
+            return text
+        key = (hashlib.sha256(text.encode('utf-8')).hexdigest(), max_tokens, purpose)
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                record_cache("compaction", hit=True)
+                return self._summaries[key]
+        record_cache("compaction", hit=False)
+
+        summary = None
+        if self.llm is not None:
+            prompt = COMPACTION_PROMPT.format(
+                max_words=max(50, int(max_tokens * 0.7)),
+                purpose=f"The summary will be used for: {purpose}" if purpose else "",
+                text=text,
+            )
+            try:
+                response = self.llm.invoke(prompt)
+                summary = str(getattr(response, 'content', response)).strip()
+            except Exception as e:
+                print(f"Warning: context compaction failed, truncating instead: {e}")
+        # גם סיכום של המודל חייב להיכנס לתקציב
+        summary = truncate_middle(summary or text, max_tokens)
+
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+        return summary
+
+
+def fit_upstream(outputs: dict, max_tokens: int, compactor: ContextCompactor, purpose: str = "") -> dict:
+    """
+    Fits several upstream outputs into one token budget. Outputs that are already small
+    keep their full text; the remaining budget is split evenly between the large ones,
+    which are compacted to their share.
+    """
+    if max_tokens is None:
+        return dict(outputs)
+    sizes = {name: count_tokens(text) for name, text in outputs.items()}
+    if sum(sizes.values()) <= max_tokens:
+        return dict(outputs)
+
+    remaining_budget = max_tokens
+    pending = sorted(outputs, key=sizes.get)
+    shares = {}
+    while pending:
+        share = remaining_budget // len(pending)
+        name = pending[0]
+        if sizes[name] <= share:
+            shares[name] = sizes[name]
+            remaining_budget -= sizes[name]
+            pending.pop(0)
+        else:
+            for name in pending:
+                shares[name] = share
+            break
+
+    return {name: compactor.compact(text, shares[name], purpose) if sizes[name] > shares[name] else text
+            for name, text in outputs.items()}
+
+
+class TaskContextBuilder:
+    """
+    Builds each task's upstream context for the task-graph executor and BudgetedCrew,
+    enforcing the 'max_context_tokens' budgets from tasks.yaml, and records per-task token usage.
+    """
+
+    def __init__(self, tasks_config, compactor: ContextCompactor):
+        self.tasks_config = tasks_config
+        self.compactor = compactor
+        self.usage = {}
+        self._lock = threading.Lock()
+
+    def budget(self, task_name: str):
+        config = self.tasks_config.get(task_name) or {}
+        return config.get('max_context_tokens')
+
+    def build(self, task_name: str, description: str, upstream: dict, separator: str) -> str:
+        upstream = {name: text for name, text in upstream.items() if text}
+        budget = self.budget(task_name)
+        fitted = fit_upstream(upstream, budget, self.compactor, purpose=f"task '{task_name}'")
+        context = separator.join(fitted.values())
+        with self._lock:
+            self.usage[task_name] = {
+                "description_tokens": count_tokens(description),
+                "upstream_tokens": sum(count_tokens(text) for text in upstream.values()),
+                "context_tokens": count_tokens(context),
+                "budget": budget,
+                "compacted": [name for name in upstream if fitted[name] is not upstream[name]],
+            }
+        return context
+
+
+class BudgetedCrew(Crew):
+    """
+    Process.sequential Crew that fits each task's upstream outputs into its
+    'max_context_tokens' budget with a TaskContextBuilder before the task runs,
+    the same way the task-graph executor does.
+    """
+
+    _context_builder: Any = PrivateAttr(default=None)
+    _task_names: dict = PrivateAttr(default_factory=dict)
+
+    def set_context_builder(self, context_builder: TaskContextBuilder, tasks: dict):
+        """tasks is {yaml_name: Task}; the names select each task's budget."""
+        self._context_builder = context_builder
+        self._task_names = {id(task): name for name, task in tasks.items()}
+
+    def _get_context(self, task, task_outputs):
+        context = Crew._get_context(task, task_outputs)
+        name = self._task_names.get(id(task))
+        if not context or name is None or self._context_builder is None or self._context_builder.budget(name) is None:
+            return context
+        if isinstance(task.context, (list, tuple)):
+            upstream = {self._task_names.get(id(upstream_task), str(i)): upstream_task.output.raw
+                        for i, upstream_task in enumerate(task.context) if upstream_task.output is not None}
+        else:
+            # בלי context ב-YAML, Process.sequential מעביר את הפלטים של כל המשימות הקודמות
+            upstream = {f"output {i}": output.raw for i, output in enumerate(task_outputs)}
+        return self._context_builder.build(name, task.description, upstream, CONTEXT_SEPARATOR)
+
+
+_default_compactor = None
+_default_lock = threading.Lock()
+
+
+def get_compactor() -> ContextCompactor:
+    """Process-wide compactor using the pooled default model, so summaries are shared between runs."""
+    global _default_compactor
+    if _default_compactor is None:
+        with _default_lock:
+            if _default_compactor is None:
+                from decisioncrew.llm.pool import get_llm
+                _default_compactor = ContextCompactor(llm=get_llm())
+    return _default_compactor
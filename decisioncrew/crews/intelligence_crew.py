@@ -1,69 +1,91 @@
 # decisioncrew/crews/intelligence_crew.py
 
-import yaml
+import time
+from collections import ChainMap
+from collections.abc import Mapping
 from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
-import os
-
-# Import all tools
-try:
-    # 👇 שימו לב לייבוא המצומצם
-    from decisioncrew.tools.web_tools import (
-        web_search_tool, 
-        website_search_tool, 
-        # news_api_tool - REMOVED
-        # telegram_search_tool - REMOVED
-    )
-    from decisioncrew.tools.database_tools import db_query_tool # מייבא את כלי הדמה
-    # 👇 הסרנו את הייבוא של כלי ה-CSV
-    # from decisioncrew.tools.file_tools import csv_query_tool, inspect_csv_tool 
-except ImportError as e:
-    raise ImportError(f"Could not import tools. Check tool file paths and ensure no errors within them: {e}")
+from decisioncrew.crews.registry import get_workflow
+from decisioncrew.llm.pool import default_model_name, get_agent_llm, get_llm
+from decisioncrew.llm.adapter import as_crew_llm
+from decisioncrew.llm.cache import llm_cache_enabled
+from decisioncrew.crews.scheduler import resolve_execution_mode, resolve_max_workers, run_task_graph, task_output_text
+from decisioncrew.crews.context_budget import BudgetedCrew, TaskContextBuilder, get_compactor
+from decisioncrew.runtime.metrics import console_verbose, current_run, track_run
+from decisioncrew.runtime.checkpoints import TaskCheckpointer, checkpoints_enabled, get_checkpoint_store
+from decisioncrew.runtime.memo import get_run_memo, memo_key, run_memo_enabled
+
+# הכלים נטענים בעצלות - נבנים רק כשסוכן באמת משתמש בהם
+from decisioncrew.tools.registry import tool_registry
+
+def _is_success(result) -> bool:
+    """run() reports failures as an 'An error occurred...' string; those are not memoized."""
+    return not str(result).startswith("An error occurred")
+
 
 class IntelligenceCrew:
-    def __init__(self, workflow_name: str):
+    def __init__(self, workflow_name: str, execution_mode: str = None, max_workers: int = None, csv_index=None,
+                 progress_callback=None, checkpoints: bool = None, llm_cache: bool = None):
         self.workflow_name = workflow_name
-        self.config_path = os.path.join("config", "workflows", self.workflow_name) + os.sep
-        if not os.path.exists(self.config_path):
-             raise FileNotFoundError(f"Workflow configuration directory not found: {self.config_path}")
-             
+        # אינדקס שורות של קובץ CSV שהועלה (CsvIndex), עבור csv_search_tool
+        self.csv_index = csv_index
+        # progress_callback(task_name, output_text) נקרא כשכל משימה מסתיימת (למשל עבור תור העבודות של ה-UI)
+        self.progress_callback = progress_callback
+        # llm_cache=False (או LLM_CACHE_BYPASS) מריץ את כל זרימת העבודה ללא מטמון תשובות ונקודות שמירה
+        self.llm_cache = llm_cache_enabled(workflow_name, llm_cache)
+        # שמירת הפלט של כל משימה, כדי שריצה שנכשלה תמשיך מהמשימה הראשונה שלא הושלמה (CREW_CHECKPOINTS)
+        self.checkpoints = checkpoints_enabled(checkpoints) and self.llm_cache
+        # sequential = Crew רגיל, parallel = הרצת משימות בלתי תלויות במקביל לפי גרף ה-context
+        self.execution_mode = resolve_execution_mode(execution_mode)
+        self.max_workers = resolve_max_workers(max_workers)
         self._load_configs()
-        model_name = os.getenv("MODEL_NAME", "gpt-4o") 
+        model_name = self.model_name = default_model_name()
         try:
-            self.llm = ChatOpenAI(model=model_name)
+            # לקוח משותף מה-pool - לא נוצר מחדש בכל ריצה
+            self.llm = get_llm(model_name)
         except Exception as e:
             raise ValueError(f"Failed to initialize the language model (model: {model_name}). Check API key and configuration. Error: {e}")
 
     def _load_configs(self):
-        """Loads agent and task configuration files from YAML."""
-        agents_file = os.path.join(self.config_path, "agents.yaml")
-        tasks_file = os.path.join(self.config_path, "tasks.yaml")
-        try:
-            with open(agents_file, 'r', encoding='utf-8') as f:
-                self.agents_config = yaml.safe_load(f)
-            with open(tasks_file, 'r', encoding='utf-8') as f:
-                self.tasks_config = yaml.safe_load(f)
-        except FileNotFoundError as e:
-            missing_file = "agents.yaml" if "agents.yaml" in str(e) else "tasks.yaml"
-            raise FileNotFoundError(f"{missing_file} not found for workflow '{self.workflow_name}' in: {self.config_path}") from e
-        except yaml.YAMLError as e:
-             raise ValueError(f"Error parsing YAML file in {self.config_path}: {e}") from e
-        
-        if not self.agents_config:
-             raise ValueError(f"Agents configuration file '{agents_file}' is empty or invalid.")
-        if not self.tasks_config:
-             raise ValueError(f"Tasks configuration file '{tasks_file}' is empty or invalid.")
+        """Loads the compiled agent and task configuration from the workflow registry."""
+        self.workflow = get_workflow(self.workflow_name)
+        self.config_path = self.workflow.config_path
+        self.agents_config = self.workflow.agents_config
+        self.tasks_config = self.workflow.tasks_config
+
+    def _agent_llm(self, agent_name: str, use_cache: bool = True):
+        """
+        Returns the agent's LLM: the model and parameters of its 'llm:' block (with a
+        fallback when it is over its latency SLO), bypassing the response cache if the
+        YAML, the crew or use_cache asks for it.
+        """
+        route = self.workflow.agent_llms.get(agent_name)
+        use_cache = use_cache and self.llm_cache and agent_name not in self.workflow.uncached_agents
+        if route is None and use_cache:
+            return self.llm
+        return get_agent_llm(agent_name, route, self.model_name, use_cache=use_cache)
+
+    def _make_agent(self, name: str, config, agent_tools, use_cache: bool = True):
+        """Creates the crewai Agent for one agents.yaml entry."""
+        return Agent(
+            role=config.get('role', f'Agent {name} Role Missing'), 
+            goal=config.get('goal', f'Agent {name} Goal Missing'),
+            backstory=config.get('backstory', f'Agent {name} Backstory Missing'),
+            allow_delegation=config.get('allow_delegation', False),
+            tools=agent_tools, # הרשימה תכיל רק כלים קיימים
+            llm=as_crew_llm(self._agent_llm(name, use_cache), agent=name),
+            verbose=config.get('verbose', True) and console_verbose()
+        )
 
     def _get_tools_map(self):
-        """Maps tool names (as strings in YAML) to their actual tool function objects."""
-        # 👇 מפת כלים מצומצמת מאוד
-        tool_map = {
-            "serper_dev_tool": web_search_tool,
-            "website_search_tool": website_search_tool,
-            "db_query_tool": db_query_tool, # מצביע לכלי הדמה
-        }
-        # (הסרנו את כל הכלים הבעייתיים)
-        return tool_map
+        """
+        Maps tool names (as strings in YAML) to their tool objects. The registry builds
+        each tool on first lookup, so only the tools this workflow uses are constructed.
+        """
+        if self.csv_index is not None:
+            # csv_index מושך את pandas - נטען רק כשהועלה קובץ
+            from decisioncrew.tools.csv_index import make_csv_search_tool
+            return ChainMap({"csv_search_tool": make_csv_search_tool(self.csv_index)}, tool_registry)
+        return tool_registry
 
     def setup_crew(self, topic: str):
         """Assembles the crew based on the loaded configuration for the specific workflow."""
@@ -71,12 +93,12 @@ class IntelligenceCrew:
         tools_map = self._get_tools_map()
         
         # Create Agents
-        agents = {}
+        agents, agent_tools_by_name = {}, {}
         if not self.agents_config: 
              raise ValueError(f"Agents configuration is empty or invalid for workflow '{self.workflow_name}'. Check agents.yaml.")
              
         for name, config in self.agents_config.items():
-            if not isinstance(config, dict): 
+            if not isinstance(config, Mapping): 
                 print(f"Warning: Invalid config format for agent '{name}'. Skipping.")
                 continue
             
@@ -89,26 +111,21 @@ class IntelligenceCrew:
                     # זו אזהרה חשובה - היא תופיע אם שכחנו להסיר כלי מה-YAML
                     print(f"\n\nERROR: Tool '{tool_name}' for agent '{name}' NOT FOUND in tool map. Check tool definition and _get_tools_map().\n\n")
             
+            agent_tools_by_name[name] = agent_tools
             try:
-                agents[name] = Agent(
-                    role=config.get('role', f'Agent {name} Role Missing'), 
-                    goal=config.get('goal', f'Agent {name} Goal Missing'),
-                    backstory=config.get('backstory', f'Agent {name} Backstory Missing'),
-                    allow_delegation=config.get('allow_delegation', False),
-                    tools=agent_tools, # הרשימה תכיל רק כלים קיימים
-                    llm=self.llm,
-                    verbose=config.get('verbose', True) 
-                )
+                agents[name] = self._make_agent(name, config, agent_tools)
             except Exception as e:
                  raise ValueError(f"Error creating agent '{name}': {e}. Check YAML configuration and tool definitions.")
 
         # Create Tasks
         tasks = {}
+        # llm_cache: false ברמת המשימה - עותק של הסוכן על לקוח ללא מטמון, רק למשימות האלה
+        live_agents = {}
         if not self.tasks_config: 
             raise ValueError(f"Tasks configuration file is empty or invalid for workflow '{self.workflow_name}'. Check tasks.yaml.")
             
         for name, config in self.tasks_config.items():
-            if not isinstance(config, dict): 
+            if not isinstance(config, Mapping): 
                 print(f"Warning: Invalid config format for task '{name}'. Skipping.")
                 continue
 
@@ -128,17 +145,24 @@ class IntelligenceCrew:
                  print(f"Warning: Agent '{agent_name}' specified for task '{name}' not found. Skipping task.")
                  continue 
 
+            agent = agents[agent_name]
+            if name in self.workflow.uncached_tasks and agent_name not in self.workflow.uncached_agents and self.llm_cache:
+                if agent_name not in live_agents:
+                    live_agents[agent_name] = self._make_agent(agent_name, self.agents_config[agent_name],
+                                                               agent_tools_by_name[agent_name], use_cache=False)
+                agent = live_agents[agent_name]
+
             tasks[name] = Task(
                 description=description,
                 expected_output=config.get('expected_output', 'Default Expected Output'), 
-                agent=agents[agent_name] 
+                agent=agent 
             )
 
         # Link context between tasks
         for name, config in self.tasks_config.items():
              if name in tasks and 'context' in config and config['context'] is not None:
                 context_tasks = []
-                context_list = config['context'] if isinstance(config['context'], list) else [config['context']] 
+                context_list = config['context'] if isinstance(config['context'], (list, tuple)) else [config['context']] 
                 
                 for task_name in context_list:
                     if task_name in tasks:
@@ -152,28 +176,94 @@ class IntelligenceCrew:
         valid_tasks = list(tasks.values())
         if not valid_tasks:
             raise ValueError("No valid tasks were created. Check agent assignments and descriptions in tasks.yaml.")
+        self.tasks = tasks
+        self.inputs = {'topic': topic}
+
+        # Crew נבנה רק כשמריצים דרך Crew.kickoff; מריץ הגרף משתמש במשימות ישירות
+        self.crew = None
+        if self._uses_task_graph():
+            return
 
         # Assemble the Crew
+        # תקציבי max_context_tokens נאכפים גם ב-Process.sequential, דרך BudgetedCrew
+        context_builder = TaskContextBuilder(self.tasks_config, get_compactor()) if self.workflow.context_budgets else None
         try:
-            self.crew = Crew(
-                agents=list(agents.values()),
+            self.crew = (BudgetedCrew if context_builder else Crew)(
+                agents=list(agents.values()) + list(live_agents.values()),
                 tasks=valid_tasks, 
                 process=Process.sequential, 
-                verbose=True 
+                verbose=console_verbose(),
+                task_callback=self._on_crew_task
             )
         except Exception as e:
              raise ValueError(f"Error creating Crew object: {e}. Check agent/task definitions.")
+        if context_builder is not None:
+            self.crew.set_context_builder(context_builder, tasks)
+        self.context_usage = context_builder.usage if context_builder else {}
 
 
     def run(self, topic: str):
-        """Runs the crew with the given topic and returns the result."""
+        """
+        Runs the crew with the given topic and returns the result. Metrics of the run are kept in self.run_metrics.
+        An identical request (same workflow, topic, CSV, configuration and model) that finished within
+        CREW_RUN_MEMO_TTL seconds, or is still running, is answered with that run's result instead.
+        """
+        with track_run("intelligence", self.workflow_name, self.model_name) as self.run_metrics:
+            if not run_memo_enabled() or not self.llm_cache:
+                return self._run(topic)
+            csv_hash = self.csv_index.content_hash if self.csv_index is not None else None
+            key = memo_key(self.workflow_name, topic, csv_hash, self.workflow.fingerprint, self.model_name)
+            result = get_run_memo().call(key, lambda: self._run(topic), cacheable=_is_success)
+            if not _is_success(result):
+                self.run_metrics.status = "error"
+            return result
+
+    def _run(self, topic: str):
         try:
             self.setup_crew(topic) 
-            if not hasattr(self, 'crew') or not self.crew:
+            if self._uses_task_graph():
+                return self._run_task_graph()
+            if not self.crew:
                  raise RuntimeError("Crew object was not successfully created during setup.")
-                 
+            self._last_task_finished = time.perf_counter()
             result = self.crew.kickoff(inputs={'topic': topic})
             return result
         except Exception as e:
+            self.run_metrics.status = "error"
             print(f"Error during crew execution for workflow '{self.workflow_name}': {e}")
-            return f"An error occurred during crew execution: {e}"
\ No newline at end of file
+            return f"An error occurred during crew execution: {e}"
+
+    def _uses_task_graph(self) -> bool:
+        """
+        The 'graph' and 'parallel' modes and checkpointing run on the task-graph executor instead of
+        Crew.kickoff. Context budgets are enforced by both engines, so they never switch the engine.
+        """
+        return self.execution_mode != "sequential" or self.checkpoints
+
+    def _run_task_graph(self):
+        """Runs the tasks by their dependency graph and returns the output of the final task."""
+        workers = self.max_workers if self.execution_mode == "parallel" else 1
+        context_builder = TaskContextBuilder(self.tasks_config, get_compactor()) if self.workflow.context_budgets else None
+        checkpointer = TaskCheckpointer(get_checkpoint_store(), self.workflow, self.model_name) if self.checkpoints else None
+        outputs = run_task_graph(self.tasks, self.tasks_config, max_workers=workers, context_builder=context_builder,
+                                 on_task_done=self.progress_callback, checkpointer=checkpointer, inputs=self.inputs)
+        # משימות ששוחזרו מריצה קודמת במקום לרוץ שוב
+        self.restored_tasks = checkpointer.restored if checkpointer else []
+        # ספירת הטוקנים של הקלט לכל משימה (תיאור + קונטקסט) מהריצה האחרונה
+        self.context_usage = context_builder.usage if context_builder else {}
+        # כמו ב-Process.sequential, התוצאה היא הפלט של המשימה האחרונה ב-YAML
+        final_task = list(self.tasks)[-1]
+        return outputs[final_task]
+
+    def _on_crew_task(self, output):
+        """Crew.kickoff task_callback: maps the finished task back to its YAML name for the metrics and progress_callback."""
+        description = getattr(output, 'description', None)
+        name = next((name for name, task in self.tasks.items() if task.description == description), None)
+        # Process.sequential מריץ משימה אחת בכל פעם, כך שזמן המשימה הוא הזמן מאז שהקודמת הסתיימה
+        now = time.perf_counter()
+        metrics = current_run()
+        if metrics is not None and name is not None:
+            metrics.record_task(name, self.tasks_config[name].get('agent'), now - self._last_task_finished)
+        self._last_task_finished = now
+        if self.progress_callback is not None:
+            self.progress_callback(name, task_output_text(output))
@@ -0,0 +1,208 @@
+# decisioncrew/crews/registry.py
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import yaml
+
+from decisioncrew.crews.scheduler import build_task_graph, topological_order
+from decisioncrew.llm.routing import parse_llm_config
+
+WORKFLOWS_DIR = os.path.join("config", "workflows")
+CONFIG_FILES = ("agents.yaml", "tasks.yaml")
+# קבצים שרק חלק מזרימות העבודה מגדירות (למשל turns.yaml של wargames)
+OPTIONAL_CONFIG_FILES = ("turns.yaml",)
+
+
+def _freeze(value):
+    """Recursively converts parsed YAML into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """An immutable, validated view of a workflow's agents.yaml and tasks.yaml."""
+    name: str
+    config_path: str
+    agents_config: MappingProxyType
+    tasks_config: MappingProxyType
+    task_graph: MappingProxyType
+    task_order: tuple
+    fingerprint: str
+    # סוכנים שלא ישתמשו במטמון התשובות (llm_cache: false בסוכן)
+    uncached_agents: frozenset = frozenset()
+    # משימות שרצות ללא מטמון תשובות ונקודות שמירה (llm_cache: false במשימה או בסוכן שלה)
+    uncached_tasks: frozenset = frozenset()
+    # תקציבי טוקנים לקונטקסט של משימות (max_context_tokens ב-tasks.yaml)
+    context_budgets: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    # תבניות תורות לסימולציה רב-שלבית (turns.yaml, אופציונלי)
+    turns_config: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    # מודל ופרמטרים לכל סוכן (בלוק llm: ב-agents.yaml), כ-LLMRoute
+    agent_llms: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+
+class WorkflowRegistry:
+    """
+    Process-wide cache of compiled workflows. Each workflow is parsed and validated
+    once and re-compiled only when one of its YAML files changes on disk.
+    """
+
+    def __init__(self, workflows_dir: str = WORKFLOWS_DIR):
+        self.workflows_dir = workflows_dir
+        self._compiled = {}
+        self._stamps = {}
+        self._lock = threading.Lock()
+
+    def config_path(self, workflow_name: str) -> str:
+        return os.path.join(self.workflows_dir, workflow_name) + os.sep
+
+    def _stamp(self, workflow_name: str):
+        """Cheap change detector: (mtime, size) of every config file."""
+        config_path = self.config_path(workflow_name)
+        stamp = []
+        for filename in CONFIG_FILES:
+            try:
+                stat = os.stat(os.path.join(config_path, filename))
+            except FileNotFoundError as e:
+                raise FileNotFoundError(f"{filename} not found for workflow '{workflow_name}' in: {config_path}") from e
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        for filename in OPTIONAL_CONFIG_FILES:
+            try:
+                stat = os.stat(os.path.join(config_path, filename))
+            except FileNotFoundError:
+                stamp.append(None)
+                continue
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamp)
+
+    def get(self, workflow_name: str) -> CompiledWorkflow:
+        """Returns the compiled workflow, re-compiling it if its files changed."""
+        config_path = self.config_path(workflow_name)
+        if not os.path.isdir(config_path):
+            raise FileNotFoundError(f"Workflow configuration directory not found: {config_path}")
+
+        stamp = self._stamp(workflow_name)
+        compiled = self._compiled.get(workflow_name)
+        if compiled is not None and self._stamps.get(workflow_name) == stamp:
+            return compiled
+
+        with self._lock:
+            compiled = self._compiled.get(workflow_name)
+            if compiled is None or self._stamps.get(workflow_name) != stamp:
+                compiled = self._compile(workflow_name, compiled)
+                self._compiled[workflow_name] = compiled
+                self._stamps[workflow_name] = stamp
+        return compiled
+
+    def invalidate(self, workflow_name: str = None):
+        """Forces the next get() to re-read the YAML files."""
+        with self._lock:
+            if workflow_name is None:
+                self._compiled.clear()
+                self._stamps.clear()
+            else:
+                self._compiled.pop(workflow_name, None)
+                self._stamps.pop(workflow_name, None)
+
+    def _compile(self, workflow_name: str, previous: CompiledWorkflow = None) -> CompiledWorkflow:
+        config_path = self.config_path(workflow_name)
+        raw = {}
+        digest = hashlib.sha256()
+        for filename in CONFIG_FILES:
+            path = os.path.join(config_path, filename)
+            try:
+                with open(path, 'rb') as f:
+                    raw[filename] = f.read()
+            except FileNotFoundError as e:
+                raise FileNotFoundError(f"{filename} not found for workflow '{workflow_name}' in: {config_path}") from e
+            digest.update(filename.encode('utf-8'))
+            digest.update(raw[filename])
+        for filename in OPTIONAL_CONFIG_FILES:
+            path = os.path.join(config_path, filename)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    raw[filename] = f.read()
+                digest.update(filename.encode('utf-8'))
+                digest.update(raw[filename])
+        fingerprint = digest.hexdigest()
+
+        # רק ה-mtime השתנה (למשל touch או שמירה ללא שינוי) - אין צורך לקמפל מחדש
+        if previous is not None and previous.fingerprint == fingerprint:
+            return previous
+
+        try:
+            agents_config = yaml.safe_load(raw["agents.yaml"].decode('utf-8'))
+            tasks_config = yaml.safe_load(raw["tasks.yaml"].decode('utf-8'))
+            turns_config = yaml.safe_load(raw["turns.yaml"].decode('utf-8')) if "turns.yaml" in raw else {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Error parsing YAML file in {config_path}: {e}") from e
+
+        if not agents_config or not isinstance(agents_config, dict):
+            raise ValueError(f"Agents configuration file '{os.path.join(config_path, 'agents.yaml')}' is empty or invalid.")
+        if not tasks_config or not isinstance(tasks_config, dict):
+            raise ValueError(f"Tasks configuration file '{os.path.join(config_path, 'tasks.yaml')}' is empty or invalid.")
+        if turns_config is None:
+            turns_config = {}
+        if not isinstance(turns_config, dict):
+            raise ValueError(f"Turns configuration file '{os.path.join(config_path, 'turns.yaml')}' is invalid.")
+        for name, config in turns_config.items():
+            if name != 'settings' and isinstance(config, dict) and config.get('agent') not in agents_config:
+                raise ValueError(f"Turn step '{name}' in workflow '{workflow_name}' uses unknown agent '{config.get('agent')}'")
+
+        task_graph = build_task_graph(tasks_config)
+        try:
+            task_order = topological_order(task_graph)
+        except ValueError as e:
+            raise ValueError(f"Invalid task graph in workflow '{workflow_name}': {e}") from e
+
+        uncached_agents = {name for name, config in agents_config.items()
+                           if isinstance(config, dict) and config.get('llm_cache') is False}
+        uncached_tasks = {name for name, config in tasks_config.items()
+                          if isinstance(config, dict) and (config.get('llm_cache') is False or config.get('agent') in uncached_agents)}
+
+        agent_llms = {}
+        for name, config in agents_config.items():
+            if isinstance(config, dict) and config.get('llm') is not None:
+                try:
+                    agent_llms[name] = parse_llm_config(name, config['llm'])
+                except ValueError as e:
+                    raise ValueError(f"Invalid agents.yaml in workflow '{workflow_name}': {e}") from e
+
+        context_budgets = {}
+        for name, config in tasks_config.items():
+            budget = config.get('max_context_tokens') if isinstance(config, dict) else None
+            if budget is None:
+                continue
+            if not isinstance(budget, int) or budget <= 0:
+                raise ValueError(f"max_context_tokens of task '{name}' in workflow '{workflow_name}' must be a positive integer, got {budget!r}")
+            context_budgets[name] = budget
+
+        return CompiledWorkflow(
+            name=workflow_name,
+            config_path=config_path,
+            agents_config=_freeze(agents_config),
+            tasks_config=_freeze(tasks_config),
+            task_graph=MappingProxyType({name: tuple(deps) for name, deps in task_graph.items()}),
+            task_order=tuple(task_order),
+            fingerprint=fingerprint,
+            uncached_agents=frozenset(uncached_agents),
+            uncached_tasks=frozenset(uncached_tasks),
+            context_budgets=MappingProxyType(context_budgets),
+            turns_config=_freeze(turns_config),
+            agent_llms=MappingProxyType(agent_llms),
+        )
+
+
+workflow_registry = WorkflowRegistry()
+
+
+def get_workflow(workflow_name: str) -> CompiledWorkflow:
+    """Returns the compiled workflow from the process-wide registry."""
+    return workflow_registry.get(workflow_name)
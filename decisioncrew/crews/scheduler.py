@@ -0,0 +1,226 @@
+# decisioncrew/crews/scheduler.py
+
+import os
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from decisioncrew.runtime.metrics import track_task
+
+# מצבי הרצה נתמכים: sequential = Crew רגיל של crewai, graph = מריץ הגרף עם worker אחד,
+# parallel = הרצה לפי גרף התלויות במקביל
+EXECUTION_MODES = ("sequential", "graph", "parallel")
+DEFAULT_MAX_WORKERS = 4
+
+# אותו מפריד ש-crewai משתמש בו כשהוא מאחד פלטים של משימות קונטקסט
+CONTEXT_SEPARATOR = "\n\n----------\n\n"
+
+
+def resolve_execution_mode(mode: str = None) -> str:
+    """Returns the execution mode to use, falling back to the CREW_EXECUTION_MODE env var."""
+    mode = (mode or os.getenv("CREW_EXECUTION_MODE", "sequential")).strip().lower()
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode '{mode}'. Expected one of: {', '.join(EXECUTION_MODES)}")
+    return mode
+
+
+def resolve_max_workers(max_workers: int = None) -> int:
+    """Returns the worker limit to use, falling back to the CREW_MAX_WORKERS env var."""
+    if max_workers is None:
+        max_workers = int(os.getenv("CREW_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+    return max_workers
+
+
+def build_task_graph(tasks_config, task_names=None):
+    """
+    Builds a dependency graph {task_name: [upstream task names]} from the 'context'
+    entries in tasks.yaml. Only tasks in task_names (default: all tasks) are kept,
+    and links to unknown tasks are dropped, same as setup_crew does.
+    """
+    names = list(task_names) if task_names is not None else list(tasks_config.keys())
+    known = set(names)
+    graph = {}
+    for name in names:
+        config = tasks_config.get(name) or {}
+        context = config.get('context') if hasattr(config, 'get') else None
+        if context is None:
+            deps = []
+        elif isinstance(context, str):
+            deps = [context]
+        else:
+            deps = list(context)
+        graph[name] = [dep for dep in deps if dep in known and dep != name]
+    return graph
+
+
+def topological_order(graph):
+    """
+    Returns the task names in dependency order (Kahn's algorithm).
+    Ties are broken by the original YAML order so the result is stable.
+    """
+    position = {name: i for i, name in enumerate(graph)}
+    remaining = {name: len(deps) for name, deps in graph.items()}
+    dependents = {name: [] for name in graph}
+    for name, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(name)
+
+    ready = sorted((name for name, count in remaining.items() if count == 0), key=position.get)
+    order = []
+    while ready:
+        name = ready.pop(0)
+        order.append(name)
+        for child in dependents[name]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+        ready.sort(key=position.get)
+
+    if len(order) != len(graph):
+        cyclic = [name for name in graph if name not in order]
+        raise ValueError(f"Task context links form a cycle between: {', '.join(cyclic)}")
+    return order
+
+
+class DagScheduler:
+    """
+    Runs a dependency graph of tasks on a thread pool. A task is submitted as soon as
+    all of its upstream tasks have finished, and receives their outputs directly.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = resolve_max_workers(max_workers)
+
+    def run(self, graph, execute_fn):
+        """
+        Executes every node in graph. execute_fn(name, upstream_outputs) is called with a
+        dict of {upstream_name: output} and must return the node's output.
+        Returns {name: output} in topological order. The first failure cancels all
+        pending work and is re-raised.
+        """
+        order = topological_order(graph)
+        position = {name: i for i, name in enumerate(order)}
+        remaining = {name: set(deps) for name, deps in graph.items()}
+        outputs = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew-task") as pool:
+            running = {}
+
+            def submit_ready():
+                ready = [name for name, deps in remaining.items() if not deps and name not in outputs
+                         and name not in running.values()]
+                for name in sorted(ready, key=position.get):
+                    upstream = {dep: outputs[dep] for dep in graph[name]}
+                    # כל משימה רצה בעותק של ה-context, כדי שמדדי הריצה הנוכחית יגיעו גם ל-thread שלה
+                    running[pool.submit(copy_context().run, execute_fn, name, upstream)] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except BaseException:
+                        for pending in running:
+                            pending.cancel()
+                        raise
+                    del remaining[name]
+                    for deps in remaining.values():
+                        deps.discard(name)
+                submit_ready()
+
+        return {name: outputs[name] for name in order}
+
+
+def task_output_text(output) -> str:
+    """Normalizes the return value of a crewai task execution into plain text."""
+    if output is None:
+        return ""
+    raw = getattr(output, 'raw', None)
+    if raw is not None:
+        return str(raw)
+    return str(output)
+
+
+def interpolate_inputs(tasks, inputs: dict):
+    """
+    Applies inputs to already-built Tasks and their Agents the way Crew.kickoff(inputs=...)
+    does: task descriptions and expected outputs, and agent roles, goals and backstories.
+    Tasks executed outside a Crew (execute_task) are otherwise never interpolated.
+    """
+    if not inputs:
+        return
+    agents = {}
+    for name, task in tasks.items():
+        try:
+            if hasattr(task, 'interpolate_inputs_and_add_conversation_history'):
+                task.interpolate_inputs_and_add_conversation_history(inputs)
+            elif hasattr(task, 'interpolate_inputs'):
+                task.interpolate_inputs(inputs)
+        except (KeyError, ValueError) as e:
+            print(f"Warning: Could not fill the placeholders of task '{name}': {e}")
+        if task.agent is not None:
+            agents[id(task.agent)] = task.agent
+    for agent in agents.values():
+        try:
+            agent.interpolate_inputs(inputs)
+        except (KeyError, ValueError) as e:
+            print(f"Warning: Could not fill the placeholders of agent '{agent.role}': {e}")
+
+
+def execute_task(task, context: str = None) -> str:
+    """
+    Executes a single crewai Task outside of a Crew, with the given upstream context.
+    Supports both the execute_sync() API and the older execute() API.
+    """
+    if hasattr(task, 'execute_sync'):
+        output = task.execute_sync(agent=task.agent, context=context or None)
+    else:
+        output = task.execute(agent=task.agent, context=context or None)
+    return task_output_text(output)
+
+
+def run_task_graph(tasks, tasks_config, max_workers: int = None, context_builder=None, on_task_done=None,
+                   checkpointer=None, inputs: dict = None):
+    """
+    Runs already-built crewai Tasks ({name: Task}) concurrently according to the
+    'context' graph in tasks_config. inputs are interpolated into the tasks and their
+    agents first, as Crew.kickoff(inputs=...) would. Each task gets its upstream outputs joined as
+    context; a context_builder (see context_budget.TaskContextBuilder) can fit them
+    into a token budget first. on_task_done(name, output_text) is called from the
+    worker thread as each task finishes. With a checkpointer (see
+    runtime.checkpoints.TaskCheckpointer), tasks whose key matches an earlier run
+    are restored instead of executed. Returns {name: output_text} in
+    topological order.
+    """
+    graph = build_task_graph(tasks_config, task_names=tasks.keys())
+    interpolate_inputs(tasks, inputs)
+
+    def execute(name, upstream):
+        ordered = {dep: upstream[dep] for dep in graph[name]}
+        llm = getattr(tasks[name].agent, 'llm', None)
+        key = checkpointer.key(name, tasks[name].description, ordered, llm) if checkpointer is not None else None
+        output = checkpointer.load(name, key) if key is not None else None
+        if output is not None:
+            if on_task_done is not None:
+                on_task_done(name, output)
+            return output
+
+        if context_builder is not None:
+            context = context_builder.build(name, tasks[name].description, ordered, CONTEXT_SEPARATOR)
+        else:
+            context = CONTEXT_SEPARATOR.join(text for text in ordered.values() if text)
+        with track_task(name, (tasks_config.get(name) or {}).get('agent')):
+            output = execute_task(tasks[name], context)
+        if key is not None:
+            checkpointer.save(name, key, output)
+        if on_task_done is not None:
+            on_task_done(name, output)
+        return output
+
+    outputs = DagScheduler(max_workers).run(graph, execute)
+    if checkpointer is not None:
+        checkpointer.complete()
+    return outputs
@@ -0,0 +1,130 @@
+# decisioncrew/crews/wargame_state.py
+
+import re
+from dataclasses import dataclass, field, asdict
+
+from decisioncrew.crews.context_budget import count_tokens, truncate_middle
+
+_FIELD = re.compile(r"^\s*\**(SUMMARY|RED_MOVE|BLUE_MOVE|ESCALATION_LEVEL|CONVERGED)\**\s*:\s*(.*)$", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# אורך מקסימלי לשורה ביומן המהלכים כשהמודל לא החזיר שורה מסוכמת
+MAX_LEDGER_CHARS = 240
+
+
+def parse_adjudication(text: str) -> dict:
+    """
+    Parses the game master's SUMMARY / RED_MOVE / BLUE_MOVE / ESCALATION_LEVEL /
+    CONVERGED reply. Missing fields are None; SUMMARY may span several lines.
+    """
+    fields = {"summary": None, "red_move": None, "blue_move": None, "escalation_level": None, "converged": None}
+    current = None
+    summary_lines = []
+    for line in (text or "").splitlines():
+        match = _FIELD.match(line)
+        if match:
+            current = match.group(1).lower()
+            value = match.group(2).strip().lstrip('*').strip()
+            if current == "summary":
+                summary_lines = [value] if value else []
+            elif current == "escalation_level":
+                number = _NUMBER.search(value)
+                fields[current] = min(max(float(number.group()), 0.0), 10.0) if number else None
+            elif current == "converged":
+                fields[current] = value.lower().startswith(("yes", "true", "כן"))
+            else:
+                fields[current] = value or None
+        elif current == "summary":
+            summary_lines.append(line)
+    if summary_lines:
+        fields["summary"] = "\n".join(summary_lines).strip() or None
+    return fields
+
+
+def _one_line(text: str) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= MAX_LEDGER_CHARS else text[:MAX_LEDGER_CHARS - 3] + "..."
+
+
+@dataclass
+class LedgerEntry:
+    """One move in the game, as a single line."""
+    turn: int
+    side: str
+    move: str
+
+
+@dataclass
+class GameState:
+    """
+    Incremental state of a multi-turn wargame. Each turn only sees the rolling summary,
+    the last few ledger lines and the escalation level, so prompt size does not grow
+    with the number of turns. The full move texts are kept in 'transcript' for display.
+    """
+    initial_action: str
+    summary: str = ""
+    ledger: list = field(default_factory=list)
+    escalation_level: float = 0.0
+    escalation_history: list = field(default_factory=list)
+    converged: bool = False
+    turns_played: int = 0
+    stop_reason: str = None
+    transcript: list = field(default_factory=list)
+    turn_usage: list = field(default_factory=list)
+
+    def to_prompt(self, ledger_window: int = 2) -> str:
+        """Renders the compact state that is sent to the agents each turn."""
+        if not self.turns_played:
+            return f"The game starts now. Blue Team's opening move: {_one_line(self.initial_action)}\nEscalation level: {self.escalation_level:g}/10"
+        first_turn = self.turns_played - ledger_window + 1
+        recent = [entry for entry in self.ledger if entry.turn >= first_turn]
+        lines = [f"Rolling summary (turns 1-{self.turns_played}):", self.summary,
+                 f"Escalation level: {self.escalation_level:g}/10 (recent levels: {', '.join(f'{level:g}' for level in self.escalation_history[-5:])})"]
+        if recent:
+            lines.append("Recent moves:")
+            lines += [f"- Turn {entry.turn} {entry.side}: {entry.move}" for entry in recent]
+        return "\n".join(lines)
+
+    def apply_turn(self, turn: int, red_move: str, blue_move: str, adjudication: str, max_summary_tokens: int = None):
+        """Folds one adjudicated turn into the state."""
+        fields = parse_adjudication(adjudication)
+        summary = fields["summary"] or adjudication.strip() or self.summary
+        self.summary = truncate_middle(summary, max_summary_tokens) if max_summary_tokens else summary
+        self.ledger.append(LedgerEntry(turn, "Red", _one_line(fields["red_move"] or red_move)))
+        self.ledger.append(LedgerEntry(turn, "Blue", _one_line(fields["blue_move"] or blue_move)))
+        if fields["escalation_level"] is not None:
+            self.escalation_level = fields["escalation_level"]
+        else:
+            print(f"Warning: turn {turn} adjudication has no ESCALATION_LEVEL; keeping {self.escalation_level:g}.")
+        self.escalation_history.append(self.escalation_level)
+        self.converged = bool(fields["converged"])
+        self.turns_played = turn
+        self.transcript.append({"turn": turn, "red": red_move, "blue": blue_move, "adjudication": adjudication})
+
+    def record_usage(self, turn: int, prompts):
+        """Stores the prompt token count of a turn, to check that it stays flat."""
+        self.turn_usage.append({"turn": turn, "prompt_tokens": sum(count_tokens(prompt) for prompt in prompts)})
+
+    def check_stop(self, escalation_threshold: float = None, convergence_turns: int = None) -> str:
+        """
+        Returns why the game should stop now ('escalation', 'converged', 'stable'), or None.
+        'stable' means the escalation level did not move during the last convergence_turns turns.
+        """
+        if escalation_threshold is not None and self.escalation_level >= escalation_threshold:
+            return "escalation"
+        if self.converged:
+            return "converged"
+        if convergence_turns and len(self.escalation_history) > convergence_turns:
+            window = self.escalation_history[-(convergence_turns + 1):]
+            if max(window) - min(window) < 0.5:
+                return "stable"
+        return None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameState":
+        """Rebuilds a state saved with to_dict() (e.g. a finished background job)."""
+        data = dict(data)
+        data["ledger"] = [LedgerEntry(**entry) for entry in data.get("ledger", [])]
+        return cls(**data)
@@ -1,37 +1,94 @@
 # decisioncrew/crews/wargames_crew.py
 
-import yaml
-from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from crewai import Agent, Task, Crew, Process
+from decisioncrew.crews.registry import get_workflow
+from decisioncrew.llm.pool import default_model_name, get_agent_llm, get_llm
+from decisioncrew.llm.adapter import as_crew_llm
+from decisioncrew.llm.cache import llm_cache_enabled
+from decisioncrew.crews.scheduler import execute_task, resolve_execution_mode, resolve_max_workers, run_task_graph, task_output_text
+from decisioncrew.crews.context_budget import BudgetedCrew, TaskContextBuilder, get_compactor
+from decisioncrew.crews.wargame_state import GameState
+from decisioncrew.runtime.metrics import console_verbose, current_run, track_run, track_task
+from decisioncrew.runtime.checkpoints import TaskCheckpointer, checkpoints_enabled, get_checkpoint_store
+from decisioncrew.runtime.memo import get_run_memo, memo_key, run_memo_enabled
+
+# שורות הציון שה-game_master מוסיף בסוף הסיכום (ראו summary_task ב-tasks.yaml)
+_SCORE_LINE = re.compile(r"\b(STRATEGIC_GAIN|ESCALATION_RISK)\s*[:=]\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def parse_outcome_scores(summary: str) -> dict:
+    """מחלץ את ציוני STRATEGIC_GAIN ו-ESCALATION_RISK (0-10) מסיכום הסימולציה."""
+    scores = {"strategic_gain": None, "escalation_risk": None}
+    for key, value in _SCORE_LINE.findall(summary or ""):
+        scores[key.lower()] = min(max(float(value), 0.0), 10.0)
+    return scores
+
+
+def _is_success(result) -> bool:
+    """run() מדווח על כשל כמחרוזת 'An error occurred...'; תוצאות כאלה לא נשמרות ב-memo."""
+    return not str(result).startswith("An error occurred")
+
+
+def rank_branches(branches):
+    """
+    מדרג ענפים לפי רווח אסטרטגי פחות סיכון הסלמה. ענפים שנכשלו או שחסר להם ציון
+    מופיעים בסוף, בסדר המקורי.
+    """
+    def net_score(branch):
+        if branch.get("error") or branch.get("strategic_gain") is None or branch.get("escalation_risk") is None:
+            return None
+        return branch["strategic_gain"] - branch["escalation_risk"]
+
+    for branch in branches:
+        branch["net_score"] = net_score(branch)
+    scored = sorted((b for b in branches if b["net_score"] is not None), key=lambda b: b["net_score"], reverse=True)
+    unscored = [b for b in branches if b["net_score"] is None]
+    ranked = scored + unscored
+    for rank, branch in enumerate(ranked, start=1):
+        branch["rank"] = rank
+    return ranked
+
 
 class WargamesCrew:
-    def __init__(self):
+    def __init__(self, execution_mode: str = None, max_workers: int = None, progress_callback=None,
+                 checkpoints: bool = None, llm_cache: bool = None):
         # זרימת העבודה של משחקי מלחמה היא קבועה
         self.workflow_name = "wargames"
-        self.config_path = os.path.join("config", "workflows", self.workflow_name) + os.sep
+        # progress_callback(task_name, output_text) נקרא כשכל משימה של run() מסתיימת
+        self.progress_callback = progress_callback
+        # llm_cache=False (או LLM_CACHE_BYPASS) מריץ את הסימולציה ללא מטמון תשובות ונקודות שמירה
+        self.llm_cache = llm_cache_enabled(self.workflow_name, llm_cache)
+        # שמירת הפלט של כל משימה, כדי שסימולציה שנכשלה תמשיך מהמשימה הראשונה שלא הושלמה (CREW_CHECKPOINTS)
+        self.checkpoints = checkpoints_enabled(checkpoints) and self.llm_cache
+        self.execution_mode = resolve_execution_mode(execution_mode)
+        self.max_workers = resolve_max_workers(max_workers)
         self._load_configs()
-        model_name = os.getenv("MODEL_NAME", "gpt-4o") 
-        self.llm = ChatOpenAI(model=model_name)
+        # לקוח משותף מה-pool - לא נוצר מחדש בכל סימולציה
+        self.model_name = default_model_name()
+        self.llm = get_llm(self.model_name)
 
     def _load_configs(self):
-        """טוען את קבצי התצורה של הסוכנים והמשימות מה-YAML."""
-        agents_file = os.path.join(self.config_path, "agents.yaml")
-        tasks_file = os.path.join(self.config_path, "tasks.yaml")
-        try:
-            with open(agents_file, 'r', encoding='utf-8') as f:
-                self.agents_config = yaml.safe_load(f)
-            with open(tasks_file, 'r', encoding='utf-8') as f:
-                self.tasks_config = yaml.safe_load(f)
-        except FileNotFoundError as e:
-            raise FileNotFoundError(f"Configuration files not found for workflow '{self.workflow_name}'. Searched in: {self.config_path}") from e
-        except yaml.YAMLError as e:
-             raise ValueError(f"Error parsing YAML file in {self.config_path}: {e}") from e
-        
-        if not self.agents_config:
-             raise ValueError(f"Agents configuration file '{agents_file}' is empty or invalid.")
-        if not self.tasks_config:
-             raise ValueError(f"Tasks configuration file '{tasks_file}' is empty or invalid.")
+        """טוען את התצורה המקומפלת של הסוכנים והמשימות מה-registry."""
+        self.workflow = get_workflow(self.workflow_name)
+        self.config_path = self.workflow.config_path
+        self.agents_config = self.workflow.agents_config
+        self.tasks_config = self.workflow.tasks_config
+
+    def _agent_llm(self, agent_name: str, use_cache: bool = True):
+        """
+        מחזיר את ה-LLM של הסוכן: המודל והפרמטרים מבלוק ה-llm שלו (עם מעבר ל-fallback
+        כשהוא חורג מה-latency_slo), ללא מטמון תשובות אם ה-YAML, הצוות או use_cache ביקשו זאת.
+        """
+        route = self.workflow.agent_llms.get(agent_name)
+        use_cache = use_cache and self.llm_cache and agent_name not in self.workflow.uncached_agents
+        if route is None and use_cache:
+            return self.llm
+        return get_agent_llm(agent_name, route, self.model_name, use_cache=use_cache)
 
     def _get_tools_map(self):
         """
@@ -42,36 +99,48 @@ class WargamesCrew:
 
     def setup_crew(self, intelligence_context: str, user_action: str):
         """מרכיב את הצוות על בסיס התצורה שנטענה."""
-        
-        tools_map = self._get_tools_map()
-        
-        # יצירת סוכנים
-        agents = {}
-        for name, config in self.agents_config.items():
-            agent_tools_config = config.get("tools", [])
-            agent_tools = [tools_map[tool_name] for tool_name in agent_tools_config if tool_name in tools_map]
-            
-            try:
-                agents[name] = Agent(
-                    role=config.get('role'), 
-                    goal=config.get('goal'),
-                    backstory=config.get('backstory'),
-                    allow_delegation=config.get('allow_delegation', False),
-                    tools=agent_tools, 
-                    llm=self.llm,
-                    verbose=config.get('verbose', True) 
-                )
-            except Exception as e:
-                 raise ValueError(f"Error creating agent '{name}': {e}.")
+        agents, tasks = self._build_tasks(intelligence_context, user_action)
+        self.tasks = tasks
+        self.inputs = {'intelligence_context': intelligence_context, 'user_action': user_action}
+
+        # Crew נבנה רק כשמריצים דרך Crew.kickoff; מריץ הגרף משתמש במשימות ישירות
+        self.crew = None
+        if self._uses_task_graph():
+            return
+
+        # הרכבת הצוות. תקציבי max_context_tokens נאכפים גם ב-Process.sequential, דרך BudgetedCrew
+        context_builder = TaskContextBuilder(self.tasks_config, get_compactor()) if self.workflow.context_budgets else None
+        try:
+            self.crew = (BudgetedCrew if context_builder else Crew)(
+                agents=agents,
+                tasks=list(tasks.values()), 
+                process=Process.sequential, 
+                verbose=console_verbose(),
+                task_callback=self._on_crew_task
+            )
+        except Exception as e:
+             raise ValueError(f"Error creating Wargames Crew object: {e}.")
+        if context_builder is not None:
+            self.crew.set_context_builder(context_builder, tasks)
+        self.context_usage = context_builder.usage if context_builder else {}
+
+    def _build_tasks(self, intelligence_context: str, user_action: str):
+        """
+        בונה סוכנים ומשימות חדשים לסימולציה אחת, בלי לשמור אותם על המופע -
+        כך שכמה ענפים של run_batch יכולים לרוץ במקביל.
+        """
+        agents = self._build_agents()
 
         # יצירת משימות
         tasks = {}
+        # llm_cache: false ברמת המשימה - עותק של הסוכן על לקוח ללא מטמון, רק למשימות האלה
+        live_agents = {}
         for name, config in self.tasks_config.items():
             description_template = config.get('description')
             try:
                  # מילוי כל הפלייסהולדרים שהגדרנו ב-YAML
                  description = description_template.format(
-                     intelligence_context=intelligence_context,
+                     intelligence_context=self._briefing_for(config, intelligence_context),
                      user_action=user_action
                  )
             except KeyError as e:
@@ -83,48 +152,244 @@ class WargamesCrew:
                  print(f"Warning: Agent '{agent_name}' for task '{name}' not found. Skipping task.")
                  continue 
 
+            agent = agents[agent_name]
+            if name in self.workflow.uncached_tasks and agent_name not in self.workflow.uncached_agents and self.llm_cache:
+                if agent_name not in live_agents:
+                    live_agents[agent_name] = self._make_agent(agent_name, self.agents_config[agent_name], use_cache=False)
+                agent = live_agents[agent_name]
+
             tasks[name] = Task(
                 description=description,
                 expected_output=config.get('expected_output'), 
-                agent=agents[agent_name] 
+                agent=agent 
             )
 
         # קישור קונטקסט
-        for name, config in self.tasks_config.items():
-             if name in tasks and 'context' in config and config['context'] is not None:
-                context_tasks = [tasks[task_name] for task_name in config['context'] if task_name in tasks]
+        for name, upstream in self.workflow.task_graph.items():
+             if name in tasks:
+                context_tasks = [tasks[task_name] for task_name in upstream if task_name in tasks]
                 if context_tasks: 
                     tasks[name].context = context_tasks
 
-        valid_tasks = list(tasks.values())
-        if not valid_tasks:
+        if not tasks:
             raise ValueError("No valid wargame tasks were created.")
+        return list(agents.values()) + list(live_agents.values()), tasks
+
+    def _build_agents(self):
+        """יוצר את סוכני משחק המלחמה מהתצורה."""
+        return {name: self._make_agent(name, config) for name, config in self.agents_config.items()}
+
+    def _make_agent(self, name: str, config, use_cache: bool = True):
+        """יוצר סוכן אחד מהתצורה שלו ב-agents.yaml."""
+        tools_map = self._get_tools_map()
+        agent_tools_config = config.get("tools", [])
+        agent_tools = [tools_map[tool_name] for tool_name in agent_tools_config if tool_name in tools_map]
 
-        # הרכבת הצוות
         try:
-            self.crew = Crew(
-                agents=list(agents.values()),
-                tasks=valid_tasks, 
-                process=Process.sequential, 
-                verbose=True 
+            return Agent(
+                role=config.get('role'), 
+                goal=config.get('goal'),
+                backstory=config.get('backstory'),
+                allow_delegation=config.get('allow_delegation', False),
+                tools=agent_tools, 
+                llm=as_crew_llm(self._agent_llm(name, use_cache), agent=name),
+                verbose=config.get('verbose', True) and console_verbose()
             )
         except Exception as e:
-             raise ValueError(f"Error creating Wargames Crew object: {e}.")
-
+             raise ValueError(f"Error creating agent '{name}': {e}.")
 
     def run(self, intelligence_context: str, user_action: str):
-        """מריץ את צוות משחק המלחמה ומחזיר את התוצאה."""
+        """
+        מריץ את צוות משחק המלחמה ומחזיר את התוצאה. מדדי הריצה נשמרים ב-self.run_metrics.
+        בקשה זהה (אותו תדריך, מהלך, תצורה ומודל) שהסתיימה ב-CREW_RUN_MEMO_TTL השניות האחרונות,
+        או שעדיין רצה, מקבלת את התוצאה שלה במקום להריץ סימולציה נוספת.
+        """
+        with track_run("wargames", self.workflow_name, self.model_name) as self.run_metrics:
+            if not run_memo_enabled() or not self.llm_cache:
+                return self._run(intelligence_context, user_action)
+            key = memo_key(self.workflow_name, f"{intelligence_context}\n{user_action}", None,
+                           self.workflow.fingerprint, self.model_name)
+            result = get_run_memo().call(key, lambda: self._run(intelligence_context, user_action), cacheable=_is_success)
+            if not _is_success(result):
+                self.run_metrics.status = "error"
+            return result
+
+    def _run(self, intelligence_context: str, user_action: str):
         try:
             self.setup_crew(intelligence_context, user_action) 
-            if not hasattr(self, 'crew') or not self.crew:
+            if self._uses_task_graph():
+                return self._run_task_graph()
+            if not self.crew:
                  raise RuntimeError("Wargames Crew object was not created.")
-                 
+
             # העברת המשתנים כקלט ל-kickoff
+            self._last_task_finished = time.perf_counter()
             result = self.crew.kickoff(inputs={
                 'intelligence_context': intelligence_context,
                 'user_action': user_action
             })
             return result
         except Exception as e:
+            self.run_metrics.status = "error"
             print(f"Error during wargames crew execution: {e}")
-            return f"An error occurred during wargames execution: {e}"
\ No newline at end of file
+            return f"An error occurred during wargames execution: {e}"
+
+    def _uses_task_graph(self) -> bool:
+        """
+        מצבי graph ו-parallel ושמירת נקודות ביניים רצים על מריץ הגרף במקום Crew.kickoff.
+        תקציבי קונטקסט נאכפים בשני המנועים, ולכן לא מחליפים את מנוע ההרצה.
+        """
+        return self.execution_mode != "sequential" or self.checkpoints
+
+    def _execute_graph(self, tasks, on_task_done=None, inputs=None):
+        """
+        מריץ משימות לפי גרף התלויות ומחזיר (פלטים לפי משימה, ספירת טוקנים לפי משימה).
+        inputs ממולאים במשימות ובסוכנים כמו ב-Crew.kickoff.
+        """
+        workers = self.max_workers if self.execution_mode == "parallel" else 1
+        context_builder = TaskContextBuilder(self.tasks_config, get_compactor()) if self.workflow.context_budgets else None
+        checkpointer = TaskCheckpointer(get_checkpoint_store(), self.workflow, self.model_name) if self.checkpoints else None
+        outputs = run_task_graph(tasks, self.tasks_config, max_workers=workers, context_builder=context_builder,
+                                 on_task_done=on_task_done, checkpointer=checkpointer, inputs=inputs)
+        return outputs, (context_builder.usage if context_builder else {})
+
+    def _run_task_graph(self):
+        """מריץ את המשימות לפי גרף התלויות ומחזיר את הפלט של המשימה האחרונה."""
+        outputs, self.context_usage = self._execute_graph(self.tasks, on_task_done=self.progress_callback, inputs=self.inputs)
+        final_task = list(self.tasks)[-1]
+        return outputs[final_task]
+
+    def run_batch(self, intelligence_context: str, user_actions, max_concurrency: int = None, on_branch=None):
+        """
+        מריץ סימולציה נפרדת לכל אחד מהמהלכים במקביל (עד max_concurrency ענפים בו-זמנית)
+        ומחזיר טבלת השוואה מדורגת - רשימת מילונים, מהטוב לגרוע.
+        התדריך מתומצת פעם אחת לפני הפיצול, וכל הענפים חולקים אותו כתחילית זהה של הפרומפט.
+        on_branch(branch) נקרא כשכל ענף מסתיים.
+        """
+        actions = list(dict.fromkeys(action.strip() for action in user_actions if action and action.strip()))
+        if not actions:
+            raise ValueError("No wargame actions were provided.")
+
+        with track_run("wargames_batch", self.workflow_name, self.model_name) as self.run_metrics:
+            for config in self.tasks_config.values():
+                self._briefing_for(config, intelligence_context)
+
+            limit = max_concurrency or int(os.getenv("WARGAME_MAX_CONCURRENCY", "4"))
+            with ThreadPoolExecutor(max_workers=min(limit, len(actions)), thread_name_prefix="wargame-branch") as pool:
+                futures = [pool.submit(copy_context().run, self._run_branch, intelligence_context, action, on_branch)
+                           for action in actions]
+                branches = [future.result() for future in futures]
+            return rank_branches(branches)
+
+    def _run_branch(self, intelligence_context: str, user_action: str, on_branch=None) -> dict:
+        """ענף אחד של run_batch. שגיאה בענף לא מפילה את שאר הענפים."""
+        try:
+            _, tasks = self._build_tasks(intelligence_context, user_action)
+            outputs, _ = self._execute_graph(tasks, inputs={'intelligence_context': intelligence_context,
+                                                            'user_action': user_action})
+            summary = outputs[list(tasks)[-1]]
+            branch = {
+                "action": user_action,
+                **parse_outcome_scores(summary),
+                "summary": summary,
+                "outputs": outputs,
+            }
+        except Exception as e:
+            print(f"Error during wargame branch '{user_action}': {e}")
+            branch = {"action": user_action, "error": str(e)}
+        if on_branch is not None:
+            on_branch(branch)
+        return branch
+
+    def run_turns(self, intelligence_context: str, user_action: str, max_turns: int = None,
+                  escalation_threshold: float = None, on_turn=None) -> GameState:
+        """
+        מריץ סימולציה רב-שלבית לפי turns.yaml: בכל תור Red מגיב, Blue מגיב בחזרה וה-game_master
+        מעדכן את מצב המשחק. כל קריאה מקבלת רק את התדריך המתומצת, את המצב המצטבר ואת המהלך
+        האחרון, כך שעלות התור לא גדלה עם אורך המשחק. המשחק נעצר מוקדם כשההסלמה עוברת את הסף
+        או כשהמצב מתכנס. on_turn(state) נקרא אחרי כל תור. מחזיר את GameState.
+        """
+        turns_config = self.workflow.turns_config
+        if not turns_config:
+            raise ValueError(f"No turns.yaml found for workflow '{self.workflow_name}'.")
+        settings = turns_config.get('settings') or {}
+        max_turns = max_turns or settings.get('max_turns', 6)
+        if escalation_threshold is None:
+            escalation_threshold = settings.get('escalation_threshold')
+
+        with track_run("wargames_turns", self.workflow_name, self.model_name) as self.run_metrics:
+            return self._play_turns(intelligence_context, user_action, max_turns, escalation_threshold,
+                                    settings, on_turn)
+
+    def _play_turns(self, intelligence_context, user_action, max_turns, escalation_threshold, settings, on_turn):
+        """לולאת התורות של run_turns."""
+        convergence_turns = settings.get('convergence_turns')
+        ledger_window = settings.get('ledger_window', 2)
+        max_summary_tokens = settings.get('max_summary_tokens', 600)
+
+        briefing = self._briefing_for(settings, intelligence_context)
+        agents = self._build_agents()
+        state = GameState(initial_action=user_action)
+        blue_move = user_action
+
+        for turn in range(1, max_turns + 1):
+            common = {
+                'turn': turn,
+                'max_turns': max_turns,
+                'briefing': briefing,
+                'game_state': state.to_prompt(ledger_window),
+                'max_summary_words': int(max_summary_tokens * 0.6),
+            }
+            prompts = []
+            red_move = self._run_turn_step('red_turn', agents, prompts, blue_move=blue_move, **common)
+            blue_move = self._run_turn_step('blue_turn', agents, prompts, red_move=red_move, **common)
+            adjudication = self._run_turn_step('adjudication_turn', agents, prompts,
+                                               red_move=red_move, blue_move=blue_move, **common)
+            state.apply_turn(turn, red_move, blue_move, adjudication, max_summary_tokens)
+            state.record_usage(turn, prompts)
+            if on_turn is not None:
+                on_turn(state)
+            state.stop_reason = state.check_stop(escalation_threshold, convergence_turns)
+            if state.stop_reason:
+                break
+        else:
+            state.stop_reason = "max_turns"
+        return state
+
+    def _run_turn_step(self, step_name: str, agents, prompts, **values) -> str:
+        """מריץ שלב אחד בתור (משימה בודדת ללא קונטקסט - כל מה שצריך כבר בתיאור)."""
+        config = self.workflow.turns_config.get(step_name)
+        if not config:
+            raise ValueError(f"Turn step '{step_name}' is missing from turns.yaml.")
+        description = config.get('description').format(**{'red_move': "", 'blue_move': "", **values})
+        prompts.append(description)
+        task = Task(
+            description=description,
+            expected_output=config.get('expected_output'),
+            agent=agents[config.get('agent')]
+        )
+        with track_task(step_name, config.get('agent')):
+            return execute_task(task)
+
+    def _briefing_for(self, config, intelligence_context: str) -> str:
+        """
+        מחזיר את תדריך המודיעין בגודל שהמשימה ביקשה (max_briefing_tokens).
+        התמצות נשמר במטמון, כך שהתדריך המלא נשלח פעם אחת והשאר מקבלות תקציר.
+        """
+        budget = config.get('max_briefing_tokens')
+        if not budget:
+            return intelligence_context
+        return get_compactor().compact(intelligence_context, budget, purpose="wargame simulation briefing")
+
+    def _on_crew_task(self, output):
+        """task_callback של Crew.kickoff: ממפה את המשימה שהסתיימה לשם שלה ב-YAML עבור המדדים ו-progress_callback."""
+        description = getattr(output, 'description', None)
+        name = next((name for name, task in self.tasks.items() if task.description == description), None)
+        # Process.sequential מריץ משימה אחת בכל פעם, כך שזמן המשימה הוא הזמן מאז שהקודמת הסתיימה
+        now = time.perf_counter()
+        metrics = current_run()
+        if metrics is not None and name is not None:
+            metrics.record_task(name, self.tasks_config[name].get('agent'), now - self._last_task_finished)
+        self._last_task_finished = now
+        if self.progress_callback is not None:
+            self.progress_callback(name, task_output_text(output))
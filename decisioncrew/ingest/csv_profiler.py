@@ -0,0 +1,292 @@
+# decisioncrew/ingest/csv_profiler.py
+
+import time
+import warnings
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    guess_datetime_format = None
+
+DEFAULT_CHUNKSIZE = 200_000
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+# עמודת טקסט נחשבת לתאריך אם לפחות 90% מהערכים בחלק הראשון מתפרשים כתאריך
+DATETIME_PARSE_RATIO = 0.9
+
+
+class _HyperLogLog:
+    """Fixed-size (2^p registers) approximate distinct counter over 64-bit hashes."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if hashes.size == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # אורך בביטים של rest, מחושב בשני חצאים של 32 ביט כדי שהמרה ל-float תהיה מדויקת
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        rho = np.minimum(64 - bit_length + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rho)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    kind: str
+    count: int = 0
+    nulls: int = 0
+    distinct_estimate: int = 0
+    minimum: Optional[object] = None
+    maximum: Optional[object] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    quantiles: dict = field(default_factory=dict)
+    top_values: list = field(default_factory=list)
+    trend: Optional[str] = None
+
+    @property
+    def null_rate(self) -> float:
+        total = self.count + self.nulls
+        return self.nulls / total if total else 0.0
+
+
+@dataclass
+class CsvProfile:
+    name: str
+    rows: int
+    columns: list
+    seconds: float
+    preview: pd.DataFrame = None
+
+    def to_text(self, preview_rows: int = 5) -> str:
+        """Compact Markdown digest of the whole file, for injecting into agent prompts."""
+        lines = [f"Rows: {self.rows:,} | Columns: {len(self.columns)} (profiled from the full file)", ""]
+        for column in self.columns:
+            header = f"- **{column.name}** [{column.kind}] nulls {column.null_rate:.1%}, ~{column.distinct_estimate:,} distinct"
+            details = []
+            if column.kind == "numeric" and column.count:
+                details.append(f"min {_fmt(column.minimum)}, max {_fmt(column.maximum)}, mean {_fmt(column.mean)}, std {_fmt(column.std)}")
+                if column.quantiles:
+                    details.append("quantiles " + ", ".join(f"p{int(q * 100)}={_fmt(v)}" for q, v in column.quantiles.items()))
+            elif column.kind == "datetime" and column.count:
+                details.append(f"range {column.minimum} → {column.maximum}")
+            if column.top_values:
+                details.append("top: " + ", ".join(f"{value} ({count:,})" for value, count in column.top_values))
+            if column.trend:
+                details.append(f"trend: {column.trend}")
+            lines.append(header + ("; " + "; ".join(details) if details else ""))
+        if self.preview is not None and preview_rows:
+            lines += ["", f"Sample rows (first {min(preview_rows, len(self.preview))}):", self.preview.head(preview_rows).to_string()]
+        return "\n".join(lines)
+
+    def to_context(self) -> str:
+        """The digest wrapped in the markers the 'combined' workflow looks for."""
+        return (f"--- START OF UPLOADED CSV DATA ('{self.name}') ---\n"
+                f"{self.to_text()}\n"
+                f"--- END OF UPLOADED CSV DATA ---")
+
+
+def _fmt(value) -> str:
+    if isinstance(value, (float, np.floating)):
+        return f"{value:,.4g}"
+    return str(value)
+
+
+class _ColumnAccumulator:
+    """Bounded-memory running statistics for one column."""
+
+    def __init__(self, name: str, kind: str, sample_size: int, top_k: int, rng: np.random.Generator,
+                 datetime_format: str = None):
+        self.name = name
+        self.kind = kind
+        self.datetime_format = datetime_format
+        self.sample_size = sample_size
+        self.top_k = top_k
+        self.rng = rng
+        self.count = 0
+        self.nulls = 0
+        self.hll = _HyperLogLog()
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+        self.counter = Counter()
+        self.periods = Counter()
+
+    def convert(self, series: pd.Series) -> pd.Series:
+        if self.kind == "numeric":
+            return pd.to_numeric(series, errors="coerce")
+        if self.kind == "datetime":
+            if self.datetime_format:
+                return pd.to_datetime(series, errors="coerce", format=self.datetime_format)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                return pd.to_datetime(series, errors="coerce")
+        return series
+
+    def update(self, series: pd.Series) -> pd.Series:
+        values = self.convert(series)
+        valid = values.dropna()
+        self.nulls += len(values) - len(valid)
+        self.count += len(valid)
+        if valid.empty:
+            return values
+        self.hll.add_hashes(pd.util.hash_pandas_object(valid, index=False).to_numpy())
+
+        if self.kind in ("numeric", "datetime"):
+            chunk_min, chunk_max = valid.min(), valid.max()
+            self.minimum = chunk_min if self.minimum is None else min(self.minimum, chunk_min)
+            self.maximum = chunk_max if self.maximum is None else max(self.maximum, chunk_max)
+
+        if self.kind == "numeric":
+            array = valid.to_numpy(dtype=np.float64)
+            self.total += float(array.sum())
+            self.total_sq += float(np.square(array).sum())
+            self._update_sample(array)
+        elif self.kind == "datetime":
+            self.periods.update(valid.dt.to_period("M").astype(str).value_counts().to_dict())
+        else:
+            # רק הערכים הנפוצים בכל חלק נספרים - מספיק לזיהוי top-k וחוסך מילון ענק בעמודות טקסט
+            self.counter.update(valid.astype(str).value_counts().head(self.top_k * 20).to_dict())
+            if len(self.counter) > self.top_k * 100:
+                self.counter = Counter(dict(self.counter.most_common(self.top_k * 20)))
+        return values
+
+    def _update_sample(self, array: np.ndarray):
+        """Bottom-k sample: keeps the values with the smallest random keys, i.e. a uniform sample of all rows."""
+        keys = np.concatenate([self.sample_keys, self.rng.random(len(array))])
+        values = np.concatenate([self.sample, array])
+        if len(values) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, values = keys[keep], values[keep]
+        self.sample_keys, self.sample = keys, values
+
+    def finish(self) -> ColumnProfile:
+        profile = ColumnProfile(name=self.name, kind=self.kind, count=self.count, nulls=self.nulls,
+                                distinct_estimate=min(self.hll.estimate(), self.count) if self.count else 0)
+        if self.kind == "numeric" and self.count:
+            mean = self.total / self.count
+            profile.minimum, profile.maximum, profile.mean = self.minimum, self.maximum, mean
+            profile.std = float(np.sqrt(max(self.total_sq / self.count - mean * mean, 0.0)))
+            profile.quantiles = dict(zip(QUANTILES, np.quantile(self.sample, QUANTILES)))
+        elif self.kind == "datetime" and self.count:
+            profile.minimum, profile.maximum = self.minimum, self.maximum
+            profile.trend = _period_trend(self.periods, unit="rows")
+        if self.kind in ("categorical", "text"):
+            profile.top_values = self.counter.most_common(self.top_k)
+        return profile
+
+
+def _period_trend(values_by_period: dict, unit: str) -> Optional[str]:
+    """Describes a per-month series: span, peak month and change between the first and last thirds."""
+    if len(values_by_period) < 2:
+        return None
+    periods = sorted(values_by_period)
+    series = [values_by_period[period] for period in periods]
+    third = max(1, len(series) // 3)
+    early, late = float(np.mean(series[:third])), float(np.mean(series[-third:]))
+    peak = max(periods, key=values_by_period.get)
+    change = f"{(late - early) / early:+.0%}" if early else "n/a"
+    return (f"{len(periods)} months {periods[0]}..{periods[-1]}, peak {peak} ({_fmt(values_by_period[peak])} {unit}), "
+            f"last third vs first third {change}")
+
+
+def _infer_kind(series: pd.Series):
+    """Returns (kind, datetime_format) for a column, judged from the first chunk."""
+    if pd.api.types.is_bool_dtype(series):
+        return "categorical", None
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric", None
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime", None
+    valid = series.dropna()
+    if valid.empty:
+        return "text", None
+    sample = valid.head(1000).astype(str)
+    if not sample.str.fullmatch(r"-?\d+(\.\d+)?").all():
+        # פורמט קבוע מאפשר המרה וקטורית מהירה במקום ניחוש לכל ערך
+        datetime_format = guess_datetime_format(sample.iloc[0]) if guess_datetime_format else None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            parsed = pd.to_datetime(sample, errors="coerce", format=datetime_format)
+        if parsed.notna().mean() >= DATETIME_PARSE_RATIO:
+            return "datetime", datetime_format
+    if valid.nunique() <= max(50, len(valid) // 20):
+        return "categorical", None
+    return "text", None
+
+
+def profile_csv(source, name: str = None, chunksize: int = DEFAULT_CHUNKSIZE, sample_size: int = 20_000,
+                top_k: int = 8, preview_rows: int = 20, seed: int = 0) -> CsvProfile:
+    """
+    Streams a CSV (path or binary/text file object) in chunks and returns a CsvProfile.
+    Memory use is bounded by chunksize plus small per-column sketches: a reservoir
+    sample for quantiles, a pruned counter for top values and a HyperLogLog for
+    distinct counts. Numeric columns also get per-month trends against the first
+    datetime column.
+    """
+    started = time.monotonic()
+    rng = np.random.default_rng(seed)
+    name = name or getattr(source, "name", None) or str(source)
+    accumulators = None
+    time_column = None
+    monthly_sums = {}
+    rows = 0
+    preview = None
+
+    reader = pd.read_csv(source, chunksize=chunksize, encoding_errors="replace", low_memory=True)
+    for chunk in reader:
+        if accumulators is None:
+            preview = chunk.head(preview_rows).copy()
+            accumulators = {}
+            for column in chunk.columns:
+                kind, datetime_format = _infer_kind(chunk[column])
+                accumulators[column] = _ColumnAccumulator(str(column), kind, sample_size, top_k, rng,
+                                                          datetime_format=datetime_format)
+            time_column = next((column for column, acc in accumulators.items() if acc.kind == "datetime"), None)
+        rows += len(chunk)
+
+        converted = {column: accumulators[column].update(chunk[column]) for column in chunk.columns if column in accumulators}
+        if time_column is not None:
+            months = converted[time_column].dt.to_period("M")
+            for column, acc in accumulators.items():
+                if acc.kind != "numeric":
+                    continue
+                grouped = converted[column].groupby(months).agg(["sum", "count"])
+                sums = monthly_sums.setdefault(column, {})
+                for period, (total, count) in grouped.iterrows():
+                    previous = sums.get(str(period), (0.0, 0))
+                    sums[str(period)] = (previous[0] + total, previous[1] + count)
+
+    columns = []
+    for column, acc in (accumulators or {}).items():
+        profile = acc.finish()
+        if column in monthly_sums:
+            means = {period: total / count for period, (total, count) in monthly_sums[column].items() if count}
+            profile.trend = _period_trend(means, unit=f"mean by {time_column}")
+        columns.append(profile)
+
+    return CsvProfile(name=name, rows=rows, columns=columns, seconds=time.monotonic() - started, preview=preview)
@@ -0,0 +1,83 @@
+# decisioncrew/llm/adapter.py
+
+import threading
+from typing import Any, Optional
+
+from langchain_core.messages import convert_to_messages
+
+from decisioncrew.runtime.metrics import track_agent
+
+try:
+    from crewai.llms.base_llm import BaseLLM
+except ImportError:
+    # crewai לפני 1.0 מקבל מודלים של LangChain כמו שהם
+    BaseLLM = None
+
+_adapters = {}
+_lock = threading.Lock()
+
+
+if BaseLLM is not None:
+
+    class LangChainLLM(BaseLLM):
+        """
+        crewai BaseLLM that forwards every call to one of our pooled LangChain chat models,
+        so the response cache, metrics callbacks, rate-limit scheduler and routing of the
+        LangChain layer apply to crewai agents too. Tool use stays in crewai's ReAct text format.
+        Calls are attributed to agent in the run metrics, including on the sequential
+        Crew.kickoff path, where no task-graph executor sets the current agent.
+        """
+
+        client: Any = None
+        agent: Optional[str] = None
+        llm_type: str = "langchain"
+
+        @property
+        def _identifying_params(self) -> dict:
+            return dict(getattr(self.client, "_identifying_params", None) or {"model": self.model})
+
+        def _messages(self, messages):
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+            return convert_to_messages([{"role": m["role"], "content": m.get("content") or ""} for m in messages])
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None,
+                 from_agent=None, response_model=None):
+            stop = list(self.stop_sequences) or None
+            with track_agent(self.agent):
+                return self.client.invoke(self._messages(messages), stop=stop).content
+
+        async def acall(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None,
+                        from_agent=None, response_model=None):
+            stop = list(self.stop_sequences) or None
+            with track_agent(self.agent):
+                return (await self.client.ainvoke(self._messages(messages), stop=stop)).content
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def supports_stop_words(self) -> bool:
+            return True
+
+        def get_context_window_size(self) -> int:
+            return 128000
+
+
+def as_crew_llm(client, agent: str = None):
+    """
+    Returns what to pass to crewai's Agent(llm=...) for a pooled LangChain client: the client
+    itself on crewai versions that accept LangChain models, otherwise one shared LangChainLLM
+    adapter per client and agent, which attributes the calls to agent in the run metrics.
+    """
+    if BaseLLM is None or isinstance(client, BaseLLM):
+        return client
+    key = (id(client), agent)
+    adapter = _adapters.get(key)
+    if adapter is not None:
+        return adapter
+    with _lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            model = getattr(client, "model_name", None) or getattr(client, "model", None) or "langchain"
+            adapter = _adapters[key] = LangChainLLM(model=model, client=client, agent=agent)
+    return adapter
@@ -0,0 +1,176 @@
+# decisioncrew/llm/cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from decisioncrew.runtime.metrics import record_cache
+
+# אחרי כמה כתיבות מריצים ניקוי (eviction) של המטמון
+EVICT_EVERY = 50
+
+
+class SQLiteLRUCache(BaseCache):
+    """
+    Persistent, content-addressed LLM response cache for LangChain chat models.
+
+    Entries are keyed by a hash of the llm_string (model name + parameters) and the
+    serialized prompt (the exact message list). Entries older than max_age_seconds are
+    dropped, and the least recently used entries are evicted once the cache grows past
+    max_bytes or max_entries.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, max_entries: int = None,
+                 max_age_seconds: float = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, response TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(llm_string.encode('utf-8'))
+        digest.update(b"\x00")
+        digest.update(prompt.encode('utf-8'))
+        return digest.hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.max_age_seconds is not None and now - row[1] > self.max_age_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        response = None
+        if row is not None:
+            try:
+                response = loads(row[0])
+            except Exception:
+                # רשומה פגומה או מגרסה ישנה של langchain - מתייחסים אליה כהחטאה
+                response = None
+        # פגיעה נספרת רק אחרי שהרשומה נטענה בהצלחה
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache("llm", hit=response is not None)
+        return response
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = self.make_key(prompt, llm_string)
+        response = dumps(list(return_val))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, response, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_string, response, len(response.encode('utf-8')), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict_locked()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def evict(self):
+        """Applies the age and size limits now."""
+        with self._lock:
+            self._evict_locked()
+
+    def _evict_locked(self):
+        if self.max_age_seconds is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.max_age_seconds,))
+
+        total_bytes, total_entries = self._conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM llm_cache").fetchone()
+        over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+        over_entries = self.max_entries is not None and total_entries > self.max_entries
+        if over_bytes or over_entries:
+            # שומרים את הרשומות שנגעו בהן לאחרונה עד שמגיעים לגבולות
+            keep, kept_bytes = [], 0
+            for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed DESC"):
+                if self.max_bytes is not None and kept_bytes + size > self.max_bytes:
+                    break
+                if self.max_entries is not None and len(keep) >= self.max_entries:
+                    break
+                keep.append(key)
+                kept_bytes += size
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS llm_cache_keep (key TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM llm_cache_keep")
+            self._conn.executemany("INSERT INTO llm_cache_keep (key) VALUES (?)", ((key,) for key in keep))
+            self._conn.execute("DELETE FROM llm_cache WHERE key NOT IN (SELECT key FROM llm_cache_keep)")
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def llm_cache_enabled(workflow_name: str, enabled: bool = None) -> bool:
+    """
+    Whether a workflow's crews read and write the response cache, falling back to the
+    LLM_CACHE_BYPASS env var: a comma-separated list of workflow names (or '*' for all) that always run live.
+    """
+    if enabled is not None:
+        return enabled
+    bypassed = {name.strip() for name in os.getenv("LLM_CACHE_BYPASS", "").split(",") if name.strip()}
+    return not ("*" in bypassed or workflow_name in bypassed)
+
+
+def get_llm_cache():
+    """
+    Returns the process-wide response cache, or None when caching is not enabled.
+    The cache is opt-in: set LLM_CACHE_PATH (e.g. '.cache/llm_cache.sqlite').
+    LLM_CACHE_MAX_MB and LLM_CACHE_MAX_AGE_HOURS control eviction.
+    """
+    global _cache
+    path = os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_age_hours = os.getenv("LLM_CACHE_MAX_AGE_HOURS")
+                _cache = SQLiteLRUCache(
+                    path,
+                    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                    max_age_seconds=float(max_age_hours) * 3600 if max_age_hours else None,
+                )
+    return _cache
@@ -0,0 +1,92 @@
+# decisioncrew/llm/fake.py
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# מילים שמהן נבנית תשובה דטרמיניסטית
+_VOCABULARY = (
+    "assessment", "evidence", "source", "indicator", "forecast", "risk", "actor", "region",
+    "likely", "unlikely", "corroborated", "reported", "capability", "intent", "escalation",
+)
+# כלים שמופיעים בפרומפט של crewai ("Tool Name: ...\nTool Arguments: ...\nTool Description: ...")
+_TOOL_BLOCK = re.compile(r"Tool Name:\s*(.+?)\s*\nTool Arguments:\s*(.*?)\nTool Description:", re.DOTALL)
+_FIRST_ARGUMENT = (
+    re.compile(r'"properties"\s*:\s*\{\s*"(\w+)"'),
+    re.compile(r"\{\s*['\"](\w+)['\"]\s*:"),
+)
+
+
+def fake_answer(prompt: str, completion_tokens: int = 64, tool_calls: bool = False):
+    """Returns the deterministic (text, token usage) answer to a prompt; shared with the fake HTTP endpoint."""
+    seed = hashlib.sha256(prompt.encode('utf-8')).digest()
+    words = [_VOCABULARY[seed[i % len(seed)] % len(_VOCABULARY)] for i in range(completion_tokens)]
+    # ההוראות של crewai מכילות "Observation: the result of the action"; כל Observation נוסף הוא תוצאה של כלי
+    observed = prompt.count("Observation:") > prompt.count("Observation: the result of the action")
+    tools = _TOOL_BLOCK.findall(prompt) if tool_calls and not observed else []
+    if tools:
+        tool_name, arguments = tools[seed[0] % len(tools)]
+        argument = next((match.group(1) for pattern in _FIRST_ARGUMENT for match in [pattern.search(arguments)] if match), None)
+        action_input = json.dumps({argument: " ".join(words[:4])} if argument else {})
+        text = f"Thought: I should look this up\nAction: {tool_name}\nAction Input: {action_input}"
+    else:
+        text = "Thought: I now can give a great answer\nFinal Answer: " + " ".join(words)
+    usage = {
+        "prompt_tokens": max(1, len(prompt) // 4),
+        "completion_tokens": completion_tokens,
+        "total_tokens": max(1, len(prompt) // 4) + completion_tokens,
+    }
+    return text, usage
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model. The same message list always produces the same
+    answer, after an optional artificial latency. Answers use the ReAct 'Final Answer:'
+    format so crewai agents finish in a single step. With tool_calls=True, an agent
+    that has tools first calls one of them once, so tool overhead is exercised too.
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.0
+    completion_tokens: int = 64
+    tool_calls: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "completion_tokens": self.completion_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = "\n".join(str(message.content) for message in messages)
+        text, usage = fake_answer(prompt, self.completion_tokens, self.tool_calls)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=text))],
+            llm_output={"token_usage": usage, "model_name": self.model_name},
+        )
+
+
+def make_fake_llm(model_name: str, **params) -> FakeChatModel:
+    """Builds a fake model; FAKE_LLM_LATENCY, FAKE_LLM_TOKENS and FAKE_LLM_TOOL_CALLS set the defaults."""
+    # פרמטרים של ChatOpenAI מבלוק ה-llm של סוכן: max_tokens קובע את אורך התשובה, השאר לא רלוונטיים
+    if params.get("max_tokens"):
+        params.setdefault("completion_tokens", params["max_tokens"])
+    for key in ("max_tokens", "temperature", "timeout", "max_retries"):
+        params.pop(key, None)
+    params.setdefault("latency", float(os.getenv("FAKE_LLM_LATENCY", "0")))
+    params.setdefault("completion_tokens", int(os.getenv("FAKE_LLM_TOKENS", "64")))
+    params.setdefault("tool_calls", os.getenv("FAKE_LLM_TOOL_CALLS", "0").strip().lower() in ("1", "true", "yes", "on"))
+    return FakeChatModel(model_name=model_name, **params)
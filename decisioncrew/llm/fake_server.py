@@ -0,0 +1,147 @@
+# decisioncrew/llm/fake_server.py
+"""
+Local OpenAI-compatible chat endpoint for exercising the LLM scheduler offline.
+
+    python -m decisioncrew.llm.fake_server --port 8790 --error-rate 0.3 --rpm 60
+
+Answers POST /v1/chat/completions with the deterministic fake answer (streamed as
+server-sent events when the request sets "stream"), and returns
+HTTP 429 (with a Retry-After header) for a random share of requests and for every
+request over its own requests/min limit. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:8790/v1 and any OPENAI_API_KEY.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from decisioncrew.llm.fake import fake_answer
+
+
+class FakeEndpoint(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, error_rate=0.0, rpm=None, latency=0.0, completion_tokens=64, retry_after=1, seed=None):
+        super().__init__(address, _Handler)
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0}
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        """Counts the request; False means it should get a 429."""
+        now = time.monotonic()
+        with self._lock:
+            self.stats["requests"] += 1
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            limited = (self.rpm is not None and len(self._recent) >= self.rpm) or self.random.random() < self.error_rate
+            if limited:
+                self.stats["rate_limited"] += 1
+                return False
+            self._recent.append(now)
+            self.stats["ok"] += 1
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        server = self.server
+        if not server.admit():
+            self._send(429, {"error": {"message": "Rate limit reached (fake endpoint).", "type": "rate_limit_error",
+                                       "code": "rate_limit_exceeded"}},
+                       headers={"Retry-After": str(server.retry_after)})
+            return
+        if server.latency:
+            time.sleep(server.latency)
+        prompt = "\n".join(str(message.get("content") or "") for message in request.get("messages", []))
+        text, usage = fake_answer(prompt, request.get("max_tokens") or server.completion_tokens)
+        if request.get("stream"):
+            self._send_stream(request, text, usage)
+            return
+        self._send(200, {
+            "id": f"chatcmpl-fake-{server.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _send_stream(self, request, text, usage):
+        """Sends the answer as server-sent events, one chunk per word, like a streamed chat completion."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        base = {"id": f"chatcmpl-fake-{self.server.stats['requests']}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "fake")}
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        chunk = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self.wfile.write(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        # שקט בקונסול - הסטטיסטיקה נשמרת ב-server.stats
+        pass
+
+
+def start_fake_endpoint(port: int = 0, **options) -> FakeEndpoint:
+    """Starts the endpoint on a background thread; server.server_address[1] is the chosen port."""
+    server = FakeEndpoint(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible endpoint that injects 429 errors.")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--error-rate", type=float, default=0.2, help="Share of requests answered with a 429.")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests/min before every request gets a 429.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per successful answer.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After header value, in seconds.")
+    args = parser.parse_args(argv)
+    server = FakeEndpoint(("127.0.0.1", args.port), error_rate=args.error_rate, rpm=args.rpm,
+                          latency=args.latency, retry_after=args.retry_after)
+    print(f"Fake OpenAI endpoint on http://127.0.0.1:{args.port}/v1 (error rate {args.error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
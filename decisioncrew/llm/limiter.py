@@ -0,0 +1,389 @@
+# decisioncrew/llm/limiter.py
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_openai import ChatOpenAI
+
+# נתיבי עדיפות: ריצות אינטראקטיביות מה-UI עוקפות ריצות batch שממתינות
+PRIORITY_LANES = {"interactive": 0, "batch": 1}
+DEFAULT_LANE = "interactive"
+# הערכת אורך התשובה עבור דלי הטוקנים, כשלא הוגדר max_tokens
+DEFAULT_COMPLETION_ESTIMATE = 512
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+
+_lane = ContextVar("decisioncrew_llm_lane", default=DEFAULT_LANE)
+
+
+@contextmanager
+def priority_lane(lane: str):
+    """
+    Runs the LLM calls made inside the block (and in threads copying this context) in the given lane.
+    Lanes order the calls of one process's scheduler; other processes (e.g. batch workers) are not affected.
+    """
+    if lane not in PRIORITY_LANES:
+        raise ValueError(f"Unknown priority lane '{lane}'. Expected one of: {', '.join(PRIORITY_LANES)}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class RetryBudgetExceeded(RuntimeError):
+    """Raised instead of retrying when recent calls have already used up the retry budget."""
+
+
+class TokenBucket:
+    """A refilling bucket of per-minute capacity; reserve() returns how long the caller must wait."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        # בקשה גדולה מהקיבולת עדיין עוברת - היא פשוט מחכה עד שהדלי מתמלא
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount: float):
+        """Corrects an earlier reservation once the real usage is known (positive = used more)."""
+        self.level -= amount
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: Exception) -> float:
+    """The server's Retry-After hint in seconds, or 0."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_acquire_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-acquire")
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of every chat model call:
+    - token buckets for requests/min and tokens/min (None = unlimited)
+    - adaptive concurrency: the limit grows by ~1 per window of successes and halves on
+      a 429 (AIMD), between min_concurrency and max_concurrency
+    - retries with full-jitter exponential backoff, honouring Retry-After, limited by a
+      retry budget (each call earns retry_ratio retries, up to retry_burst banked)
+    - priority lanes: waiting calls are admitted lowest lane first, then FIFO
+    The scheduler is per process; nothing is coordinated between processes.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, max_concurrency: int = 8, min_concurrency: int = 1,
+                 max_retries: int = 6, retry_ratio: float = 0.2, retry_burst: float = 10,
+                 base_delay: float = 0.5, max_delay: float = 30.0):
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.retry_ratio = retry_ratio
+        self.retry_burst = retry_burst
+        self.retry_tokens = retry_burst
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "budget_exhausted": 0, "wait_seconds": 0.0}
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _acquire(self, lane: str, estimated_tokens: float) -> float:
+        """Waits for this call's turn and a free slot; returns the rate-limit delay it must still sleep."""
+        ticket = (PRIORITY_LANES[lane], next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or self.in_flight >= int(self.limit):
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            delay = 0.0
+            if self.request_bucket is not None:
+                delay = max(delay, self.request_bucket.reserve(1))
+            if self.token_bucket is not None:
+                delay = max(delay, self.token_bucket.reserve(estimated_tokens))
+            self._condition.notify_all()
+        return delay
+
+    def _release(self, throttled: bool):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _take_retry_token(self) -> bool:
+        with self._condition:
+            if self.retry_tokens < 1:
+                self.stats["budget_exhausted"] += 1
+                return False
+            self.retry_tokens -= 1
+            self.stats["retries"] += 1
+            return True
+
+    def _begin(self) -> str:
+        """Counts a new call, earns its share of the retry budget and returns its lane."""
+        with self._condition:
+            self.stats["calls"] += 1
+            self.retry_tokens = min(self.retry_burst, self.retry_tokens + self.retry_ratio)
+        return _lane.get()
+
+    def _waited(self, delay: float):
+        with self._condition:
+            self.stats["wait_seconds"] += delay
+
+    def _throttled(self, error: Exception, started: bool = False) -> bool:
+        """Whether error is a retryable failure; anything else (or a stream that already yielded) is re-raised."""
+        if started or not is_retryable(error):
+            return False
+        with self._condition:
+            self.stats["throttled"] += 1
+        return True
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """The delay before retry number attempt, or raises error when no retry is left."""
+        if attempt > self.max_retries:
+            raise error
+        if not self._take_retry_token():
+            raise RetryBudgetExceeded(f"LLM retry budget exhausted after a retryable error: {error}") from error
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(backoff, retry_after(error))
+
+    def _account(self, result, estimated_tokens: float, usage_of):
+        if usage_of is not None and self.token_bucket is not None:
+            used = usage_of(result)
+            if used:
+                with self._condition:
+                    self.token_bucket.adjust(used - estimated_tokens)
+
+    async def _aacquire(self, lane: str, estimated_tokens: float) -> float:
+        """_acquire() on a worker thread, so waiting for a slot does not block the event loop."""
+        # executor נפרד: ב-executor של ה-loop ה-threads הממתינים היו חוסמים את ה-DNS של httpx
+        waiter = asyncio.get_running_loop().run_in_executor(_acquire_executor, self._acquire, lane, estimated_tokens)
+        try:
+            return await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # המשבצת עוד תתקבל ב-thread - משחררים אותה כשזה קורה
+            waiter.add_done_callback(lambda done: done.cancelled() or done.exception() or self._release(False))
+            raise
+
+    def call(self, fn, estimated_tokens: float = 0, usage_of=None):
+        """
+        Runs fn() under the limits and retries retryable errors. usage_of(result) may return
+        the real token usage, which corrects the tokens/min bucket.
+        """
+        lane = self._begin()
+        attempt = 0
+        while True:
+            delay = self._acquire(lane, estimated_tokens)
+            throttled = False
+            try:
+                if delay:
+                    self._waited(delay)
+                    time.sleep(delay)
+                result = fn()
+            except Exception as e:
+                if not self._throttled(e):
+                    raise
+                throttled, error = True, e
+            finally:
+                self._release(throttled)
+
+            if not throttled:
+                self._account(result, estimated_tokens, usage_of)
+                return result
+            attempt += 1
+            time.sleep(self._backoff(attempt, error))
+
+    async def acall(self, fn, estimated_tokens: float = 0, usage_of=None):
+        """call() for a coroutine function: await fn() under the same limits and retries."""
+        lane = self._begin()
+        attempt = 0
+        while True:
+            delay = await self._aacquire(lane, estimated_tokens)
+            throttled = False
+            try:
+                if delay:
+                    self._waited(delay)
+                    await asyncio.sleep(delay)
+                result = await fn()
+            except Exception as e:
+                if not self._throttled(e):
+                    raise
+                throttled, error = True, e
+            finally:
+                self._release(throttled)
+
+            if not throttled:
+                self._account(result, estimated_tokens, usage_of)
+                return result
+            attempt += 1
+            await asyncio.sleep(self._backoff(attempt, error))
+
+    def stream(self, start, estimated_tokens: float = 0):
+        """
+        call() for a streamed response: yields the chunks of start()'s iterator. The slot is
+        held until the stream ends; only errors raised before the first chunk are retried.
+        """
+        lane = self._begin()
+        attempt = 0
+        while True:
+            delay = self._acquire(lane, estimated_tokens)
+            throttled = started = False
+            try:
+                if delay:
+                    self._waited(delay)
+                    time.sleep(delay)
+                for chunk in start():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if not self._throttled(e, started):
+                    raise
+                throttled, error = True, e
+            finally:
+                self._release(throttled)
+            attempt += 1
+            time.sleep(self._backoff(attempt, error))
+
+    async def astream(self, start, estimated_tokens: float = 0):
+        """stream() for an async iterator."""
+        lane = self._begin()
+        attempt = 0
+        while True:
+            delay = await self._aacquire(lane, estimated_tokens)
+            throttled = started = False
+            try:
+                if delay:
+                    self._waited(delay)
+                    await asyncio.sleep(delay)
+                async for chunk in start():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if not self._throttled(e, started):
+                    raise
+                throttled, error = True, e
+            finally:
+                self._release(throttled)
+            attempt += 1
+            await asyncio.sleep(self._backoff(attempt, error))
+
+
+def _optional_float(name: str):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    The process-wide scheduler, configured from LLM_RPM, LLM_TPM, LLM_MAX_CONCURRENCY
+    (default 8), LLM_MAX_RETRIES (default 6) and LLM_RETRY_BUDGET (default 0.2).
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = LLMScheduler(
+                    rpm=_optional_float("LLM_RPM"),
+                    tpm=_optional_float("LLM_TPM"),
+                    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "6")),
+                    retry_ratio=float(os.getenv("LLM_RETRY_BUDGET", "0.2")),
+                )
+    return _default_scheduler
+
+
+def _estimate_tokens(messages, max_tokens) -> float:
+    # הערכה זולה (~4 תווים לטוקן); השימוש האמיתי מתקן את הדלי אחרי התשובה
+    characters = sum(len(str(message.content)) for message in messages)
+    return characters / 4 + (max_tokens or DEFAULT_COMPLETION_ESTIMATE)
+
+
+def _total_tokens(result) -> Optional[float]:
+    usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+class ScheduledChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI whose calls (sync, async and streamed) go through the process-wide
+    LLMScheduler. Create it with max_retries=0 so the OpenAI client does not retry on
+    its own behind the scheduler.
+    """
+
+    def _estimate(self, messages, kwargs) -> float:
+        return _estimate_tokens(messages, kwargs.get("max_tokens") or self.max_tokens)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any):
+        parent = super()._generate
+        return get_llm_scheduler().call(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            estimated_tokens=self._estimate(messages, kwargs),
+            usage_of=_total_tokens,
+        )
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any):
+        parent = super()._agenerate
+        return await get_llm_scheduler().acall(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            estimated_tokens=self._estimate(messages, kwargs),
+            usage_of=_total_tokens,
+        )
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any):
+        parent = super()._stream
+        yield from get_llm_scheduler().stream(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            estimated_tokens=self._estimate(messages, kwargs),
+        )
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any):
+        parent = super()._astream
+        async for chunk in get_llm_scheduler().astream(
+                lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+                estimated_tokens=self._estimate(messages, kwargs)):
+            yield chunk
@@ -0,0 +1,88 @@
+# decisioncrew/llm/pool.py
+
+import os
+import threading
+
+from decisioncrew.llm.cache import get_llm_cache
+from decisioncrew.llm.fake import make_fake_llm
+from decisioncrew.llm.limiter import ScheduledChatOpenAI
+from decisioncrew.llm.routing import latency_tracker, log_route, select_model
+from decisioncrew.runtime.metrics import metrics_handler
+
+DEFAULT_MODEL_NAME = "gpt-4o"
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def default_model_name() -> str:
+    """Returns the model configured in the MODEL_NAME env var."""
+    return os.getenv("MODEL_NAME", DEFAULT_MODEL_NAME)
+
+
+def llm_streaming() -> bool:
+    """CREW_LLM_STREAMING=0 turns off streamed OpenAI responses (on by default, so time to first token is measured)."""
+    return os.getenv("CREW_LLM_STREAMING", "1").strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def _pool_key(model_name: str, params: dict):
+    return (model_name, tuple(sorted(params.items())))
+
+
+def get_llm(model_name: str = None, use_cache: bool = True, **params):
+    """
+    Returns a process-wide chat model client for the given model and parameters.
+    Clients are created once and shared between crews, so their HTTP connection
+    pools are reused across runs and Streamlit sessions. Every client reports its
+    calls to the run metrics (decisioncrew/runtime/metrics.py), and OpenAI clients
+    send them through the process-wide rate-limit scheduler (decisioncrew/llm/limiter.py),
+    which also owns retries. OpenAI clients stream their responses (CREW_LLM_STREAMING),
+    which keeps the cache and the scheduler in the path and lets the metrics record
+    the time to first token.
+
+    When the response cache is enabled (LLM_CACHE_PATH), the client reads and writes it
+    unless use_cache is False. Model names starting with 'fake' return the offline
+    FakeChatModel.
+    """
+    model_name = model_name or default_model_name()
+    cache = get_llm_cache()
+    if not use_cache:
+        params["cache"] = False
+    elif cache is not None:
+        params["cache"] = cache
+    key = _pool_key(model_name, params)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if model_name.startswith("fake"):
+                client = make_fake_llm(model_name, callbacks=[metrics_handler, latency_tracker], **params)
+            else:
+                params.setdefault("max_retries", 0)
+                if llm_streaming():
+                    params.setdefault("streaming", True)
+                    params.setdefault("stream_usage", True)
+                client = ScheduledChatOpenAI(model=model_name, callbacks=[metrics_handler, latency_tracker], **params)
+            _clients[key] = client
+    return client
+
+
+def get_agent_llm(agent_name: str, route=None, default_model: str = None, use_cache: bool = True):
+    """
+    Returns the pooled client for one agent, following its 'llm:' block in agents.yaml
+    (model, temperature, max_tokens, timeout, and a fallback chain used when the
+    agent's recent latency exceeds its latency_slo). The decision is logged.
+    """
+    default_model = default_model or default_model_name()
+    model_name, reason = select_model(agent_name, route, default_model)
+    log_route(agent_name, model_name, reason)
+    params = route.params() if route is not None and reason not in ("default", "offline") else {}
+    return get_llm(model_name, use_cache=use_cache, **params)
+
+
+def clear_pool():
+    """Drops all pooled clients (e.g. after rotating API keys)."""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,176 @@
+# decisioncrew/llm/routing.py
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from decisioncrew.runtime.metrics import console_verbose, current_agent, current_run, totals
+
+# המפתחות המותרים בבלוק 'llm:' של סוכן ב-agents.yaml
+LLM_CONFIG_KEYS = ("model", "temperature", "max_tokens", "timeout", "fallback", "latency_slo")
+DEFAULT_EWMA_ALPHA = 0.3
+# אחרי כמה זמן בלי מדידה חדשה מנסים שוב את המודל הראשי, כדי שלא נתקע על ה-fallback לתמיד
+DEFAULT_PROBE_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class LLMRoute:
+    """A compiled 'llm:' block of one agent."""
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+    fallback: tuple = ()
+    latency_slo: Optional[float] = None
+
+    def params(self) -> dict:
+        """Client parameters for get_llm; unset values keep the client defaults."""
+        return {key: value for key, value in (("temperature", self.temperature), ("max_tokens", self.max_tokens),
+                                              ("timeout", self.timeout)) if value is not None}
+
+
+def parse_llm_config(agent_name: str, config) -> Optional[LLMRoute]:
+    """Validates an agent's 'llm:' block; raises ValueError on unknown keys or bad values."""
+    if config is None:
+        return None
+    if isinstance(config, str):
+        # קיצור: 'llm: gpt-4o-mini'
+        config = {"model": config}
+    if not hasattr(config, "items"):
+        raise ValueError(f"'llm' of agent '{agent_name}' must be a mapping or a model name, got {config!r}")
+    unknown = set(config) - set(LLM_CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown key(s) {', '.join(sorted(unknown))} in 'llm' of agent '{agent_name}'. "
+                         f"Expected: {', '.join(LLM_CONFIG_KEYS)}")
+    for key in ("temperature", "timeout", "latency_slo"):
+        value = config.get(key)
+        if value is not None and (not isinstance(value, (int, float)) or value < 0):
+            raise ValueError(f"'llm.{key}' of agent '{agent_name}' must be a non-negative number, got {value!r}")
+    max_tokens = config.get("max_tokens")
+    if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens <= 0):
+        raise ValueError(f"'llm.max_tokens' of agent '{agent_name}' must be a positive integer, got {max_tokens!r}")
+    fallback = config.get("fallback") or ()
+    if isinstance(fallback, str):
+        fallback = (fallback,)
+    if not all(isinstance(model, str) and model for model in fallback):
+        raise ValueError(f"'llm.fallback' of agent '{agent_name}' must be a model name or a list of model names")
+    if fallback and config.get("latency_slo") is None:
+        print(f"Warning: agent '{agent_name}' has an llm.fallback but no llm.latency_slo; the fallback will never be used.")
+    return LLMRoute(
+        model=config.get("model"),
+        temperature=config.get("temperature"),
+        max_tokens=max_tokens,
+        timeout=config.get("timeout"),
+        fallback=tuple(fallback),
+        latency_slo=config.get("latency_slo"),
+    )
+
+
+def routing_enabled() -> bool:
+    """LLM_ROUTING=0 sends every agent to MODEL_NAME, ignoring the 'llm:' blocks."""
+    return os.getenv("LLM_ROUTING", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class LatencyTracker(BaseCallbackHandler):
+    """
+    langchain callback keeping an exponentially weighted moving average of call latency
+    per (agent, model), and per model for calls made outside a tracked task. Averages
+    older than probe_seconds are treated as unknown, so a model that was slow gets
+    tried again.
+    """
+
+    def __init__(self, alpha: float = DEFAULT_EWMA_ALPHA, probe_seconds: float = DEFAULT_PROBE_SECONDS):
+        self.alpha = alpha
+        self.probe_seconds = probe_seconds
+        self._averages = {}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (kwargs.get("metadata") or {}).get("ls_model_name")
+        with self._lock:
+            self._calls[run_id] = (current_agent(), model, time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is not None and call[1]:
+            self.observe(call[0], call[1], time.perf_counter() - call[2])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._calls.pop(run_id, None)
+
+    def observe(self, agent: str, model: str, seconds: float):
+        with self._lock:
+            previous = self._averages.get((agent, model))
+            average = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous[0]
+            self._averages[(agent, model)] = (average, time.monotonic())
+
+    def latency(self, agent: str, model: str) -> Optional[float]:
+        """The agent's recent average latency on the model, or None if unknown or stale."""
+        with self._lock:
+            entry = self._averages.get((agent, model)) or self._averages.get((None, model))
+        if entry is None or time.monotonic() - entry[1] > self.probe_seconds:
+            return None
+        return entry[0]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {f"{agent}/{model}": round(average, 3) for (agent, model), (average, _) in self._averages.items()}
+
+
+latency_tracker = LatencyTracker(
+    alpha=float(os.getenv("LLM_LATENCY_EWMA_ALPHA", DEFAULT_EWMA_ALPHA)),
+    probe_seconds=float(os.getenv("LLM_ROUTE_PROBE_SECONDS", DEFAULT_PROBE_SECONDS)),
+)
+
+
+def select_model(agent_name: str, route: Optional[LLMRoute], default_model: str):
+    """
+    Chooses the model for an agent: its 'llm.model' (or the default), unless that
+    model's recent latency for the agent is over 'llm.latency_slo', in which case the
+    first fallback within the SLO (or with no measurements yet) is used. When every
+    candidate is over the SLO, the fastest one is used. Returns (model, reason).
+    """
+    if route is None or not routing_enabled():
+        return default_model, "default"
+    if default_model.startswith("fake"):
+        # ריצה אופליין - לא שולחים סוכנים למודלים אמיתיים
+        return default_model, "offline"
+    primary = route.model or default_model
+    if route.latency_slo is None or not route.fallback:
+        return primary, "configured"
+    measured = []
+    for position, model in enumerate((primary,) + route.fallback):
+        latency = latency_tracker.latency(agent_name, model)
+        if latency is None or latency <= route.latency_slo:
+            if position == 0:
+                return model, "within SLO" if latency is not None else "configured"
+            slowest = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in measured)
+            return model, f"fallback: {slowest} over the {route.latency_slo:g}s SLO"
+        measured.append((model, latency))
+    model, latency = min(measured, key=lambda item: item[1])
+    return model, f"all models over the {route.latency_slo:g}s SLO, using the fastest ({latency:.1f}s)"
+
+
+def log_route(agent_name: str, model: str, reason: str):
+    """Records a routing decision in the run metrics and prints fallbacks (and, when verbose, every decision)."""
+    totals.add("decisioncrew_llm_routes_total", {"agent": agent_name, "model": model,
+                                                 "fallback": str(reason.startswith(("fallback", "all models"))).lower()})
+    metrics = current_run()
+    if metrics is not None:
+        metrics.record_route(agent_name, model, reason)
+    if reason.startswith(("fallback", "all models")) or console_verbose():
+        print(f"[routing] agent '{agent_name}' -> {model} ({reason})")
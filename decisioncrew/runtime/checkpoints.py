@@ -0,0 +1,161 @@
+# decisioncrew/runtime/checkpoints.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+
+from decisioncrew.runtime.metrics import record_cache
+
+CHECKPOINT_PATH = os.path.join(".cache", "checkpoints.sqlite")
+DEFAULT_MAX_AGE_HOURS = 24
+
+
+def checkpoints_enabled(enabled: bool = None) -> bool:
+    """Returns whether to checkpoint task outputs, falling back to the CREW_CHECKPOINTS env var (off by default)."""
+    if enabled is not None:
+        return enabled
+    return os.getenv("CREW_CHECKPOINTS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _plain(value):
+    """Converts the registry's read-only mappings and tuples back to JSON-friendly dicts and lists."""
+    if isinstance(value, Mapping):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _llm_identity(llm):
+    """The model and parameters of the client an agent actually runs on (after its 'llm:' routing)."""
+    params = getattr(llm, "_identifying_params", None)
+    if isinstance(params, Mapping):
+        return _plain(params)
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None)
+
+
+class CheckpointStore:
+    """
+    Persistent SQLite store of task outputs, keyed by a hash of everything that
+    determines the output. Entries older than max_age_seconds are ignored, so a
+    standing question asked again the next day is researched afresh.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, max_age_seconds: float = None):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " key TEXT PRIMARY KEY, workflow TEXT NOT NULL, task TEXT NOT NULL,"
+            " output TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT output, created FROM checkpoints WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.max_age_seconds is not None and time.time() - row[1] > self.max_age_seconds):
+            return None
+        return row[0]
+
+    def put(self, key: str, workflow: str, task: str, output: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO checkpoints (key, workflow, task, output, created) VALUES (?, ?, ?, ?, ?)",
+                               (key, workflow, task, output, time.time()))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Deletes the entries older than max_age_seconds; returns how many were dropped."""
+        if self.max_age_seconds is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM checkpoints WHERE created < ?", (time.time() - self.max_age_seconds,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def clear(self, workflow: str = None):
+        with self._lock:
+            if workflow is None:
+                self._conn.execute("DELETE FROM checkpoints")
+            else:
+                self._conn.execute("DELETE FROM checkpoints WHERE workflow = ?", (workflow,))
+            self._conn.commit()
+
+
+class TaskCheckpointer:
+    """
+    Binds a CheckpointStore to one compiled workflow, for the task-graph executor.
+
+    A task's key covers its filled-in description (topic, briefing, action), its YAML,
+    its agent's YAML, the outputs of its upstream tasks and the model and parameters of
+    the agent's own client (model_name when it is unknown). After a failure the finished
+    tasks are restored from the store, so the run resumes at the first incomplete task.
+    Completed runs keep their checkpoints too: after editing one task's YAML only that
+    task, and the tasks downstream of any output that changed, run again. Entries expire
+    after the store's max age. Tasks whose agent or task sets 'llm_cache: false' always run live.
+    """
+
+    def __init__(self, store: CheckpointStore, workflow, model_name: str):
+        self.store = store
+        self.workflow = workflow
+        self.model_name = model_name
+        self.restored = []
+
+    def key(self, task_name: str, description: str, upstream: dict, llm=None):
+        if task_name in self.workflow.uncached_tasks:
+            return None
+        task_config = self.workflow.tasks_config.get(task_name) or {}
+        agent_name = task_config.get('agent')
+        payload = {
+            "workflow": self.workflow.name,
+            "task": task_name,
+            "description": description,
+            "task_config": _plain(task_config),
+            "agent_config": _plain(self.workflow.agents_config.get(agent_name) or {}),
+            "upstream": dict(upstream),
+            "model": _llm_identity(llm) or self.model_name,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+    def load(self, task_name: str, key: str):
+        if key is None:
+            return None
+        output = self.store.get(key)
+        record_cache("checkpoint", hit=output is not None)
+        if output is not None:
+            self.restored.append(task_name)
+        return output
+
+    def save(self, task_name: str, key: str, output: str):
+        if key is not None and output:
+            self.store.put(key, self.workflow.name, task_name, output)
+
+    def complete(self):
+        """Called when every task finished: keeps the run's outputs and purges the expired entries."""
+        self.store.purge_expired()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Process-wide store at CREW_CHECKPOINT_PATH, keeping entries for CREW_CHECKPOINT_MAX_AGE_HOURS (default 24)."""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                max_age_hours = float(os.getenv("CREW_CHECKPOINT_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS))
+                _default_store = CheckpointStore(os.getenv("CREW_CHECKPOINT_PATH", CHECKPOINT_PATH),
+                                                 max_age_seconds=max_age_hours * 3600 if max_age_hours > 0 else None)
+    return _default_store
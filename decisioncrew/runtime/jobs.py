@@ -0,0 +1,267 @@
+# decisioncrew/runtime/jobs.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from decisioncrew.llm.limiter import priority_lane
+
+JOBS_DB_PATH = os.path.join(".cache", "jobs.sqlite")
+DEFAULT_JOB_WORKERS = 2
+# עבודה פעילה שלא עודכנה יותר מזה נחשבת לעבודה שהשרת שלה נפל
+HEARTBEAT_SECONDS = 15
+STALE_AFTER_SECONDS = 120
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    at REAL NOT NULL,
+    event TEXT NOT NULL,
+    task TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS job_events_by_job ON job_events (job_id, id);
+"""
+
+
+class JobStore:
+    """
+    Persistent SQLite table of crew runs and their progress events, so a run's status,
+    per-task outputs and final result can be read back by job id after a page refresh
+    or from another browser session.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        # חיבור נפרד לכל thread, ב-autocommit
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind: str, params: dict) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, params, status, created_at, heartbeat_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(params, ensure_ascii=False), now, now),
+        )
+        return job_id
+
+    def set_status(self, job_id: str, status: str, result=None, error: str = None):
+        now = time.time()
+        if status == "running":
+            self._conn().execute("UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                                 (status, now, now, job_id))
+        else:
+            self._conn().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, heartbeat_at = ? WHERE id = ?",
+                (status, None if result is None else json.dumps(result, ensure_ascii=False), error, now, now, job_id),
+            )
+
+    def heartbeat(self, job_ids):
+        if job_ids:
+            placeholders = ", ".join("?" for _ in job_ids)
+            self._conn().execute(f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({placeholders})", [time.time(), *job_ids])
+
+    def add_event(self, job_id: str, event: str, task: str = None, text: str = None) -> int:
+        now = time.time()
+        conn = self._conn()
+        cursor = conn.execute("INSERT INTO job_events (job_id, at, event, task, text) VALUES (?, ?, ?, ?, ?)",
+                              (job_id, now, event, task, text))
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (now, job_id))
+        return cursor.lastrowid
+
+    def get(self, job_id: str):
+        """Returns the job as a dict (params and result decoded), or None if the id is unknown."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = None if job["result"] is None else json.loads(job["result"])
+        if job["status"] in ACTIVE_STATUSES and time.time() - job["heartbeat_at"] > STALE_AFTER_SECONDS:
+            job["status"] = "interrupted"
+        return job
+
+    def events(self, job_id: str, after: int = 0):
+        """Progress events of a job, oldest first; pass the last seen event id as 'after' to poll for new ones."""
+        rows = self._conn().execute("SELECT * FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                                    (job_id, after)).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit: int = 20):
+        rows = self._conn().execute("SELECT id, kind, status, created_at, finished_at FROM jobs ORDER BY created_at DESC LIMIT ?",
+                                    (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_interrupted(self) -> int:
+        """Marks active jobs whose worker stopped sending heartbeats (e.g. the server restarted) as interrupted."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'interrupted', finished_at = ? WHERE status IN ('queued', 'running') AND heartbeat_at < ?",
+            (time.time(), time.time() - STALE_AFTER_SECONDS),
+        )
+        return cursor.rowcount
+
+
+def _intelligence_job(params, emit):
+    from decisioncrew.crews.intelligence_crew import IntelligenceCrew
+    from decisioncrew.tools.csv_index import CsvIndex
+
+    csv_index = CsvIndex(params["csv_index_path"], name=params.get("csv_name")) if params.get("csv_index_path") else None
+    crew = IntelligenceCrew(workflow_name=params["workflow_name"], csv_index=csv_index,
+                            progress_callback=lambda task, text: emit("task_done", task, text))
+    result = str(crew.run(topic=params["topic"]))
+    if result.startswith("An error occurred"):
+        raise RuntimeError(result)
+    return result
+
+
+def _wargame_job(params, emit):
+    from decisioncrew.crews.wargames_crew import WargamesCrew
+
+    crew = WargamesCrew(progress_callback=lambda task, text: emit("task_done", task, text))
+    result = str(crew.run(intelligence_context=params["intelligence_context"], user_action=params["user_action"]))
+    if result.startswith("An error occurred"):
+        raise RuntimeError(result)
+    return result
+
+
+def _wargame_batch_job(params, emit):
+    from decisioncrew.crews.wargames_crew import WargamesCrew
+
+    return WargamesCrew().run_batch(
+        intelligence_context=params["intelligence_context"],
+        user_actions=params["user_actions"],
+        on_branch=lambda branch: emit("branch_done", branch["action"], branch.get("error") or branch.get("summary")),
+    )
+
+
+def _wargame_turns_job(params, emit):
+    from decisioncrew.crews.wargames_crew import WargamesCrew
+
+    state = WargamesCrew().run_turns(
+        intelligence_context=params["intelligence_context"],
+        user_action=params["user_action"],
+        max_turns=params.get("max_turns"),
+        on_turn=lambda state: emit("turn_done", f"turn {state.turns_played}", state.summary),
+    )
+    return state.to_dict()
+
+
+# סוגי העבודות שאפשר לשלוח לתור: kind -> handler(params, emit) שמחזיר תוצאה שניתנת לשמירה כ-JSON
+JOB_HANDLERS = {
+    "intelligence": _intelligence_job,
+    "wargame": _wargame_job,
+    "wargame_batch": _wargame_batch_job,
+    "wargame_turns": _wargame_turns_job,
+}
+# נתיב העדיפות של קריאות ה-LLM לכל סוג עבודה; השוואת מהלכים היא סריקה ארוכה ומפנה מקום לריצות אינטראקטיביות
+JOB_LANES = {"wargame_batch": "batch"}
+
+
+class JobRunner:
+    """
+    Runs crew jobs on a background thread pool and records their lifecycle in a JobStore.
+    Crew runs spend nearly all their time waiting on the LLM and search APIs, so threads
+    (which share the LLM client pool and the caches) are used rather than processes.
+    """
+
+    def __init__(self, store: JobStore = None, max_workers: int = None):
+        self.store = store or JobStore()
+        self.store.mark_interrupted()
+        if max_workers is None:
+            max_workers = int(os.getenv("CREW_JOB_WORKERS", DEFAULT_JOB_WORKERS))
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew-job")
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._heartbeat_loop, name="crew-job-heartbeat", daemon=True).start()
+
+    def submit(self, kind: str, **params) -> str:
+        """Queues a job and returns its id immediately."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind '{kind}'. Expected one of: {', '.join(JOB_HANDLERS)}")
+        job_id = self.store.create(kind, params)
+        with self._lock:
+            self._active.add(job_id)
+        self._pool.submit(self._run, job_id, kind, params)
+        return job_id
+
+    def _run(self, job_id: str, kind: str, params: dict):
+        def emit(event, task=None, text=None):
+            self.store.add_event(job_id, event, task, text)
+
+        try:
+            self.store.set_status(job_id, "running")
+            emit("started")
+            with priority_lane(JOB_LANES.get(kind, "interactive")):
+                result = JOB_HANDLERS[kind](params, emit)
+        except Exception as e:
+            print(f"Error in background job {job_id} ({kind}): {e}")
+            self.store.set_status(job_id, "failed", error=str(e))
+            emit("failed", text=str(e))
+        else:
+            self.store.set_status(job_id, "succeeded", result=result)
+            emit("finished")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            with self._lock:
+                active = list(self._active)
+            try:
+                self.store.heartbeat(active)
+            except sqlite3.Error as e:
+                print(f"Warning: job heartbeat failed: {e}")
+
+    def shutdown(self, wait: bool = True):
+        self._stop.set()
+        self._pool.shutdown(wait=wait)
+
+
+_default_runner = None
+_default_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Process-wide job runner (CREW_JOBS_PATH, CREW_JOB_WORKERS), shared by every UI session."""
+    global _default_runner
+    if _default_runner is None:
+        with _default_lock:
+            if _default_runner is None:
+                _default_runner = JobRunner(JobStore(os.getenv("CREW_JOBS_PATH", JOBS_DB_PATH)))
+    return _default_runner
@@ -0,0 +1,104 @@
+# decisioncrew/runtime/memo.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from decisioncrew.runtime.metrics import record_cache
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_ENTRIES = 256
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_topic(text) -> str:
+    """Normalizes a KIR so resubmissions that differ only in case or spacing share one memo entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", str(text or "")).casefold()).strip()
+
+
+def memo_key(workflow: str, topic, csv_hash: str = None, fingerprint: str = None, model: str = None) -> str:
+    payload = [workflow, normalize_topic(topic), csv_hash, fingerprint, model]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class RunMemo:
+    """
+    Process-wide memo of whole crew runs:
+    - results are kept per key for ttl_seconds (LRU-bounded)
+    - concurrent identical runs are collapsed into one execution (single flight); every
+      waiter receives the same result, or the same exception
+    Only results accepted by cacheable() are kept, so a failed run is retried next time.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def call(self, key: str, run, cacheable=None):
+        """Returns run() for this key, from the memo or from an identical run already in flight."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                record_cache("run_memo", hit=True)
+                return entry[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        record_cache("run_memo", hit=not leader)
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = run()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if cacheable is None or cacheable(result):
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def run_memo_enabled() -> bool:
+    """CREW_RUN_MEMO_TTL=0 turns the run memo off."""
+    return float(os.getenv("CREW_RUN_MEMO_TTL", DEFAULT_TTL_SECONDS)) > 0
+
+
+_default_memo = None
+_default_lock = threading.Lock()
+
+
+def get_run_memo() -> RunMemo:
+    """Process-wide memo, keeping results for CREW_RUN_MEMO_TTL seconds (default 600)."""
+    global _default_memo
+    if _default_memo is None:
+        with _default_lock:
+            if _default_memo is None:
+                _default_memo = RunMemo(ttl_seconds=float(os.getenv("CREW_RUN_MEMO_TTL", DEFAULT_TTL_SECONDS)))
+    return _default_memo
@@ -0,0 +1,377 @@
+# decisioncrew/runtime/metrics.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRICS_DIR = os.path.join(".cache", "metrics")
+RUNS_FILE = "runs.jsonl"
+DEFAULT_RUNS_MAX_MB = 64
+PROMETHEUS_FILE = "decisioncrew.prom"
+
+# הריצה והמשימה הנוכחיות. ה-scheduler מעביר אותן ל-threads שלו עם copy_context
+_current_run = ContextVar("decisioncrew_run", default=None)
+_current_task = ContextVar("decisioncrew_task", default=None)
+
+
+def _env_flag(name: str, default: bool = True) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def console_verbose() -> bool:
+    """CREW_VERBOSE=0 turns off crewai's verbose agent/crew console output (on by default)."""
+    return _env_flag("CREW_VERBOSE")
+
+
+def metrics_enabled() -> bool:
+    """CREW_METRICS=0 turns off writing run records and the Prometheus file."""
+    return _env_flag("CREW_METRICS")
+
+
+class _Totals:
+    """Process-wide counters, rendered in the Prometheus text format."""
+
+    HELP = {
+        "decisioncrew_runs_total": ("counter", "Crew runs by outcome."),
+        "decisioncrew_run_seconds": ("summary", "Wall time of crew runs."),
+        "decisioncrew_task_seconds": ("summary", "Wall time of crew tasks."),
+        "decisioncrew_llm_calls_total": ("counter", "Chat model calls."),
+        "decisioncrew_llm_latency_seconds": ("summary", "Chat model call latency."),
+        "decisioncrew_llm_ttft_seconds": ("summary", "Time to first streamed token."),
+        "decisioncrew_llm_prompt_tokens_total": ("counter", "Prompt tokens sent to the model."),
+        "decisioncrew_llm_completion_tokens_total": ("counter", "Completion tokens returned by the model."),
+        "decisioncrew_llm_routes_total": ("counter", "Per-agent model routing decisions."),
+        "decisioncrew_tool_calls_total": ("counter", "Tool calls."),
+        "decisioncrew_tool_errors_total": ("counter", "Tool calls that raised."),
+        "decisioncrew_tool_seconds": ("summary", "Tool call latency."),
+        "decisioncrew_cache_hits_total": ("counter", "Cache hits."),
+        "decisioncrew_cache_misses_total": ("counter", "Cache misses."),
+    }
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, labels: dict, value: float = 1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name: str, labels: dict, seconds: float):
+        self.add(name + "_sum", labels, seconds)
+        self.add(name + "_count", labels, 1)
+
+    def render(self) -> str:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines, described = [], set()
+        for (name, labels), value in values:
+            family = name[:-len("_sum")] if name.endswith("_sum") else name[:-len("_count")] if name.endswith("_count") else name
+            if family not in described and family in self.HELP:
+                kind, text = self.HELP[family]
+                lines += [f"# HELP {family} {text}", f"# TYPE {family} {kind}"]
+                described.add(family)
+            label_text = ",".join('{}="{}"'.format(key, str(label).replace("\\", "\\\\").replace('"', '\\"')) for key, label in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+totals = _Totals()
+
+
+class RunMetrics:
+    """Everything measured during one crew run, exported as a JSON record when it ends."""
+
+    def __init__(self, crew: str, workflow: str, model: str):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.crew = crew
+        self.workflow = workflow
+        self.model = model
+        self.started_at = time.time()
+        self.seconds = None
+        self.status = "running"
+        self.tasks = {}
+        self.agents = {}
+        self.tools = {}
+        self.caches = {}
+        # הבחירה של מודל לכל סוכן (decisioncrew/llm/routing.py)
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record_task(self, task: str, agent: str, seconds: float):
+        with self._lock:
+            # אותה משימה יכולה לרוץ כמה פעמים בריצה אחת (ענפים של run_batch, תורות של run_turns)
+            stats = self.tasks.setdefault(task, {"agent": agent, "runs": 0, "seconds": 0.0})
+            stats["runs"] += 1
+            stats["seconds"] = round(stats["seconds"] + seconds, 3)
+        totals.observe("decisioncrew_task_seconds", {"workflow": self.workflow, "task": task}, seconds)
+
+    def record_llm(self, agent: str, latency: float, ttft: float = None, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            stats = self.agents.setdefault(agent, {"calls": 0, "latency": 0.0, "ttft": None, "prompt_tokens": 0, "completion_tokens": 0})
+            stats["calls"] += 1
+            stats["latency"] = round(stats["latency"] + latency, 3)
+            if ttft is not None:
+                stats["ttft"] = round(ttft if stats["ttft"] is None else min(stats["ttft"], ttft), 3)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+
+    def record_tool(self, tool: str, seconds: float, error: bool = False):
+        with self._lock:
+            stats = self.tools.setdefault(tool, {"calls": 0, "errors": 0, "seconds": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["seconds"] = round(stats["seconds"] + seconds, 3)
+
+    def record_cache(self, cache: str, hit: bool):
+        with self._lock:
+            stats = self.caches.setdefault(cache, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def record_route(self, agent: str, model: str, reason: str):
+        with self._lock:
+            self.routes[agent] = {"model": model, "reason": reason}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "crew": self.crew,
+                "workflow": self.workflow,
+                "model": self.model,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "seconds": self.seconds,
+                "status": self.status,
+                "tasks": {name: dict(stats) for name, stats in self.tasks.items()},
+                "agents": {name: dict(stats) for name, stats in self.agents.items()},
+                "tools": {name: dict(stats) for name, stats in self.tools.items()},
+                "caches": {name: dict(stats) for name, stats in self.caches.items()},
+                "routes": {name: dict(route) for name, route in self.routes.items()},
+            }
+
+
+def current_run():
+    """The RunMetrics of the run executing in this context, or None."""
+    return _current_run.get()
+
+
+def current_agent():
+    task = _current_task.get()
+    return task[1] if task else None
+
+
+@contextmanager
+def track_run(crew: str, workflow: str, model: str):
+    """Measures a crew run; on exit the record is appended to runs.jsonl and the Prometheus file is rewritten."""
+    metrics = RunMetrics(crew, workflow, model)
+    token = _current_run.set(metrics)
+    started = time.perf_counter()
+    try:
+        yield metrics
+        if metrics.status == "running":
+            metrics.status = "ok"
+    except BaseException:
+        metrics.status = "error"
+        raise
+    finally:
+        _current_run.reset(token)
+        metrics.seconds = round(time.perf_counter() - started, 3)
+        labels = {"crew": crew, "workflow": workflow}
+        totals.add("decisioncrew_runs_total", {**labels, "status": metrics.status})
+        totals.observe("decisioncrew_run_seconds", labels, metrics.seconds)
+        export_run(metrics)
+
+
+@contextmanager
+def track_task(task: str, agent: str = None):
+    """Times one task and attributes the LLM calls made inside it to its agent."""
+    token = _current_task.set((task, agent))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
+        metrics = _current_run.get()
+        if metrics is not None:
+            metrics.record_task(task, agent, time.perf_counter() - started)
+
+
+@contextmanager
+def track_agent(agent: str):
+    """
+    Attributes the LLM calls made inside to agent, keeping the current task. crewai's
+    sequential Crew.kickoff runs its tasks without track_task, so the per-agent LLM
+    adapter (decisioncrew/llm/adapter.py) sets the agent around each call.
+    """
+    task = _current_task.get()
+    token = _current_task.set((task[0] if task else None, agent))
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
+
+
+@contextmanager
+def time_tool(tool: str):
+    """Counts and times one tool call."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        totals.add("decisioncrew_tool_calls_total", {"tool": tool})
+        totals.observe("decisioncrew_tool_seconds", {"tool": tool}, seconds)
+        if error:
+            totals.add("decisioncrew_tool_errors_total", {"tool": tool})
+        metrics = _current_run.get()
+        if metrics is not None:
+            metrics.record_tool(tool, seconds, error)
+
+
+def record_cache(cache: str, hit: bool):
+    """Counts a hit or miss of one of the caches (llm, search, compaction)."""
+    totals.add("decisioncrew_cache_hits_total" if hit else "decisioncrew_cache_misses_total", {"cache": cache})
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.record_cache(cache, hit)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    langchain callback that measures every chat model call: latency, time to first
+    token (on streamed calls, see CREW_LLM_STREAMING in decisioncrew/llm/pool.py) and
+    prompt/completion tokens, attributed to the agent running in the calling context.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (kwargs.get("metadata") or {}).get("ls_model_name")
+        with self._lock:
+            self._calls[run_id] = {"started": time.perf_counter(), "ttft": None, "model": model}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.get(run_id)
+            if call is not None and call["ttft"] is None:
+                call["ttft"] = time.perf_counter() - call["started"]
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        self._finish(call, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._calls.pop(run_id, None)
+
+    @staticmethod
+    def _usage(response):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        if not usage:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+        return prompt_tokens, completion_tokens
+
+    def _finish(self, call, response):
+        latency = time.perf_counter() - call["started"]
+        prompt_tokens, completion_tokens = self._usage(response)
+        agent = current_agent() or "unattributed"
+        labels = {"agent": agent, "model": call["model"] or "unknown"}
+        totals.add("decisioncrew_llm_calls_total", labels)
+        totals.observe("decisioncrew_llm_latency_seconds", labels, latency)
+        if call["ttft"] is not None:
+            totals.observe("decisioncrew_llm_ttft_seconds", labels, call["ttft"])
+        totals.add("decisioncrew_llm_prompt_tokens_total", labels, prompt_tokens)
+        totals.add("decisioncrew_llm_completion_tokens_total", labels, completion_tokens)
+        metrics = _current_run.get()
+        if metrics is not None:
+            metrics.record_llm(agent, latency, call["ttft"], prompt_tokens, completion_tokens)
+
+
+metrics_handler = MetricsCallbackHandler()
+_export_lock = threading.Lock()
+
+
+def export_run(metrics: RunMetrics):
+    """
+    Appends the run record to runs.jsonl and rewrites the Prometheus text file (CREW_METRICS_DIR).
+    Once runs.jsonl exceeds CREW_METRICS_MAX_MB it is rotated to runs.jsonl.1, replacing the previous one.
+    """
+    if not metrics_enabled():
+        return
+    directory = os.getenv("CREW_METRICS_DIR", METRICS_DIR)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with _export_lock:
+            runs_path = os.path.join(directory, RUNS_FILE)
+            max_bytes = float(os.getenv("CREW_METRICS_MAX_MB", DEFAULT_RUNS_MAX_MB)) * 1024 * 1024
+            if max_bytes > 0 and os.path.exists(runs_path) and os.path.getsize(runs_path) >= max_bytes:
+                os.replace(runs_path, runs_path + ".1")
+            with open(runs_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n")
+            # כתיבה לקובץ זמני והחלפה אטומית, כדי ש-node_exporter לא יקרא קובץ חצי-כתוב
+            path = os.path.join(directory, PROMETHEUS_FILE)
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(totals.render())
+            os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Warning: could not write run metrics to '{directory}': {e}")
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = totals.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def serve_metrics(port: int = None):
+    """Serves the Prometheus text on http://0.0.0.0:port/ from a daemon thread (CREW_METRICS_PORT); once per process."""
+    global _server
+    port = port or int(os.getenv("CREW_METRICS_PORT", "0"))
+    if not port or _server is not None:
+        return _server
+    with _export_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _PrometheusHandler)
+            threading.Thread(target=_server.serve_forever, name="crew-metrics", daemon=True).start()
+    return _server
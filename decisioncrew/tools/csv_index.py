@@ -0,0 +1,227 @@
+# decisioncrew/tools/csv_index.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+from decisioncrew.runtime.metrics import time_tool
+
+INDEX_DIR = os.path.join(".cache", "csv_index")
+# גרסת מבנה האינדקס; שינוי שלה גורם לבנייה מחדש של אינדקסים ישנים
+INDEX_VERSION = 2
+DEFAULT_CHUNKSIZE = 50_000
+_FILTER = re.compile(r"^\s*([^=<>!~]+?)\s*(>=|<=|!=|=|>|<|~)\s*(.+?)\s*$")
+_FTS_TOKEN = re.compile(r"\w+", re.UNICODE)
+_BOOLEAN_VALUES = {"true": 1, "yes": 1, "1": 1, "false": 0, "no": 0, "0": 0}
+
+
+def quote_identifier(name: str) -> str:
+    """Quotes a column name for SQLite, doubling any embedded double quotes."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def content_hash(source) -> str:
+    """sha256 of a file path or binary file object, read in blocks."""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+        return digest.hexdigest()
+    handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        position = handle.tell() if hasattr(handle, 'tell') else None
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+        if position is not None:
+            handle.seek(position)
+    finally:
+        if handle is not source:
+            handle.close()
+    return digest.hexdigest()
+
+
+class CsvIndex:
+    """
+    On-disk SQLite FTS5 index over the rows of one CSV file, keyed by the file's content
+    hash so the same upload is only indexed once. Rows are stored as typed columns (for
+    filters) and as one 'column: value' document per row (for BM25 keyword search).
+    Boolean columns are stored as 1/0 (SQLite has no boolean type), and filters on
+    them accept true/false.
+    """
+
+    def __init__(self, path: str, name: str = None):
+        self.path = path
+        self.name = name or os.path.basename(path)
+        self._local = threading.local()
+        conn = self._conn()
+        self.columns = [row[1] for row in conn.execute('PRAGMA table_info("rows")')]
+        self.row_count = conn.execute('SELECT COUNT(*) FROM "rows"').fetchone()[0]
+        try:
+            self.boolean_columns = {row[0] for row in conn.execute("SELECT name FROM column_kinds WHERE kind = 'boolean'")}
+        except sqlite3.OperationalError:
+            # אינדקס מגרסה קודמת (למשל מעבודה שכבר בתור) - בלי מידע על סוגי העמודות
+            self.boolean_columns = set()
+
+    @property
+    def content_hash(self) -> str:
+        return os.path.basename(self.path).split(".")[0]
+
+    def _conn(self):
+        # חיבור נפרד לכל thread; האינדקס נפתח לקריאה בלבד
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = "file:" + os.path.abspath(self.path).replace("\\", "/") + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True)
+            self._local.conn = conn
+        return conn
+
+    @classmethod
+    def build(cls, source, name: str = None, index_dir: str = INDEX_DIR, chunksize: int = DEFAULT_CHUNKSIZE):
+        """Returns the index for source (path, bytes or binary file), building it only if it does not exist yet."""
+        digest = content_hash(source)
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, f"{digest}.v{INDEX_VERSION}.sqlite")
+        if os.path.exists(path):
+            return cls(path, name=name)
+        # pandas נטען רק כשבאמת בונים אינדקס - כלי ה-stub (בלי קובץ) ופתיחת אינדקס קיים לא צריכים אותו
+        import pandas as pd
+
+        if isinstance(source, (bytes, bytearray)):
+            from io import BytesIO
+            source = BytesIO(source)
+        elif hasattr(source, 'seek'):
+            source.seek(0)
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        conn = sqlite3.connect(temp_path)
+        try:
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            columns = None
+            for chunk in pd.read_csv(source, chunksize=chunksize, encoding_errors="replace", low_memory=True):
+                if columns is None:
+                    columns = [str(column) for column in chunk.columns]
+                    column_list = ", ".join(quote_identifier(column) for column in columns)
+                    conn.execute(f'CREATE TABLE "rows" ({column_list})')
+                    conn.execute('CREATE VIRTUAL TABLE rows_fts USING fts5(doc, tokenize="unicode61")')
+                    insert_sql = f'INSERT INTO "rows" ({column_list}) VALUES ({", ".join("?" for _ in columns)})'
+                    # עמודה נשארת בוליאנית רק אם בכל ה-chunks יש בה ערכי True/False בלבד
+                    boolean_columns = set(columns)
+                boolean_columns &= {column for column, series in zip(columns, chunk.items())
+                                    if pd.api.types.infer_dtype(series[1], skipna=True) in ("boolean", "empty")}
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                records = list(chunk.itertuples(index=False, name=None))
+                cursor = conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM "rows"')
+                first_rowid = cursor.fetchone()[0] + 1
+                conn.executemany(insert_sql, records)
+                docs = (
+                    (first_rowid + i, " | ".join(f"{column}: {value}" for column, value in zip(columns, record) if value is not None))
+                    for i, record in enumerate(records)
+                )
+                conn.executemany("INSERT INTO rows_fts (rowid, doc) VALUES (?, ?)", docs)
+                conn.commit()
+            if columns is None:
+                raise ValueError("The CSV file is empty.")
+            conn.execute("CREATE TABLE column_kinds (name TEXT PRIMARY KEY, kind TEXT NOT NULL)")
+            conn.executemany("INSERT INTO column_kinds (name, kind) VALUES (?, ?)",
+                             [(column, "boolean" if column in boolean_columns else "value") for column in columns])
+            conn.execute("INSERT INTO rows_fts (rows_fts) VALUES ('optimize')")
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            conn.close()
+            os.remove(temp_path)
+            if "fts5" in str(e).lower():
+                raise RuntimeError("This Python's SQLite build does not include FTS5, which the CSV index needs.") from e
+            raise
+        except BaseException:
+            conn.close()
+            os.remove(temp_path)
+            raise
+        conn.close()
+        # שינוי שם אטומי - שני תהליכים שבונים את אותו אינדקס לא ידרסו זה את זה באמצע
+        os.replace(temp_path, path)
+        return cls(path, name=name)
+
+    def _parse_filters(self, filters: str):
+        """Parses 'col=value; col>=3; col~text' into a SQL WHERE fragment and parameters."""
+        clauses, params = [], []
+        for part in re.split(r"[;\n]", filters or ""):
+            if not part.strip():
+                continue
+            match = _FILTER.match(part)
+            if not match:
+                raise ValueError(f"Cannot parse filter '{part.strip()}'. Use forms like country=Greece; year>=2020; title~protest")
+            column, operator, value = match.groups()
+            column = column.strip()
+            if len(column) >= 2 and column[0] == column[-1] == '"':
+                column = column[1:-1].replace('""', '"')
+            if column not in self.columns:
+                raise ValueError(f"Unknown column '{column}'. Available columns: {', '.join(self.columns)}")
+            value = value.strip().strip("'\"")
+            if operator == "~":
+                clauses.append(f'CAST(r.{quote_identifier(column)} AS TEXT) LIKE ?')
+                params.append(f"%{value}%")
+            else:
+                if column in self.boolean_columns and value.lower() in _BOOLEAN_VALUES:
+                    # בוליאניים נשמרו כ-1/0, כך שגם הערך בפילטר עובר את אותה המרה
+                    value = _BOOLEAN_VALUES[value.lower()]
+                else:
+                    try:
+                        value = float(value) if "." in value else int(value)
+                    except ValueError:
+                        pass
+                clauses.append(f'r.{quote_identifier(column)} {operator} ?')
+                params.append(value)
+        return clauses, params
+
+    def search(self, query: str = "", filters: str = "", limit: int = 20):
+        """Returns (columns, rows) for the rows that best match query (BM25) and satisfy the filters."""
+        clauses, params = self._parse_filters(filters)
+        tokens = _FTS_TOKEN.findall(query or "")
+        if tokens:
+            # OR בין המילים - BM25 ידרג למעלה שורות שמכילות יותר מהן
+            match = " OR ".join(f'"{token}"' for token in tokens)
+            sql = ('SELECT r.* FROM rows_fts JOIN "rows" r ON r.rowid = rows_fts.rowid '
+                   'WHERE rows_fts MATCH ?' + "".join(f" AND {clause}" for clause in clauses) +
+                   ' ORDER BY bm25(rows_fts) LIMIT ?')
+            params = [match] + params + [limit]
+        else:
+            sql = ('SELECT r.* FROM "rows" r' + (" WHERE " + " AND ".join(clauses) if clauses else "") +
+                   ' ORDER BY r.rowid LIMIT ?')
+            params = params + [limit]
+        rows = self._conn().execute(sql, params).fetchall()
+        return self.columns, rows
+
+    def search_text(self, query: str = "", filters: str = "", limit: int = 20) -> str:
+        """search() formatted as a compact table for agents."""
+        try:
+            columns, rows = self.search(query, filters, limit)
+        except ValueError as e:
+            return f"Error: {e}"
+        if not rows:
+            return f"No rows in '{self.name}' match this query and filters."
+        lines = [" | ".join(columns)]
+        booleans = [column in self.boolean_columns for column in columns]
+        lines += [" | ".join("" if value is None else str(bool(value)) if boolean else str(value)
+                             for value, boolean in zip(row, booleans)) for row in rows]
+        lines.append(f"({len(rows)} of {self.row_count:,} rows in '{self.name}')")
+        return "\n".join(lines)
+
+
+def make_csv_search_tool(csv_index: CsvIndex = None):
+    """Builds a crewai tool bound to one uploaded CSV index (or to none)."""
+    try:
+        from crewai.tools import tool
+    except ImportError:
+        from crewai_tools import tool
+
+    @tool("CSV Row Search Tool")
+    def csv_search_tool(query: str, filters: str = "", limit: int = 20) -> str:
+        """Searches the rows of the CSV file uploaded by the user and returns only the relevant rows. 'query' is a keyword search (ranked by relevance; leave empty to only filter). 'filters' narrows by column values, separated by ';', e.g. "country=Greece; year>=2020; event~protest" (~ means contains). Use the column names from the CSV digest in the prompt. At most 'limit' rows (max 100) are returned."""
+        if csv_index is None:
+            return "No CSV file was uploaded for this analysis."
+        with time_tool("csv_search_tool"):
+            return csv_index.search_text(query, filters, min(int(limit or 20), 100))
+
+    return csv_search_tool
@@ -1,8 +1,277 @@
 # decisioncrew/tools/database_tools.py
 
-# פונקציית דמה פשוטה כדי למנוע שגיאות ייבוא
-# היא תודיע לסוכן שהכלי מנוטרל אם ינסה להשתמש בו
-def db_query_tool(*args, **kwargs) -> str:
-     """This tool is currently disabled due to validation errors."""
-     print("WARNING: 'db_query_tool' was called but is disabled.")
-     return "Database tool is currently disabled due to configuration issues."
\ No newline at end of file
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from decisioncrew.runtime.metrics import time_tool
+
+DEFAULT_DATABASE_URL = "sqlite:///data/decisioncrew.db"
+
+# רק שאילתות קריאה מותרות; החיבור עצמו גם נפתח במצב read-only
+_READ_ONLY_STATEMENT = re.compile(r"^\s*(SELECT|WITH|EXPLAIN)\b", re.IGNORECASE)
+# הערות ורווחים בתחילת השאילתה (הערות בתוך השאילתה SQLite מדלג עליהן בעצמו)
+_LEADING_COMMENTS = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*", re.DOTALL)
+_PREDICATE = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\s*(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bLIKE\b|\bBETWEEN\b|\bIS\b)", re.IGNORECASE)
+_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class QueryLimits:
+    """Caps applied to every agent-written query."""
+    timeout_seconds: float = 10.0
+    max_rows: int = 200
+    max_bytes: int = 16_000
+    fetch_size: int = 100
+    # שאילתות איטיות מזה יקבלו המלצות לאינדקסים (None = כבוי)
+    slow_query_seconds: float = 2.0
+
+
+def database_path(database_url: str = None) -> str:
+    """Resolves DATABASE_URL ('sqlite:///relative.db' or 'sqlite:////absolute.db') to a file path."""
+    url = database_url or os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+    if not url.startswith("sqlite:///"):
+        raise ValueError(f"Only sqlite:/// database URLs are supported, got '{url}'")
+    return url[len("sqlite:///"):]
+
+
+def _single_statement(sql: str):
+    """
+    Returns sql without its trailing ';', or None when it holds more than one statement.
+    Statement ends are found with sqlite3.complete_statement, so a ';' inside a string
+    literal, quoted name or comment does not count.
+    """
+    for match in re.finditer(";", sql):
+        if sqlite3.complete_statement(sql[:match.end()]):
+            rest = _LEADING_COMMENTS.sub("", sql[match.end():])
+            if rest.strip(" \t\r\n;"):
+                return None
+            return sql[:match.start()].strip()
+    return sql.strip()
+
+
+class _PooledConnection:
+    """A read-only SQLite connection plus its cached schema description."""
+
+    def __init__(self, path: str):
+        uri = "file:" + os.path.abspath(path).replace("\\", "/") + "?mode=ro"
+        self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.conn.execute("PRAGMA query_only = ON")
+        self._schema = None
+
+    def schema(self) -> dict:
+        """{table: [columns]} - introspected once per connection."""
+        if self._schema is None:
+            tables = [row[0] for row in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+            schema = {}
+            for table in tables:
+                columns = [row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')]
+                indexes = []
+                for index in self.conn.execute(f'PRAGMA index_list("{table}")'):
+                    indexed = [row[2] for row in self.conn.execute(f'PRAGMA index_info("{index[1]}")')]
+                    indexes.append(tuple(indexed))
+                schema[table] = {"columns": columns, "indexes": indexes}
+            self._schema = schema
+        return self._schema
+
+
+class ReadOnlySQLitePool:
+    """A small fixed-size pool of read-only connections to one SQLite file."""
+
+    def __init__(self, path: str, size: int = 4, limits: QueryLimits = None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Database file not found: {path}")
+        self.path = path
+        self.limits = limits or QueryLimits()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._size = size
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _PooledConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self._size:
+                self._created += 1
+                return _PooledConnection(self.path)
+        return self._idle.get(timeout=self.limits.timeout_seconds)
+
+    def _release(self, connection: _PooledConnection):
+        connection.conn.set_progress_handler(None, 0)
+        self._idle.put(connection)
+
+    def schema_text(self) -> str:
+        connection = self._acquire()
+        try:
+            schema = connection.schema()
+        finally:
+            self._release(connection)
+        lines = []
+        for table, info in schema.items():
+            line = f"{table}({', '.join(info['columns'])})"
+            if info["indexes"]:
+                line += "  indexes: " + "; ".join(", ".join(index) for index in info["indexes"])
+            lines.append(line)
+        return "\n".join(lines) or "The database has no tables."
+
+    def query(self, sql: str) -> str:
+        """Runs one read-only query and returns a compact, capped text table."""
+        sql = _LEADING_COMMENTS.sub("", sql or "")
+        if not sql.strip(" \t\r\n;"):
+            return "Error: empty query."
+        sql = _single_statement(sql)
+        if sql is None:
+            return "Error: only a single SQL statement is allowed per call."
+        if not _READ_ONLY_STATEMENT.match(sql):
+            return "Error: only read-only SELECT / WITH queries are allowed."
+
+        limits = self.limits
+        try:
+            connection = self._acquire()
+        except queue.Empty:
+            return f"Error: all {self._size} database connections stayed busy for {limits.timeout_seconds:g}s. Try again."
+        started = time.monotonic()
+        deadline = started + limits.timeout_seconds
+        connection.conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 10_000)
+        try:
+            cursor = connection.conn.execute(sql)
+            header = [column[0] for column in cursor.description or ()]
+            lines = [" | ".join(header)]
+            used_bytes = len(lines[0])
+            row_count = 0
+            truncated = None
+            while truncated is None:
+                batch = cursor.fetchmany(limits.fetch_size)
+                if not batch:
+                    break
+                for row in batch:
+                    line = " | ".join("" if value is None else str(value) for value in row)
+                    if row_count >= limits.max_rows:
+                        truncated = f"row limit of {limits.max_rows}"
+                        break
+                    if used_bytes + len(line) > limits.max_bytes:
+                        truncated = f"size limit of {limits.max_bytes} bytes"
+                        break
+                    lines.append(line)
+                    used_bytes += len(line) + 1
+                    row_count += 1
+            cursor.close()
+            elapsed = time.monotonic() - started
+            if truncated:
+                lines.append(f"... truncated at the {truncated}; more rows exist. Use WHERE, GROUP BY or LIMIT to narrow the query.")
+            lines.append(f"({row_count} rows, {elapsed:.2f}s)")
+            if limits.slow_query_seconds is not None and elapsed >= limits.slow_query_seconds:
+                advice = recommend_indexes(connection, sql)
+                if advice:
+                    lines.append("Slow query. Index recommendations:\n" + "\n".join(advice))
+            return "\n".join(lines)
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                return f"Error: query exceeded the {limits.timeout_seconds:.0f}s timeout and was cancelled. Narrow the query or aggregate in SQL."
+            return f"SQL error: {e}"
+        except sqlite3.DatabaseError as e:
+            return f"SQL error: {e}"
+        finally:
+            self._release(connection)
+
+
+def recommend_indexes(connection: _PooledConnection, sql: str) -> list:
+    """
+    Suggests CREATE INDEX statements for tables the query plan scans in full,
+    based on the columns the query filters or joins on.
+    """
+    schema = connection.schema()
+    try:
+        plan = [row[-1] for row in connection.conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    except sqlite3.DatabaseError:
+        return []
+
+    predicates = _PREDICATE.findall(sql)
+    advice = []
+    for step in plan:
+        match = _SCAN.search(step)
+        if not match or "INDEX" in (match.group(3) or "").upper():
+            continue
+        table, alias = match.group(1), match.group(2)
+        columns = schema.get(table, {}).get("columns", [])
+        wanted = []
+        for qualifier, column in predicates:
+            if qualifier and qualifier not in (table, alias):
+                continue
+            if column in columns and column not in wanted:
+                wanted.append(column)
+        existing = {index[:len(wanted)] for index in schema.get(table, {}).get("indexes", [])}
+        if wanted and tuple(wanted) not in existing:
+            advice.append(f"CREATE INDEX idx_{table}_{'_'.join(wanted)} ON {table} ({', '.join(wanted)});")
+    return advice
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database_url: str = None) -> ReadOnlySQLitePool:
+    """Returns the process-wide pool for the configured database file."""
+    path = database_path(database_url)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = ReadOnlySQLitePool(path, size=int(os.getenv("DB_POOL_SIZE", "4")))
+            _pools[path] = pool
+    return pool
+
+
+def query_database(sql_query: str) -> str:
+    try:
+        return get_pool().query(sql_query)
+    except FileNotFoundError as e:
+        return f"The internal database is not available: {e}"
+
+
+def describe_database() -> str:
+    try:
+        return get_pool().schema_text()
+    except FileNotFoundError as e:
+        return f"The internal database is not available: {e}"
+    except queue.Empty:
+        return "Error: all database connections are busy. Try again."
+
+
+def _tool_decorator():
+    try:
+        from crewai.tools import tool
+    except ImportError:
+        from crewai_tools import tool
+    return tool
+
+
+def make_db_query_tool():
+    tool = _tool_decorator()
+
+    @tool("Database Query Tool")
+    def db_query_tool(sql_query: str) -> str:
+        """Runs ONE read-only SQLite SELECT query against the internal historical database and returns a compact table. Results are capped in rows and size, and long-running queries are cancelled, so filter and aggregate in SQL. Use the Database Schema Tool first to see the available tables and columns."""
+        with time_tool("db_query_tool"):
+            return query_database(sql_query)
+
+    return db_query_tool
+
+
+def make_db_schema_tool():
+    tool = _tool_decorator()
+
+    @tool("Database Schema Tool")
+    def db_schema_tool() -> str:
+        """Lists the tables, columns and indexes of the internal historical database."""
+        with time_tool("db_schema_tool"):
+            return describe_database()
+
+    return db_schema_tool
@@ -0,0 +1,310 @@
+# decisioncrew/tools/evidence_store.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from decisioncrew.runtime.metrics import record_cache, time_tool
+
+EVIDENCE_PATH = os.path.join(".cache", "evidence.sqlite")
+DEFAULT_MAX_AGE_HOURS = 48
+DEFAULT_MIN_LOCAL_RESULTS = 3
+DEFAULT_RESULTS = 8
+# מסמך נחשב רלוונטי רק אם הוא מכיל לפחות חלק כזה ממילות החיפוש
+DEFAULT_MIN_COVERAGE = 0.5
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "what which who when where how why about into over between during coming next last".split()
+)
+_FTS_TOKEN = re.compile(r"\w+", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+# פורמט הטקסט הישן של SerperDevTool: "Title: ...\nLink: ...\nSnippet: ...\n---"
+_SERPER_TEXT = re.compile(r"Title:\s*(?P<title>.*?)\s*\nLink:\s*(?P<link>\S+)\s*\nSnippet:\s*(?P<snippet>.*?)\s*(?:\n---|\Z)", re.DOTALL)
+
+# דירוג אמינות מקור בסגנון Admiralty לפי דומיין (A = אמין לחלוטין ... F = לא ניתן להעריך)
+SOURCE_RELIABILITY = {
+    "reuters.com": "B", "apnews.com": "B", "afp.com": "B", "bbc.co.uk": "B", "bbc.com": "B",
+    "ft.com": "B", "nytimes.com": "B", "wsj.com": "B", "economist.com": "B", "aljazeera.com": "C",
+    "gov": "B", "gov.uk": "B", "europa.eu": "B", "un.org": "B", "nato.int": "B",
+    "wikipedia.org": "C", "twitter.com": "E", "x.com": "E", "t.me": "E", "telegram.me": "E",
+}
+DEFAULT_RELIABILITY = "F"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT UNIQUE NOT NULL,
+    url TEXT,
+    source TEXT NOT NULL,
+    title TEXT,
+    content TEXT NOT NULL,
+    reliability TEXT NOT NULL,
+    tool TEXT,
+    query TEXT,
+    published TEXT,
+    fetched_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    seen_count INTEGER NOT NULL DEFAULT 1
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(title, content, source, tokenize="unicode61");
+"""
+
+
+def source_reliability(url: str) -> str:
+    """Admiralty source-reliability letter for a URL, by its domain (or any parent domain)."""
+    host = (urlparse(url or "").hostname or "").lower()
+    parts = host.split(".")
+    for i in range(len(parts)):
+        grade = SOURCE_RELIABILITY.get(".".join(parts[i:]))
+        if grade:
+            return grade
+    return DEFAULT_RELIABILITY
+
+
+def document_hash(content: str) -> str:
+    """Content hash for dedupe: the same text fetched through another query or URL is stored once."""
+    text = _WHITESPACE.sub(" ", content or "").strip().casefold()
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def extract_documents(result, params: dict = None):
+    """
+    Splits a search tool's raw result into documents (dicts with title, url, content,
+    published). Understands SerperDevTool's JSON and text formats; anything else (e.g.
+    WebsiteSearchTool's relevant content) becomes a single document.
+    """
+    if isinstance(result, str):
+        stripped = result.strip()
+        if stripped.startswith("{"):
+            try:
+                result = json.loads(stripped)
+            except json.JSONDecodeError:
+                pass
+    if isinstance(result, dict):
+        documents = []
+        for section in ("organic", "news", "topStories"):
+            for item in result.get(section) or []:
+                content = item.get("snippet") or item.get("title")
+                if content:
+                    documents.append({"title": item.get("title"), "url": item.get("link"),
+                                      "content": content, "published": item.get("date")})
+        if documents:
+            return documents
+        result = json.dumps(result, ensure_ascii=False)
+    text = str(result or "").strip()
+    matches = list(_SERPER_TEXT.finditer(text))
+    if matches:
+        return [{"title": match["title"], "url": match["link"], "content": match["snippet"] or match["title"],
+                 "published": None} for match in matches]
+    if not text:
+        return []
+    url = (params or {}).get("website") or (params or {}).get("website_url")
+    return [{"title": None, "url": url, "content": text, "published": None}]
+
+
+class EvidenceStore:
+    """
+    Persistent SQLite FTS5 corpus of every document the search tools fetched, with its
+    source, fetch time, Admiralty source-reliability grade and a content hash for dedupe.
+    Re-fetching a known document only refreshes its last_seen time, which is what the
+    freshness checks of evidence_search use.
+    """
+
+    def __init__(self, path: str = EVIDENCE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            if "fts5" in str(e).lower():
+                raise RuntimeError("This Python's SQLite build does not include FTS5, which the evidence store needs.") from e
+            raise
+        self._conn.commit()
+
+    def record(self, documents, tool: str = None, query: str = None) -> int:
+        """Stores new documents and refreshes known ones; returns how many were new."""
+        now = time.time()
+        added = 0
+        with self._lock:
+            for document in documents:
+                content = (document.get("content") or "").strip()
+                if not content:
+                    continue
+                digest = document_hash(content)
+                updated = self._conn.execute(
+                    "UPDATE documents SET last_seen = ?, seen_count = seen_count + 1 WHERE content_hash = ?", (now, digest))
+                if updated.rowcount:
+                    continue
+                url = document.get("url")
+                source = (urlparse(url).hostname if url else None) or tool or "unknown"
+                cursor = self._conn.execute(
+                    "INSERT INTO documents (content_hash, url, source, title, content, reliability, tool, query, published,"
+                    " fetched_at, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (digest, url, source, document.get("title"), content, source_reliability(url), tool, query,
+                     document.get("published"), now, now))
+                self._conn.execute("INSERT INTO documents_fts (rowid, title, content, source) VALUES (?, ?, ?, ?)",
+                                   (cursor.lastrowid, document.get("title") or "", content, source))
+                added += 1
+            self._conn.commit()
+        return added
+
+    def search(self, query: str, limit: int = DEFAULT_RESULTS, max_age_seconds: float = None,
+               min_coverage: float = DEFAULT_MIN_COVERAGE):
+        """
+        Documents matching query (BM25), most relevant first. Only documents containing at
+        least min_coverage of the query's keywords are returned, and with max_age_seconds
+        only those seen within that time.
+        """
+        keywords = {token.casefold() for token in _FTS_TOKEN.findall(query or "")
+                    if len(token) > 1 and token.casefold() not in _STOPWORDS}
+        if not keywords:
+            return []
+        # OR בין המילים - BM25 ידרג למעלה מסמכים שמכילים יותר מהן; הכיסוי מסונן אחר כך
+        match = " OR ".join(f'"{token}"' for token in sorted(keywords))
+        sql = ("SELECT d.url, d.source, d.title, d.content, d.reliability, d.published, d.fetched_at, d.last_seen, d.seen_count"
+               " FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid WHERE documents_fts MATCH ?")
+        params = [match]
+        if max_age_seconds is not None:
+            sql += " AND d.last_seen >= ?"
+            params.append(time.time() - max_age_seconds)
+        sql += " ORDER BY bm25(documents_fts) LIMIT ?"
+        params.append(limit * 4)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        columns = ("url", "source", "title", "content", "reliability", "published", "fetched_at", "last_seen", "seen_count")
+        documents = []
+        for row in rows:
+            document = dict(zip(columns, row))
+            words = {token.casefold() for token in _FTS_TOKEN.findall(f"{document['title'] or ''} {document['content']}")}
+            if len(keywords & words) / len(keywords) >= min_coverage:
+                documents.append(document)
+                if len(documents) == limit:
+                    break
+        return documents
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def evidence_store_enabled() -> bool:
+    return os.getenv("EVIDENCE_STORE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_evidence_store():
+    """Process-wide store at EVIDENCE_STORE_PATH, or None when EVIDENCE_STORE=0."""
+    global _default_store
+    if not evidence_store_enabled():
+        return None
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = EvidenceStore(os.getenv("EVIDENCE_STORE_PATH", EVIDENCE_PATH))
+    return _default_store
+
+
+def record_evidence(tool: str, query, params: dict, result):
+    """Called by the search layer after every network fetch. Never fails the search itself."""
+    try:
+        store = get_evidence_store()
+        if store is not None:
+            store.record(extract_documents(result, params), tool=tool, query=str(query or ""))
+    except Exception as e:
+        print(f"Warning: could not record search results in the evidence store: {e}")
+
+
+def _as_evidence(documents):
+    """Gives just-fetched documents the fields format_evidence shows for stored ones."""
+    now = time.time()
+    evidence = []
+    for document in documents:
+        content = (document.get("content") or "").strip()
+        if not content:
+            continue
+        url = document.get("url")
+        evidence.append({"url": url, "source": (urlparse(url).hostname if url else None) or "web",
+                         "title": document.get("title"), "content": content, "reliability": source_reliability(url),
+                         "published": document.get("published"), "fetched_at": now, "last_seen": now, "seen_count": 1})
+    return evidence
+
+
+def format_evidence(documents) -> str:
+    """Formats stored documents for agents, with source, age and reliability grade."""
+    now = time.time()
+    lines = []
+    for number, document in enumerate(documents, start=1):
+        hours = (now - document["last_seen"]) / 3600
+        age = f"{hours:.0f}h ago" if hours >= 1 else "just now"
+        header = f"[{number}] {document['title'] or document['source']}"
+        lines.append(header)
+        lines.append(f"Source: {document['url'] or document['source']} | Reliability: {document['reliability']} | "
+                     f"Fetched: {age}" + (f" | Published: {document['published']}" if document['published'] else ""))
+        lines.append(document["content"])
+        lines.append("---")
+    return "\n".join(lines)
+
+
+def evidence_search(query: str, web_search=None) -> str:
+    """
+    Answers query from the local evidence store when it holds at least
+    EVIDENCE_MIN_LOCAL_RESULTS documents seen within EVIDENCE_MAX_AGE_HOURS; otherwise
+    runs web_search(query) (the search layer records its results) and answers with the
+    fetched documents first, followed by the local matches.
+    """
+    store = get_evidence_store()
+    if web_search is None:
+        from decisioncrew.tools.registry import tool_registry
+        web_search = lambda text: tool_registry["serper_dev_tool"]._run(search_query=text)
+    if store is None:
+        return str(web_search(query))
+
+    limit = int(os.getenv("EVIDENCE_RESULTS", DEFAULT_RESULTS))
+    max_age_hours = float(os.getenv("EVIDENCE_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS))
+    max_age_seconds = max_age_hours * 3600 if max_age_hours > 0 else None
+    # רק החיפוש המקומי נמדד כאן; חיפוש הרשת נמדד בשכבת ה-SearchCache
+    with time_tool("evidence_store"):
+        documents = store.search(query, limit, max_age_seconds)
+    local_enough = len(documents) >= int(os.getenv("EVIDENCE_MIN_LOCAL_RESULTS", DEFAULT_MIN_LOCAL_RESULTS))
+    record_cache("evidence", hit=local_enough)
+    note = ""
+    if not local_enough:
+        try:
+            fetched = _as_evidence(extract_documents(web_search(query)))
+        except Exception as e:
+            note = f"(Web search failed: {e}. Showing local evidence only.)\n"
+            fetched = []
+        # תוצאות הרשת מוחזרות כמו שהן - הן כבר נבחרו לשאילתה, בלי סינון הכיסוי של החיפוש המקומי
+        seen = {document_hash(document["content"]) for document in fetched}
+        documents = fetched + [document for document in documents if document_hash(document["content"]) not in seen]
+        documents = documents[:limit]
+    if not documents:
+        return note + "No evidence found for this query, locally or on the web."
+    return note + format_evidence(documents)
+
+
+def make_evidence_search_tool():
+    try:
+        from crewai.tools import tool
+    except ImportError:
+        from crewai_tools import tool
+
+    @tool("evidence_search_tool")
+    def evidence_search_tool(search_query: str) -> str:
+        """Searches the local evidence store of documents collected in earlier analyses, and the web only when the store has too few recent matches. Each result shows its source, how long ago it was fetched and its Admiralty source reliability grade (A-F). Use this before the web search tool."""
+        return evidence_search(search_query)
+
+    return evidence_search_tool
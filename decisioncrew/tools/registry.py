@@ -0,0 +1,129 @@
+# decisioncrew/tools/registry.py
+
+import importlib
+import threading
+import time
+from collections.abc import Mapping
+
+
+class ToolRegistry(Mapping):
+    """
+    Maps the tool names used in the YAML 'tools:' lists to lazily-built tool objects.
+
+    A tool is registered with a factory, either a callable or a 'module:function'
+    string. Nothing is imported or constructed until a workflow first asks for the
+    tool; the import and construction times are recorded for startup_report().
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._tools = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory, override: bool = False):
+        with self._lock:
+            if name in self._factories and not override:
+                raise ValueError(f"Tool '{name}' is already registered.")
+            self._factories[name] = factory
+            self._tools.pop(name, None)
+
+    def __getitem__(self, name: str):
+        tool = self._tools.get(name)
+        if tool is not None:
+            return tool
+        if name not in self._factories:
+            raise KeyError(name)
+        with self._lock:
+            tool = self._tools.get(name)
+            if tool is None:
+                tool = self._build(name)
+                self._tools[name] = tool
+        return tool
+
+    def __contains__(self, name) -> bool:
+        return name in self._factories
+
+    def __iter__(self):
+        return iter(list(self._factories))
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def is_built(self, name: str) -> bool:
+        return name in self._tools
+
+    def _build(self, name: str):
+        factory = self._factories[name]
+        import_seconds = 0.0
+        try:
+            if isinstance(factory, str):
+                module_name, _, attr = factory.partition(":")
+                started = time.perf_counter()
+                module = importlib.import_module(module_name)
+                import_seconds = time.perf_counter() - started
+                factory = getattr(module, attr)
+            started = time.perf_counter()
+            tool = factory()
+            build_seconds = time.perf_counter() - started
+        except Exception as e:
+            raise RuntimeError(f"Could not construct tool '{name}': {e}") from e
+        self._timings[name] = {"import": import_seconds, "construct": build_seconds}
+        return tool
+
+    def timings(self) -> dict:
+        return dict(self._timings)
+
+
+tool_registry = ToolRegistry()
+tool_registry.register("serper_dev_tool", "decisioncrew.tools.web_tools:make_web_search_tool")
+tool_registry.register("website_search_tool", "decisioncrew.tools.web_tools:make_website_search_tool")
+# מחפש קודם במאגר הראיות המקומי, ורק בפערים או בפריטים ישנים פונה ל-serper_dev_tool
+tool_registry.register("evidence_search_tool", "decisioncrew.tools.evidence_store:make_evidence_search_tool")
+tool_registry.register("db_query_tool", "decisioncrew.tools.database_tools:make_db_query_tool")
+tool_registry.register("db_schema_tool", "decisioncrew.tools.database_tools:make_db_schema_tool")
+# ללא קובץ שהועלה הכלי רק מודיע שאין נתונים; IntelligenceCrew מחליף אותו בכלי שקשור לאינדקס
+tool_registry.register("csv_search_tool", "decisioncrew.tools.csv_index:make_csv_search_tool")
+
+
+def register_tool(name: str, factory, override: bool = False):
+    """Registers a tool factory in the process-wide registry."""
+    tool_registry.register(name, factory, override=override)
+
+
+def _timed_import(module_name: str) -> float:
+    started = time.perf_counter()
+    importlib.import_module(module_name)
+    return time.perf_counter() - started
+
+
+def startup_report(modules=(), build_all: bool = False) -> str:
+    """
+    Returns a text table of startup costs: the import time of each module in modules
+    (measured now, so only the first import of a module is meaningful), plus the
+    import and construction time of every tool built so far.
+    With build_all=True every registered tool is constructed first.
+    """
+    lines = ["Startup cost report", "-------------------"]
+    for module_name in modules:
+        lines.append(f"import {module_name:<45} {_timed_import(module_name) * 1000:9.1f} ms")
+    if build_all:
+        for name in tool_registry:
+            try:
+                tool_registry[name]
+            except RuntimeError as e:
+                lines.append(f"tool   {name:<45} FAILED: {e}")
+    for name, timing in tool_registry.timings().items():
+        lines.append(f"tool   {name:<45} {timing['import'] * 1000:9.1f} ms import  {timing['construct'] * 1000:9.1f} ms construct")
+    not_built = [name for name in tool_registry if not tool_registry.is_built(name)]
+    if not_built:
+        lines.append(f"not built: {', '.join(not_built)}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python -m decisioncrew.tools.registry
+    print(startup_report(
+        modules=("crewai", "langchain_openai", "decisioncrew.crews.intelligence_crew", "decisioncrew.crews.wargames_crew"),
+        build_all=True,
+    ))
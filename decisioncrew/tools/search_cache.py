@@ -0,0 +1,177 @@
+# decisioncrew/tools/search_cache.py
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any
+
+from decisioncrew.runtime.metrics import record_cache, time_tool
+from decisioncrew.tools.evidence_store import record_evidence
+
+try:
+    from crewai.tools import BaseTool
+except ImportError:
+    from crewai_tools import BaseTool
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = "\"'`?!.,;:()[]{} "
+
+
+def normalize_query(query) -> str:
+    """Normalizes a search query so near-identical queries share one cache entry."""
+    text = unicodedata.normalize("NFKC", str(query or "")).casefold()
+    return _WHITESPACE.sub(" ", text).strip(_EDGE_PUNCTUATION)
+
+
+class SearchCache:
+    """
+    Shared layer in front of network search tools:
+    - results are cached per normalized query for ttl_seconds (LRU-bounded)
+    - concurrent identical requests are collapsed into one outbound call
+    - at most max_connections calls hit the network at the same time
+    - per-query latency and hit counts are recorded for latency_report(), for the
+      max_stats most recently used queries
+    Failed calls are not cached.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 1024, max_connections: int = 4,
+                 max_stats: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_stats = max_stats
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+        self._connections = threading.BoundedSemaphore(max_connections)
+
+    @staticmethod
+    def make_key(tool_name: str, query, params: dict = None):
+        extra = tuple(sorted((key, normalize_query(value)) for key, value in (params or {}).items()))
+        return (tool_name, normalize_query(query), extra)
+
+    def _record(self, key, outcome: str, latency: float = None):
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {"calls": 0, "hits": 0, "coalesced": 0, "fetches": 0, "total_latency": 0.0}
+            # כמו המטמון עצמו - שומרים רק את השאילתות האחרונות, כדי שתהליך ארוך לא יצבור זיכרון
+            while len(self._stats) > self.max_stats:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        stats["calls"] += 1
+        stats[outcome] += 1
+        if latency is not None:
+            stats["total_latency"] += latency
+            stats["last_latency"] = latency
+
+    def call(self, tool_name: str, fetch, query, params: dict = None):
+        """Returns fetch() for this query, from cache or a shared in-flight call when possible."""
+        key = self.make_key(tool_name, query, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._record(key, "hits")
+                record_cache("search", hit=True)
+                return entry[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._record(key, "coalesced")
+        record_cache("search", hit=not leader)
+
+        if not leader:
+            return future.result()
+
+        started = time.monotonic()
+        try:
+            with self._connections:
+                result = fetch()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._record(key, "fetches", time.monotonic() - started)
+            future.set_exception(e)
+            raise
+
+        latency = time.monotonic() - started
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._record(key, "fetches", latency)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def latency_report(self):
+        """Per-query stats, slowest first: tool, query, calls, hits, coalesced, fetches, avg/last latency."""
+        with self._lock:
+            rows = []
+            for (tool_name, query, _), stats in self._stats.items():
+                fetches = stats["fetches"]
+                rows.append({
+                    "tool": tool_name,
+                    "query": query,
+                    "calls": stats["calls"],
+                    "hits": stats["hits"],
+                    "coalesced": stats["coalesced"],
+                    "fetches": fetches,
+                    "avg_latency": stats["total_latency"] / fetches if fetches else 0.0,
+                    "last_latency": stats.get("last_latency"),
+                })
+        return sorted(rows, key=lambda row: row["avg_latency"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+
+search_cache = SearchCache(
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+    max_connections=int(os.getenv("SEARCH_MAX_CONNECTIONS", "4")),
+)
+
+
+class CachedSearchTool(BaseTool):
+    """
+    Exposes a search tool to agents under its original name, routed through the
+    SearchCache. Every network result is also recorded in the evidence store.
+    """
+    name: str = "cached_search_tool"
+    description: str = "Cached search tool"
+    inner: Any = None
+    query_field: str = "search_query"
+
+    def _run(self, *args, **kwargs) -> Any:
+        params = dict(kwargs)
+        query = params.pop(self.query_field, None)
+        if query is None and args:
+            query = args[0]
+        def fetch():
+            result = self.inner._run(*args, **kwargs)
+            # כל מה שהגיע מהרשת נשמר במאגר הראיות המקומי (decisioncrew/tools/evidence_store.py)
+            record_evidence(self.name, query, params, result)
+            return result
+
+        with time_tool(self.name):
+            return search_cache.call(self.name, fetch, query, params)
+
+
+def cached_tool(tool, query_field: str = "search_query") -> CachedSearchTool:
+    """Wraps a crewai tool instance so its calls go through the shared search cache."""
+    fields = {"name": tool.name, "description": tool.description, "inner": tool, "query_field": query_field}
+    if getattr(tool, "args_schema", None) is not None:
+        fields["args_schema"] = tool.args_schema
+    return CachedSearchTool(**fields)
@@ -1,10 +1,18 @@
 # decisioncrew/tools/web_tools.py
 
-# אנחנו משאירים רק את הכלים המובנים והסטנדרטיים שעובדים
-from crewai_tools import SerperDevTool, WebsiteSearchTool
+from decisioncrew.tools.search_cache import cached_tool
 
-# --- כלים סטנדרטיים ---
-web_search_tool = SerperDevTool()
-website_search_tool = WebsiteSearchTool()
+# הכלים נבנים רק כשזרימת עבודה מבקשת אותם (דרך tool_registry), כדי שייבוא
+# הצוותים לא ישלם על crewai_tools, embeddings ו-vector store כשאין בהם צורך.
+# שניהם עטופים בשכבת מטמון משותפת (TTL, איחוד בקשות זהות, הגבלת חיבורים).
 
-# --- כל הכלים המותאמים אישית (NewsAPI, Telegram) הוסרו מכאן ---
\ No newline at end of file
+def make_web_search_tool():
+    from crewai_tools import SerperDevTool
+    return cached_tool(SerperDevTool())
+
+
+def make_website_search_tool():
+    from crewai_tools import WebsiteSearchTool
+    return cached_tool(WebsiteSearchTool())
+
+# --- כל הכלים המותאמים אישית (NewsAPI, Telegram) הוסרו מכאן ---
@@ -0,0 +1,89 @@
+# tests/test_batch.py
+
+import json
+
+from decisioncrew import batch
+from decisioncrew.batch import _truncate_torn_tail, completed_ids, read_rows, row_id, run_batch
+
+
+def fake_run_row(row):
+    """Stands in for run_row in the worker processes: no crew, an error for topics marked 'fail'."""
+    record = {"id": row["id"], "workflow": row["workflow"], "topic": row["topic"]}
+    if "fail" in row["topic"]:
+        record.update(status="error", error="boom")
+    else:
+        record.update(status="ok", result=f"answer to {row['topic']}")
+    return record
+
+
+def write_lines(path, lines):
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def test_row_ids_are_stable_and_include_the_csv():
+    row = {"workflow": "osint", "topic": "Aegean"}
+    assert row_id(row) == row_id(dict(row))
+    assert row_id(row) != row_id({**row, "csv": "data/a.csv"})
+    assert row_id({**row, "id": 7}) == "7"
+
+
+def test_read_rows_from_jsonl_and_csv(tmp_path):
+    jsonl = tmp_path / "kirs.jsonl"
+    write_lines(jsonl, ['{"id": "a", "topic": "Aegean"}\n', '\n', '{"kir": "Cyprus", "workflow": "db"}\n', '{"topic": ""}\n'])
+    rows = list(read_rows(str(jsonl)))
+    assert [(row["id"], row["topic"], row["workflow"]) for row in rows] == \
+        [("a", "Aegean", "osint"), (row_id({"workflow": "db", "topic": "Cyprus"}), "Cyprus", "db")]
+
+    table = tmp_path / "kirs.csv"
+    write_lines(table, ["topic,workflow,csv\n", "Aegean,combined,data/a.csv\n"])
+    [row] = read_rows(str(table))
+    assert (row["workflow"], row["csv"]) == ("combined", "data/a.csv")
+
+
+def test_completed_ids_skip_torn_lines_and_retry_failures(tmp_path):
+    output = tmp_path / "results.jsonl"
+    write_lines(output, ['{"id": "a", "status": "ok"}\n', '{"id": "b", "status": "error"}\n', '{"id": "c", "sta'])
+    assert completed_ids(str(output)) == {"a"}
+    assert completed_ids(str(output), retry_failed=False) == {"a", "b"}
+    assert completed_ids(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_truncate_torn_tail(tmp_path):
+    output = tmp_path / "results.jsonl"
+    write_lines(output, ['{"id": "a"}\n', '{"id": "b'])
+    _truncate_torn_tail(str(output))
+    assert output.read_text() == '{"id": "a"}\n'
+    # קובץ שלם לא משתנה
+    _truncate_torn_tail(str(output))
+    assert output.read_text() == '{"id": "a"}\n'
+    # רשומה קטועה ארוכה מבלוק קריאה אחד
+    write_lines(output, ['{"id": "a"}\n', '{"id": "b", "result": "' + "x" * 200_000])
+    _truncate_torn_tail(str(output))
+    assert output.read_text() == '{"id": "a"}\n'
+    # אין אף שורה שלמה
+    write_lines(output, ['{"id": "a", "res'])
+    _truncate_torn_tail(str(output))
+    assert output.read_text() == ""
+
+
+def test_run_batch_resumes_after_a_crash(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "run_row", fake_run_row)
+    kirs = tmp_path / "kirs.jsonl"
+    write_lines(kirs, [json.dumps({"id": name, "topic": topic}) + "\n"
+                       for name, topic in [("a", "Aegean"), ("b", "Cyprus"), ("c", "Thrace"), ("d", "fail here")]])
+    output = tmp_path / "results.jsonl"
+    # ריצה קודמת: a הושלמה, b נכשלה, c נקטעה באמצע הכתיבה
+    write_lines(output, [json.dumps({"id": "a", "status": "ok", "result": "old"}) + "\n",
+                         json.dumps({"id": "b", "status": "error", "error": "timeout"}) + "\n",
+                         '{"id": "c", "status": "o'])
+
+    counts = run_batch(str(kirs), str(output), workers=2)
+    assert counts == {"ok": 2, "error": 1, "skipped": 1}
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [record["id"] for record in records[:2]] == ["a", "b"]
+    assert sorted((record["id"], record["status"]) for record in records[2:]) == [("b", "ok"), ("c", "ok"), ("d", "error")]
+
+    # ריצה נוספת מדלגת על כל מה שהושלם ומנסה שוב רק את השורה שנכשלה
+    counts = run_batch(str(kirs), str(output), workers=1)
+    assert counts == {"ok": 0, "error": 1, "skipped": 3}
+    assert run_batch(str(kirs), str(output), workers=1, retry_failed=False) == {"ok": 0, "error": 0, "skipped": 4}
@@ -0,0 +1,79 @@
+# tests/test_checkpoints.py
+
+import time
+from types import SimpleNamespace
+
+import yaml
+
+from decisioncrew.crews import scheduler
+from decisioncrew.crews.registry import WorkflowRegistry
+from decisioncrew.runtime.checkpoints import CheckpointStore, TaskCheckpointer
+
+AGENTS = {"analyst": {"role": "Analyst", "goal": "Analyse", "backstory": "Test agent"}}
+# collect -> assess -> report, ו-background שאינה תלויה באף משימה
+TASKS = {
+    "collect": {"description": "Collect sources", "expected_output": "Sources", "agent": "analyst"},
+    "background": {"description": "Write background", "expected_output": "Background", "agent": "analyst"},
+    "assess": {"description": "Assess sources", "expected_output": "Assessment", "agent": "analyst",
+               "context": ["collect"]},
+    "report": {"description": "Write report", "expected_output": "Report", "agent": "analyst",
+               "context": ["assess", "background"]},
+}
+
+
+def write_workflow(root, tasks):
+    path = root / "demo"
+    path.mkdir(exist_ok=True)
+    (path / "agents.yaml").write_text(yaml.safe_dump(AGENTS))
+    (path / "tasks.yaml").write_text(yaml.safe_dump(tasks, sort_keys=False))
+
+
+def run(registry, store, monkeypatch):
+    """Runs the demo workflow with stub tasks; returns the names of the tasks that actually executed."""
+    workflow = registry.get("demo")
+    executed = []
+
+    def execute_task(task, context=None):
+        executed.append(task.name)
+        return f"{task.description} [{context or ''}]"
+
+    monkeypatch.setattr(scheduler, "execute_task", execute_task)
+    tasks = {name: SimpleNamespace(name=name, description=config["description"], agent=None)
+             for name, config in workflow.tasks_config.items()}
+    checkpointer = TaskCheckpointer(store, workflow, "fake")
+    scheduler.run_task_graph(tasks, workflow.tasks_config, max_workers=2, checkpointer=checkpointer)
+    return executed, checkpointer.restored
+
+
+def test_editing_one_task_reruns_only_it_and_its_dependents(tmp_path, monkeypatch):
+    write_workflow(tmp_path, TASKS)
+    registry = WorkflowRegistry(str(tmp_path))
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"), max_age_seconds=3600)
+
+    executed, restored = run(registry, store, monkeypatch)
+    assert sorted(executed) == ["assess", "background", "collect", "report"]
+    assert restored == []
+
+    # ריצה זהה שהושלמה נטענת כולה מהנקודות השמורות
+    executed, restored = run(registry, store, monkeypatch)
+    assert executed == []
+    assert sorted(restored) == ["assess", "background", "collect", "report"]
+
+    edited = {name: dict(config) for name, config in TASKS.items()}
+    edited["assess"]["description"] = "Assess sources with confidence levels"
+    write_workflow(tmp_path, edited)
+    registry.invalidate("demo")
+    executed, restored = run(registry, store, monkeypatch)
+    assert executed == ["assess", "report"]
+    assert sorted(restored) == ["background", "collect"]
+
+
+def test_complete_purges_only_expired_entries(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite"), max_age_seconds=60)
+    store.put("old", "demo", "collect", "stale output")
+    store.put("new", "demo", "assess", "fresh output")
+    store._conn.execute("UPDATE checkpoints SET created = ? WHERE key = 'old'", (time.time() - 120,))
+    store._conn.commit()
+    TaskCheckpointer(store, SimpleNamespace(name="demo"), "fake").complete()
+    assert store._conn.execute("SELECT key FROM checkpoints").fetchall() == [("new",)]
+    assert store.get("new") == "fresh output"
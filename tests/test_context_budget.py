@@ -0,0 +1,42 @@
+# tests/test_context_budget.py
+
+from crewai import Agent, Process, Task
+
+from decisioncrew.crews.context_budget import BudgetedCrew, ContextCompactor, TaskContextBuilder, count_tokens
+from decisioncrew.llm.adapter import as_crew_llm
+from decisioncrew.llm.fake import make_fake_llm
+
+TASKS_CONFIG = {
+    "collect": {"agent": "analyst"},
+    "background": {"agent": "analyst"},
+    "report": {"agent": "analyst", "context": ["collect", "background"], "max_context_tokens": 150},
+}
+
+
+def test_sequential_crew_enforces_context_budgets(monkeypatch):
+    monkeypatch.setenv("CREW_METRICS", "0")
+    llm = as_crew_llm(make_fake_llm("fake-budget", latency=0, completion_tokens=400), agent="analyst")
+    agent = Agent(role="Analyst", goal="Analyse", backstory="Test agent", llm=llm, verbose=False)
+    tasks = {name: Task(description=f"Write the {name}", expected_output=name.title(), agent=agent)
+             for name in TASKS_CONFIG}
+    tasks["report"].context = [tasks["collect"], tasks["background"]]
+    seen = {}
+    original_execute = Task.execute_sync
+
+    def execute_sync(task, agent=None, context=None, tools=None):
+        seen[task.description] = context
+        return original_execute(task, agent=agent, context=context, tools=tools)
+
+    monkeypatch.setattr(Task, "execute_sync", execute_sync)
+    # בלי מודל לסיכום, הקונטקסט מקוצר מהאמצע
+    builder = TaskContextBuilder(TASKS_CONFIG, ContextCompactor(llm=None))
+    crew = BudgetedCrew(agents=[agent], tasks=list(tasks.values()), process=Process.sequential, verbose=False)
+    crew.set_context_builder(builder, tasks)
+    crew.kickoff()
+
+    usage = builder.usage["report"]
+    assert usage["upstream_tokens"] > 150
+    assert sorted(usage["compacted"]) == ["background", "collect"]
+    assert count_tokens(seen["Write the report"]) <= 200
+    # משימות בלי תקציב מקבלות את הקונטקסט של crewai כמו שהוא
+    assert set(builder.usage) == {"report"}
@@ -0,0 +1,86 @@
+# tests/test_database_tools.py
+
+import sqlite3
+
+import pytest
+
+from decisioncrew.tools.database_tools import QueryLimits, ReadOnlySQLitePool, _single_statement
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "history.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, country TEXT, year INTEGER, note TEXT)")
+    conn.executemany("INSERT INTO events (country, year, note) VALUES (?, ?, ?)",
+                     [("Greece" if i % 2 else "Turkey", 2000 + i % 24, "x" * 80) for i in range(500)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT 1", "SELECT 1"),
+    ("SELECT 1;", "SELECT 1"),
+    ("SELECT 1; -- trailing comment", "SELECT 1"),
+    ("SELECT ';' AS semicolon;", "SELECT ';' AS semicolon"),
+    ('SELECT 1 AS "a;b"', 'SELECT 1 AS "a;b"'),
+    ("SELECT 1; DROP TABLE events", None),
+    ("SELECT 1; /* hidden */ DELETE FROM events;", None),
+])
+def test_single_statement(sql, expected):
+    assert _single_statement(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM events",
+    "-- looks harmless\nDROP TABLE events",
+    "/* comment */ UPDATE events SET year = 0",
+    "SELECT 1; DROP TABLE events",
+    "PRAGMA query_only = OFF",
+])
+def test_writes_and_multiple_statements_are_rejected(database, sql):
+    pool = ReadOnlySQLitePool(database, size=1)
+    assert pool.query(sql).startswith("Error:")
+    assert pool.query("SELECT COUNT(*) AS n FROM events").splitlines()[1] == "500"
+
+
+def test_write_hidden_in_a_cte_fails_on_the_read_only_connection(database):
+    pool = ReadOnlySQLitePool(database, size=1)
+    result = pool.query("WITH doomed AS (SELECT id FROM events) DELETE FROM events WHERE id IN (SELECT id FROM doomed)")
+    assert result.startswith("SQL error:")
+    assert pool.query("SELECT COUNT(*) AS n FROM events").splitlines()[1] == "500"
+
+
+def test_row_limit(database):
+    pool = ReadOnlySQLitePool(database, limits=QueryLimits(max_rows=50, max_bytes=1_000_000))
+    lines = pool.query("SELECT id, country FROM events").splitlines()
+    assert len(lines) == 1 + 50 + 2
+    assert "truncated at the row limit of 50" in lines[-2]
+    assert lines[-1].startswith("(50 rows")
+
+
+def test_byte_limit(database):
+    pool = ReadOnlySQLitePool(database, limits=QueryLimits(max_rows=1000, max_bytes=2_000))
+    result = pool.query("SELECT * FROM events")
+    assert "truncated at the size limit of 2000 bytes" in result
+    table = result.split("\n... truncated")[0]
+    assert len(table) <= 2_000
+
+
+def test_long_queries_are_cancelled(database):
+    pool = ReadOnlySQLitePool(database, limits=QueryLimits(timeout_seconds=0.2))
+    result = pool.query("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+    assert "exceeded the" in result and "timeout" in result
+    # החיבור חוזר למאגר ושמיש
+    assert pool.query("SELECT 1 AS one").splitlines()[1] == "1"
+
+
+def test_busy_pool_reports_instead_of_hanging(database):
+    pool = ReadOnlySQLitePool(database, size=1, limits=QueryLimits(timeout_seconds=0.1))
+    held = pool._acquire()
+    try:
+        assert "database connections stayed busy" in pool.query("SELECT 1")
+    finally:
+        pool._release(held)
+    assert pool.query("SELECT 1 AS one").splitlines()[1] == "1"
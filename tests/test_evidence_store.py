@@ -0,0 +1,90 @@
+# tests/test_evidence_store.py
+
+import json
+
+import pytest
+
+from decisioncrew.tools import evidence_store
+from decisioncrew.tools.evidence_store import EvidenceStore, evidence_search, extract_documents, record_evidence
+
+SERPER_RESULT = json.dumps({"organic": [
+    {"title": "Naval standoff in the Aegean", "link": "https://www.reuters.com/world/aegean-1",
+     "snippet": "Greek and Turkish naval vessels shadowed each other near Aegean islets.", "date": "2 days ago"},
+    {"title": "Aegean airspace violations rise", "link": "https://example-blog.net/aegean",
+     "snippet": "Greek officials report more Turkish airspace violations over the Aegean.", "date": None},
+    {"title": "Aegean talks resume", "link": "https://www.bbc.com/news/aegean",
+     "snippet": "Greek and Turkish diplomats resume talks on Aegean maritime zones."},
+]})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("EVIDENCE_STORE", "1")
+    for name in ("EVIDENCE_MIN_LOCAL_RESULTS", "EVIDENCE_MAX_AGE_HOURS", "EVIDENCE_RESULTS"):
+        monkeypatch.delenv(name, raising=False)
+    store = EvidenceStore(str(tmp_path / "evidence.sqlite"))
+    monkeypatch.setattr(evidence_store, "_default_store", store)
+    return store
+
+
+class WebSearch:
+    """Stands in for the cached web search: records what it fetched, as the search layer does."""
+
+    def __init__(self, result=SERPER_RESULT, error=None):
+        self.result, self.error, self.queries = result, error, []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        if self.error is not None:
+            raise self.error
+        record_evidence("serper_dev_tool", query, {}, self.result)
+        return self.result
+
+
+def test_extract_documents_understands_serper_json_and_text():
+    documents = extract_documents(SERPER_RESULT)
+    assert [document["url"] for document in documents][0] == "https://www.reuters.com/world/aegean-1"
+    text = "Title: A\nLink: https://apnews.com/a\nSnippet: First\n---\nTitle: B\nLink: https://x.com/b\nSnippet: Second\n---"
+    assert [(document["title"], document["content"]) for document in extract_documents(text)] == [("A", "First"), ("B", "Second")]
+    assert extract_documents("Relevant page content", {"website": "https://nato.int/page"}) == \
+        [{"title": None, "url": "https://nato.int/page", "content": "Relevant page content", "published": None}]
+
+
+def test_documents_are_deduplicated_by_content(store):
+    documents = extract_documents(SERPER_RESULT)
+    assert store.record(documents, tool="serper_dev_tool", query="aegean") == 3
+    assert store.record([{**documents[0], "url": "https://mirror.example/aegean"}], query="aegean again") == 0
+    assert store.count() == 3
+    [top] = store.search("naval vessels shadowed Aegean islets", limit=1)
+    assert (top["reliability"], top["seen_count"]) == ("B", 2)
+
+
+def test_falls_back_to_the_web_until_the_store_has_enough_local_evidence(store):
+    web = WebSearch()
+    first = evidence_search("Greek Turkish Aegean", web_search=web)
+    assert web.queries == ["Greek Turkish Aegean"]
+    assert "Reliability: B" in first and store.count() == 3
+
+    # השאלה הבאה נענית מהמאגר המקומי, בלי רשת
+    second = evidence_search("Aegean Greek Turkish tensions", web_search=web)
+    assert web.queries == ["Greek Turkish Aegean"]
+    assert "Naval standoff in the Aegean" in second
+
+
+def test_stale_evidence_triggers_a_web_search(store, monkeypatch):
+    store.record(extract_documents(SERPER_RESULT), tool="serper_dev_tool", query="aegean")
+    store._conn.execute("UPDATE documents SET last_seen = last_seen - 7 * 24 * 3600")
+    store._conn.commit()
+    monkeypatch.setenv("EVIDENCE_MAX_AGE_HOURS", "48")
+    web = WebSearch()
+    evidence_search("Greek Turkish Aegean", web_search=web)
+    assert web.queries == ["Greek Turkish Aegean"]
+
+
+def test_web_failure_falls_back_to_local_evidence(store):
+    store.record(extract_documents(SERPER_RESULT)[:1], tool="serper_dev_tool", query="aegean")
+    result = evidence_search("naval Aegean", web_search=WebSearch(error=RuntimeError("network down")))
+    assert result.startswith("(Web search failed: network down.")
+    assert "Naval standoff in the Aegean" in result
+    assert evidence_search("Baltic grain corridor", web_search=WebSearch(error=RuntimeError("network down"))) \
+        .endswith("No evidence found for this query, locally or on the web.")
@@ -0,0 +1,81 @@
+# tests/test_jobs.py
+
+import time
+
+import pytest
+
+from decisioncrew.llm import limiter
+from decisioncrew.runtime import jobs
+from decisioncrew.runtime.jobs import JobRunner, JobStore
+
+
+def stub_crew(params, emit):
+    for task in params["tasks"]:
+        emit("task_done", task, f"{task} output")
+    return {"lane": limiter._lane.get(), "tasks": params["tasks"]}
+
+
+def failing_crew(params, emit):
+    emit("task_done", "research_task", "partial")
+    raise RuntimeError("LLM is down")
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "stub", stub_crew)
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "failing", failing_crew)
+    monkeypatch.setitem(jobs.JOB_LANES, "stub_batch", "batch")
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "stub_batch", stub_crew)
+    runner = JobRunner(JobStore(str(tmp_path / "jobs.sqlite")), max_workers=2)
+    yield runner
+    runner.shutdown()
+
+
+def wait_for(store, job_id):
+    deadline = time.monotonic() + 5
+    while store.get(job_id)["status"] in jobs.ACTIVE_STATUSES and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.get(job_id)
+
+
+def test_job_records_progress_events_and_result(runner):
+    job_id = runner.submit("stub", tasks=["research_task", "report_task"])
+    job = wait_for(runner.store, job_id)
+    assert job["status"] == "succeeded"
+    assert job["params"] == {"tasks": ["research_task", "report_task"]}
+    assert job["result"] == {"lane": "interactive", "tasks": ["research_task", "report_task"]}
+    events = runner.store.events(job_id)
+    assert [(e["event"], e["task"]) for e in events] == \
+        [("started", None), ("task_done", "research_task"), ("task_done", "report_task"), ("finished", None)]
+    # poll חוזר מחזיר רק אירועים חדשים
+    assert runner.store.events(job_id, after=events[1]["id"]) == events[2:]
+
+
+def test_failed_job_keeps_its_error_and_partial_progress(runner):
+    job_id = runner.submit("failing")
+    job = wait_for(runner.store, job_id)
+    assert (job["status"], job["error"], job["result"]) == ("failed", "LLM is down", None)
+    assert [e["event"] for e in runner.store.events(job_id)] == ["started", "task_done", "failed"]
+
+
+def test_batch_jobs_run_in_the_batch_lane(runner):
+    job = wait_for(runner.store, runner.submit("stub_batch", tasks=[]))
+    assert job["result"]["lane"] == "batch"
+
+
+def test_unknown_kind_is_rejected(runner):
+    with pytest.raises(ValueError, match="Unknown job kind"):
+        runner.submit("nope")
+    assert runner.store.recent() == []
+
+
+def test_jobs_without_heartbeat_are_interrupted(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    stale, fresh = store.create("stub", {}), store.create("stub", {})
+    store._conn().execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?",
+                          (time.time() - jobs.STALE_AFTER_SECONDS - 1, stale))
+    assert store.get(stale)["status"] == "interrupted"
+    assert store.get(fresh)["status"] == "queued"
+    # שרת שעלה מחדש מסמן את העבודות היתומות לצמיתות
+    assert store.mark_interrupted() == 1
+    assert {job["id"]: job["status"] for job in store.recent()} == {stale: "interrupted", fresh: "queued"}
@@ -0,0 +1,127 @@
+# tests/test_limiter.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from decisioncrew.llm import limiter
+from decisioncrew.llm.fake_server import start_fake_endpoint
+from decisioncrew.llm.limiter import LLMScheduler, ScheduledChatOpenAI, priority_lane
+
+
+@pytest.fixture
+def endpoint():
+    server = start_fake_endpoint(error_rate=0.4, retry_after=0, seed=7)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=4, max_retries=20, retry_burst=100, base_delay=0.001, max_delay=0.01)
+    monkeypatch.setattr(limiter, "_default_scheduler", scheduler)
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    return scheduler
+
+
+def make_client(server):
+    return ScheduledChatOpenAI(model="fake", api_key="test", max_retries=0,
+                               base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+
+
+def assert_retried(server, scheduler, calls):
+    assert server.stats["rate_limited"] > 0
+    assert scheduler.stats["calls"] == calls
+    assert scheduler.stats["retries"] == scheduler.stats["throttled"] == server.stats["rate_limited"]
+    assert scheduler.in_flight == 0
+
+
+def test_generate_retries_429s(endpoint, scheduler):
+    client = make_client(endpoint)
+    answers = [client.invoke(f"question {i}").content for i in range(8)]
+    assert all("Final Answer:" in answer for answer in answers)
+    assert_retried(endpoint, scheduler, calls=8)
+
+
+def test_agenerate_retries_429s(endpoint, scheduler):
+    client = make_client(endpoint)
+
+    async def ask_all():
+        return await asyncio.gather(*(client.ainvoke(f"question {i}") for i in range(8)))
+
+    answers = asyncio.run(ask_all())
+    assert all("Final Answer:" in answer.content for answer in answers)
+    assert_retried(endpoint, scheduler, calls=8)
+
+
+def test_stream_goes_through_scheduler(endpoint, scheduler):
+    client = make_client(endpoint)
+    answers = ["".join(chunk.content for chunk in client.stream(f"question {i}")) for i in range(8)]
+    assert all("Final Answer:" in answer for answer in answers)
+    assert_retried(endpoint, scheduler, calls=8)
+
+
+def test_astream_goes_through_scheduler(endpoint, scheduler):
+    client = make_client(endpoint)
+
+    async def stream_one(i):
+        return "".join([chunk.content async for chunk in client.astream(f"question {i}")])
+
+    async def stream_all():
+        return await asyncio.gather(*(stream_one(i) for i in range(8)))
+
+    answers = asyncio.run(stream_all())
+    assert all("Final Answer:" in answer for answer in answers)
+    assert_retried(endpoint, scheduler, calls=8)
+
+
+def test_throttling_halves_concurrency_and_gives_up(scheduler):
+    server = start_fake_endpoint(error_rate=1.0, retry_after=0, seed=7)
+    try:
+        scheduler.max_retries = 3
+        with pytest.raises(Exception) as error:
+            make_client(server).invoke("question")
+        assert limiter.is_retryable(error.value)
+        assert server.stats["requests"] == 4
+        assert scheduler.limit == scheduler.min_concurrency
+        assert scheduler.in_flight == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_interactive_lane_is_admitted_before_waiting_batch_calls():
+    scheduler = LLMScheduler(max_concurrency=1)
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    def hold_slot():
+        started.set()
+        release.wait(5)
+
+    def submit(lane, name):
+        def run():
+            with priority_lane(lane):
+                scheduler.call(lambda: order.append(name))
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    holder = threading.Thread(target=scheduler.call, args=(hold_slot,))
+    holder.start()
+    assert started.wait(5)
+    threads = [submit("batch", f"batch-{i}") for i in range(3)] + [submit("interactive", f"interactive-{i}") for i in range(2)]
+    # כל הקריאות ממתינות בתור לפני שהחריץ מתפנה
+    deadline = time.monotonic() + 5
+    while len(scheduler._waiting) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(scheduler._waiting) == 5
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(5)
+    assert sorted(order[:2]) == ["interactive-0", "interactive-1"]
+    assert sorted(order[2:]) == ["batch-0", "batch-1", "batch-2"]
+    assert scheduler.in_flight == 0
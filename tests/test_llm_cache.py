@@ -0,0 +1,68 @@
+# tests/test_llm_cache.py
+
+import time
+
+import pytest
+import yaml
+
+from decisioncrew.crews import intelligence_crew
+from decisioncrew.crews.intelligence_crew import IntelligenceCrew
+from decisioncrew.crews.registry import WorkflowRegistry
+from decisioncrew.llm import cache as llm_cache
+from decisioncrew.llm.cache import SQLiteLRUCache, llm_cache_enabled
+
+AGENTS = {"analyst": {"role": "Analyst", "goal": "Analyse {topic}", "backstory": "Test agent"}}
+TASKS = {
+    "research": {"description": "Research {topic}", "expected_output": "Findings", "agent": "analyst"},
+    "live_update": {"description": "Check today's news on {topic}", "expected_output": "News", "agent": "analyst",
+                    "llm_cache": False, "context": ["research"]},
+}
+
+
+def test_corrupt_entry_counts_as_a_miss(tmp_path):
+    cache = SQLiteLRUCache(str(tmp_path / "llm_cache.sqlite"))
+    key = cache.make_key("prompt", "llm")
+    cache._conn.execute("INSERT INTO llm_cache (key, llm_string, response, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, "llm", "not json", 8, time.time(), time.time()))
+    cache._conn.commit()
+    assert cache.lookup("prompt", "llm") is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+@pytest.fixture
+def workflow(tmp_path, monkeypatch):
+    path = tmp_path / "workflows" / "demo"
+    path.mkdir(parents=True)
+    (path / "agents.yaml").write_text(yaml.safe_dump(AGENTS))
+    (path / "tasks.yaml").write_text(yaml.safe_dump(TASKS, sort_keys=False))
+    registry = WorkflowRegistry(str(tmp_path / "workflows"))
+    monkeypatch.setattr(intelligence_crew, "get_workflow", registry.get)
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setenv("MODEL_NAME", "fake-cache-test")
+    monkeypatch.delenv("LLM_CACHE_BYPASS", raising=False)
+    return registry.get("demo")
+
+
+def client_cache(task):
+    return task.agent.llm.client.cache
+
+
+def test_task_level_bypass_leaves_the_agents_other_tasks_cached(workflow):
+    assert workflow.uncached_agents == frozenset()
+    assert workflow.uncached_tasks == frozenset({"live_update"})
+    crew = IntelligenceCrew("demo")
+    crew.setup_crew("Aegean")
+    assert isinstance(client_cache(crew.tasks["research"]), SQLiteLRUCache)
+    assert client_cache(crew.tasks["live_update"]) is False
+    assert crew.tasks["research"].agent.role == crew.tasks["live_update"].agent.role
+
+
+def test_workflow_level_bypass(workflow, monkeypatch):
+    crew = IntelligenceCrew("demo", llm_cache=False)
+    crew.setup_crew("Aegean")
+    assert all(client_cache(task) is False for task in crew.tasks.values())
+
+    monkeypatch.setenv("LLM_CACHE_BYPASS", "osint, demo")
+    assert not llm_cache_enabled("demo") and llm_cache_enabled("combined")
+    assert not IntelligenceCrew("demo").llm_cache
@@ -0,0 +1,126 @@
+# tests/test_memo.py
+
+import threading
+
+import pytest
+
+from decisioncrew.runtime import memo as memo_module
+from decisioncrew.runtime.memo import RunMemo, memo_key
+
+
+class Crew:
+    """Stands in for a crew run: counts executions and can block or fail on demand."""
+
+    def __init__(self):
+        self.runs = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def __call__(self):
+        self.runs += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return f"report {self.runs}"
+
+
+@pytest.fixture
+def joined(monkeypatch):
+    """Released once for every call that joins a run in flight (or hits the memo), before it waits."""
+    semaphore = threading.Semaphore(0)
+
+    def record_cache(cache, hit):
+        if hit:
+            semaphore.release()
+
+    monkeypatch.setattr(memo_module, "record_cache", record_cache)
+    return semaphore
+
+
+def wait_joined(joined, count):
+    return all(joined.acquire(timeout=5) for _ in range(count))
+
+
+def test_keys_ignore_case_and_spacing_but_not_inputs():
+    key = memo_key("osint", "Greece  and Turkey", None, "abc", "gpt-4o")
+    assert memo_key("osint", " greece and TURKEY ", None, "abc", "gpt-4o") == key
+    assert memo_key("osint", "Greece and Turkey", "csv-hash", "abc", "gpt-4o") != key
+    assert memo_key("osint", "Greece and Turkey", None, "def", "gpt-4o") != key
+    assert memo_key("db", "Greece and Turkey", None, "abc", "gpt-4o") != key
+
+
+def test_identical_concurrent_runs_execute_once(joined):
+    memo, crew = RunMemo(), Crew()
+    crew.release.clear()
+    results = []
+
+    def run():
+        results.append(memo.call("key", crew))
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    # הריצה הראשונה באמצע; הבקשות הזהות מצטרפות אליה
+    assert crew.started.wait(5)
+    followers = [threading.Thread(target=run) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    assert wait_joined(joined, 4)
+    crew.release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert results == ["report 1"] * 5
+    assert crew.runs == 1
+    assert memo.call("key", crew) == "report 1"
+
+
+def test_waiters_share_the_leaders_exception_and_failures_are_not_kept(joined):
+    memo, crew = RunMemo(), Crew()
+    crew.release.clear()
+    crew.error = RuntimeError("model unavailable")
+    errors = []
+
+    def run():
+        try:
+            memo.call("key", crew)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=run)]
+    threads[0].start()
+    assert crew.started.wait(5)
+    threads.append(threading.Thread(target=run))
+    threads[1].start()
+    assert wait_joined(joined, 1)
+    crew.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ["model unavailable"] * 2
+    assert crew.runs == 1
+
+    crew.error = None
+    assert memo.call("key", crew) == "report 2"
+
+
+def test_uncacheable_results_and_expired_entries_run_again():
+    memo, crew = RunMemo(ttl_seconds=60), Crew()
+    assert memo.call("key", crew, cacheable=lambda result: False) == "report 1"
+    assert memo.call("key", crew) == "report 2"
+    assert memo.call("key", crew) == "report 2"
+
+    expired = RunMemo(ttl_seconds=0)
+    expired.call("key", crew)
+    expired.call("key", crew)
+    assert crew.runs == 4
+
+
+def test_entries_are_bounded():
+    memo, crew = RunMemo(max_entries=2), Crew()
+    for key in ("a", "b", "c"):
+        memo.call(key, crew)
+    assert memo.call("c", crew) == "report 3"
+    assert memo.call("a", crew) == "report 4"
+    with pytest.raises(ZeroDivisionError):
+        memo.call("d", lambda: 1 / 0)
@@ -0,0 +1,48 @@
+# tests/test_metrics.py
+
+import pytest
+
+from decisioncrew.llm.adapter import BaseLLM, as_crew_llm
+from decisioncrew.llm.fake import make_fake_llm
+from decisioncrew.llm.fake_server import start_fake_endpoint
+from decisioncrew.llm.limiter import ScheduledChatOpenAI
+from decisioncrew.runtime.metrics import metrics_handler, track_agent, track_run
+
+
+@pytest.fixture(autouse=True)
+def no_metric_files(monkeypatch):
+    monkeypatch.setenv("CREW_METRICS", "0")
+
+
+@pytest.mark.skipif(BaseLLM is None, reason="crewai accepts LangChain models directly")
+def test_adapter_attributes_calls_to_its_agent_without_a_task():
+    client = make_fake_llm("fake-metrics", callbacks=[metrics_handler], latency=0)
+    analyst, reviewer = as_crew_llm(client, agent="analyst"), as_crew_llm(client, agent="reviewer")
+    assert analyst is as_crew_llm(client, agent="analyst") and analyst is not reviewer
+    # כמו Crew.kickoff הסדרתי: אין track_task סביב הקריאות
+    with track_run("TestCrew", "demo", "fake-metrics") as metrics:
+        analyst.call("first question")
+        analyst.call("second question")
+        reviewer.call("third question")
+    assert metrics.agents["analyst"]["calls"] == 2
+    assert metrics.agents["reviewer"]["calls"] == 1
+    assert "unattributed" not in metrics.agents
+
+
+def test_streamed_calls_record_time_to_first_token(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    server = start_fake_endpoint(latency=0.05, seed=7)
+    try:
+        client = ScheduledChatOpenAI(model="fake", api_key="test", max_retries=0, streaming=True, stream_usage=True,
+                                     callbacks=[metrics_handler],
+                                     base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+        with track_run("TestCrew", "demo", "fake") as metrics, track_agent("analyst"):
+            answer = client.invoke("question").content
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "Final Answer:" in answer
+    stats = metrics.agents["analyst"]
+    assert stats["calls"] == 1
+    assert stats["ttft"] is not None and 0 < stats["ttft"] <= stats["latency"]
+    assert stats["completion_tokens"] > 0
@@ -0,0 +1,100 @@
+# tests/test_scheduler.py
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from decisioncrew.crews import scheduler
+from decisioncrew.crews.scheduler import CONTEXT_SEPARATOR, DagScheduler, build_task_graph, topological_order
+
+# collect -> assess -> report, background -> report
+TASKS_CONFIG = {
+    "collect": {},
+    "background": {"context": None},
+    "assess": {"context": "collect"},
+    "report": {"context": ["assess", "background", "missing", "report"]},
+}
+
+
+def test_build_task_graph_keeps_known_links_only():
+    assert build_task_graph(TASKS_CONFIG) == {
+        "collect": [], "background": [], "assess": ["collect"], "report": ["assess", "background"],
+    }
+    assert build_task_graph(TASKS_CONFIG, task_names=["assess", "report"]) == {"assess": [], "report": ["assess"]}
+
+
+def test_topological_order_is_stable_and_rejects_cycles():
+    assert topological_order(build_task_graph(TASKS_CONFIG)) == ["collect", "background", "assess", "report"]
+    with pytest.raises(ValueError, match="cycle"):
+        topological_order({"a": ["b"], "b": ["a"], "c": []})
+
+
+def test_independent_tasks_run_concurrently_and_dependents_get_upstream_outputs():
+    graph = build_task_graph(TASKS_CONFIG)
+    # collect ו-background חייבות לרוץ יחד כדי לעבור את המחסום
+    barrier = threading.Barrier(2, timeout=5)
+    received = {}
+
+    def execute(name, upstream):
+        received[name] = upstream
+        if name in ("collect", "background"):
+            barrier.wait()
+        return f"{name} output"
+
+    outputs = DagScheduler(max_workers=2).run(graph, execute)
+    assert list(outputs) == ["collect", "background", "assess", "report"]
+    assert received["assess"] == {"collect": "collect output"}
+    assert received["report"] == {"assess": "assess output", "background": "background output"}
+
+
+def test_max_workers_bounds_concurrency():
+    graph = {f"task{i}": [] for i in range(6)}
+    lock, running, peak = threading.Lock(), [0], [0]
+    release = threading.Event()
+
+    def execute(name, upstream):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            if peak[0] == 2:
+                release.set()
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+        return name
+
+    DagScheduler(max_workers=2).run(graph, execute)
+    assert peak[0] == 2
+
+
+def test_failure_stops_the_dependents():
+    graph = build_task_graph(TASKS_CONFIG)
+    executed = []
+
+    def execute(name, upstream):
+        executed.append(name)
+        if name == "assess":
+            raise RuntimeError("agent failed")
+        return name
+
+    with pytest.raises(RuntimeError, match="agent failed"):
+        DagScheduler(max_workers=1).run(graph, execute)
+    assert "report" not in executed
+
+
+def test_run_task_graph_joins_upstream_outputs_as_context(monkeypatch):
+    contexts, finished = {}, []
+
+    def execute_task(task, context=None):
+        contexts[task.name] = context
+        return f"{task.name} output"
+
+    monkeypatch.setattr(scheduler, "execute_task", execute_task)
+    tasks = {name: SimpleNamespace(name=name, description=name, agent=None) for name in TASKS_CONFIG}
+    outputs = scheduler.run_task_graph(tasks, TASKS_CONFIG, max_workers=2,
+                                       on_task_done=lambda name, output: finished.append(name))
+    assert outputs["report"] == "report output"
+    assert contexts["collect"] == ""
+    assert contexts["report"] == CONTEXT_SEPARATOR.join(["assess output", "background output"])
+    assert sorted(finished) == sorted(TASKS_CONFIG)
@@ -0,0 +1,151 @@
+# tests/test_search_cache.py
+
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from decisioncrew.tools.search_cache import SearchCache, cached_tool
+
+# בלי פרוקסי - הבקשות הולכות ישירות לשרת המקומי
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+class StubSearchServer(ThreadingHTTPServer):
+    """
+    Local search endpoint on 127.0.0.1: GET /search?q=... answers 'results for <q>'.
+    Counts requests per query, sets 'arrived' when a request comes in and holds it
+    until 'release' is set, and answers 503 while 'fail' is set.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.requests = Counter()
+        self.arrived = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def fetcher(self, query):
+        """Returns a fetch() for SearchCache.call that queries this server over HTTP."""
+        url = f"http://127.0.0.1:{self.server_address[1]}/search?" + urllib.parse.urlencode({"q": query})
+
+        def fetch():
+            with _opener.open(url, timeout=5) as response:
+                return response.read().decode("utf-8")
+        return fetch
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)["q"][0]
+        with server._lock:
+            server.requests[query] += 1
+        server.arrived.set()
+        server.release.wait(5)
+        if server.fail:
+            self.send_error(503)
+            return
+        body = f"results for {query}".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StubSearchServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_repeated_and_normalized_queries_hit_the_cache(server):
+    cache = SearchCache()
+    assert cache.call("serper_dev_tool", server.fetcher("Greece Turkey"), "Greece Turkey") == "results for Greece Turkey"
+    assert cache.call("serper_dev_tool", server.fetcher("Greece Turkey"), "  greece   TURKEY? ") == "results for Greece Turkey"
+    assert server.requests["Greece Turkey"] == 1
+    # כלי אחר או פרמטרים אחרים הם מפתח אחר
+    cache.call("website_search_tool", server.fetcher("Greece Turkey"), "Greece Turkey")
+    cache.call("serper_dev_tool", server.fetcher("Greece Turkey"), "Greece Turkey", {"n": "5"})
+    assert server.requests["Greece Turkey"] == 3
+
+
+def test_concurrent_identical_queries_share_one_fetch(server):
+    cache = SearchCache()
+    server.release.clear()
+    results = []
+
+    def search():
+        results.append(cache.call("serper_dev_tool", server.fetcher("q"), "q"))
+
+    leader = threading.Thread(target=search)
+    leader.start()
+    # הבקשה הראשונה תקועה בשרת; כל הקריאות הבאות מגיעות בזמן שהיא בדרך
+    assert server.arrived.wait(5)
+    followers = [threading.Thread(target=search) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    server.release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert results == ["results for q"] * 5
+    assert server.requests["q"] == 1
+    [row] = cache.latency_report()
+    assert (row["calls"], row["fetches"], row["coalesced"] + row["hits"]) == (5, 1, 4)
+
+
+def test_failures_are_not_cached(server):
+    cache = SearchCache()
+    server.fail = True
+    with pytest.raises(urllib.error.HTTPError):
+        cache.call("serper_dev_tool", server.fetcher("q"), "q")
+    server.fail = False
+    assert cache.call("serper_dev_tool", server.fetcher("q"), "q") == "results for q"
+    assert server.requests["q"] == 2
+
+
+def test_entries_and_stats_are_bounded(server):
+    cache = SearchCache(max_entries=3, max_stats=5)
+    for i in range(20):
+        cache.call("serper_dev_tool", server.fetcher(f"q{i}"), f"q{i}")
+    assert len(cache._entries) == 3
+    assert [row["query"] for row in sorted(cache.latency_report(), key=lambda row: row["query"])] == \
+        ["q15", "q16", "q17", "q18", "q19"]
+    # השאילתה הוותיקה ביותר פונתה מהמטמון ותובא שוב
+    cache.call("serper_dev_tool", server.fetcher("q0"), "q0")
+    assert server.requests["q0"] == 2
+
+
+def test_cached_tool_keeps_the_tool_name_and_caches(server, monkeypatch):
+    monkeypatch.setenv("EVIDENCE_STORE", "0")
+    try:
+        from crewai.tools import tool
+    except ImportError:
+        from crewai_tools import tool
+
+    @tool("serper_dev_tool")
+    def stub_search(search_query: str) -> str:
+        """Searches the web (test stub)."""
+        return server.fetcher(search_query)()
+
+    query = "Aegean naval incidents test-only-query"
+    wrapped = cached_tool(stub_search)
+    assert wrapped.name == "serper_dev_tool"
+    assert wrapped._run(search_query=query) == f"results for {query}"
+    assert wrapped._run(search_query=query.lower()) == f"results for {query}"
+    assert server.requests == Counter({query: 1})
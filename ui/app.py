@@ -3,8 +3,7 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
-import pandas as pd
-from io import StringIO
+import shutil
 
 # טעינת משתני סביבה
 load_dotenv() 
@@ -14,6 +13,11 @@ try:
     from decisioncrew.crews.intelligence_crew import IntelligenceCrew
     # 👇 ייבוא חדש לצוות משחקי המלחמה
     from decisioncrew.crews.wargames_crew import WargamesCrew
+    from decisioncrew.ingest.csv_profiler import profile_csv
+    from decisioncrew.tools.csv_index import CsvIndex, content_hash
+    from decisioncrew.crews.wargame_state import GameState
+    from decisioncrew.runtime.jobs import ACTIVE_STATUSES, get_job_runner
+    from decisioncrew.runtime.metrics import serve_metrics
 except ModuleNotFoundError:
     st.error("Could not find the 'decisioncrew' module. Make sure you run streamlit from the project root directory using 'python -m streamlit run ui/app.py'")
     st.stop() # עצירת הריצה אם המודול לא נמצא
@@ -37,22 +41,97 @@ if 'intelligence_report' not in st.session_state:
     st.session_state.intelligence_report = None
 if 'wargame_report' not in st.session_state:
     st.session_state.wargame_report = None
+if 'wargame_batch' not in st.session_state:
+    st.session_state.wargame_batch = None
+if 'wargame_game' not in st.session_state:
+    st.session_state.wargame_game = None
+
+UPLOAD_DIR = os.path.join(".cache", "uploads")
+
+# --- קובץ שהועלה נכתב לדיסק בבלוקים, פעם אחת לכל תוכן; הפרופיל והאינדקס קוראים אותו משם ---
+def stage_upload(uploaded_file):
+    """Streams the upload to .cache/uploads/<content hash>.csv and returns the path (once per upload)."""
+    staged = st.session_state.setdefault('staged_uploads', {})
+    path = staged.get(uploaded_file.file_id)
+    if path and os.path.exists(path):
+        return path
+    uploaded_file.seek(0)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{content_hash(uploaded_file)}.csv")
+    if not os.path.exists(path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            shutil.copyfileobj(uploaded_file, f, 1024 * 1024)
+        os.replace(temp_path, path)
+        uploaded_file.seek(0)
+    staged[uploaded_file.file_id] = path
+    return path
+
+# --- פרופיל CSV (נשמר במטמון לפי הנתיב, שנגזר מתוכן הקובץ, כדי שלא ייסרק מחדש בכל rerun) ---
+@st.cache_data(show_spinner="סורק את קובץ ה-CSV...", max_entries=8)
+def load_csv_profile(csv_path, file_name):
+    return profile_csv(csv_path, name=file_name)
+
+# --- אינדקס שורות של ה-CSV (נבנה פעם אחת לכל תוכן קובץ, נשמר על הדיסק לפי hash) ---
+@st.cache_resource(show_spinner="בונה אינדקס חיפוש לשורות ה-CSV...", max_entries=8)
+def load_csv_index(csv_path, file_name):
+    return CsvIndex.build(csv_path, name=file_name)
+
+# --- תור העבודות: הריצות רצות ברקע, והעמוד רק מציג את ההתקדמות שלהן ---
+# מזהה העבודה נשמר בכתובת (st.query_params), כך שרענון העמוד או חיבור מחדש לא מאבדים את הריצה
+job_runner = get_job_runner()
+# נקודת מדדים בפורמט Prometheus, רק אם הוגדר CREW_METRICS_PORT
+serve_metrics()
+
+JOB_STATUS_LABELS = {
+    "queued": "ממתין בתור",
+    "running": "רץ",
+    "succeeded": "הושלם",
+    "failed": "נכשל",
+    "interrupted": "נקטע (השרת הופעל מחדש)",
+}
+
+@st.fragment(run_every=2)
+def show_job_progress(job_id, title):
+    """מציג את התקדמות העבודה ומתעדכן כל 2 שניות, עד שהעבודה מסתיימת."""
+    job = job_runner.store.get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        st.rerun() # ריצה מלאה של העמוד כדי להציג את התוצאה
+    events = job_runner.store.events(job_id)
+    done_steps = [event for event in events if event["event"] in ("task_done", "branch_done", "turn_done")]
+    st.info(f"{title} - {JOB_STATUS_LABELS[job['status']]} ({len(done_steps)} שלבים הושלמו)... ⏳")
+    for event in done_steps:
+        with st.expander(f"✅ {event['task'] or event['event']}"):
+            st.markdown(wrap_text_rtl(event["text"] or ""), unsafe_allow_html=True)
+
+def show_job(job_id, title):
+    """מחזיר את העבודה אם הסתיימה בהצלחה; אחרת מציג את ההתקדמות או את השגיאה ומחזיר None."""
+    job = job_runner.store.get(job_id)
+    if job is None:
+        st.warning(f"העבודה '{job_id}' לא נמצאה.")
+    elif job["status"] in ACTIVE_STATUSES:
+        show_job_progress(job_id, title)
+    elif job["status"] != "succeeded":
+        st.error(f"{title} - {JOB_STATUS_LABELS[job['status']]}: {job['error'] or ''}")
+    else:
+        return job
+    return None
 
 # --- סרגל צד להעלאות ---
 csv_context_string = None
 with st.sidebar:
     st.header("📂 טעינת קבצי CSV")
     uploaded_file = st.file_uploader("טען קובץ CSV לניתוח:", type=["csv"])
-    st.info("הכותרות ו-90 השורות הראשונות של הקובץ יצורפו אוטומטית לקונטקסט של הסוכנים.")
+    st.info("הקובץ כולו נסרק בחלקים, ותקציר סטטיסטי שלו (סוגי עמודות, ערכים חסרים, התפלגויות, ערכים נפוצים ומגמות בזמן) יצורף אוטומטית לקונטקסט של הסוכנים.")
     if uploaded_file is not None:
         try:
-            string_data = StringIO(uploaded_file.getvalue().decode('utf-8'))
-            df_head = pd.read_csv(string_data, nrows=90)
-            csv_context_string = f"--- START OF UPLOADED CSV DATA ('{uploaded_file.name}') ---\n"
-            csv_context_string += df_head.to_string()
-            csv_context_string += "\n--- END OF UPLOADED CSV DATA ---"
-            st.success(f"קובץ '{uploaded_file.name}' נקרא בהצלחה!")
-            st.dataframe(df_head)
+            # קריאה בחלקים מהעותק שעל הדיסק - בלי להעתיק את כל הקובץ לזיכרון
+            csv_profile = load_csv_profile(stage_upload(uploaded_file), uploaded_file.name)
+            csv_context_string = csv_profile.to_context()
+            st.success(f"קובץ '{uploaded_file.name}' נקרא בהצלחה! ({csv_profile.rows:,} שורות, {csv_profile.seconds:.1f} שניות)")
+            st.dataframe(csv_profile.preview)
+            with st.expander("תקציר הנתונים שיועבר לסוכנים"):
+                st.text(csv_profile.to_text(preview_rows=0))
         except Exception as e:
             st.error(f"שגיאה בקריאת קובץ ה-CSV: {e}")
             csv_context_string = None
@@ -82,6 +161,8 @@ topic_input = st.text_area(
 if st.button("🚀 הפעל ניתוח מודיעין"):
     st.session_state.intelligence_report = None # איפוס דוחות קודמים
     st.session_state.wargame_report = None      # איפוס דוחות קודמים
+    st.session_state.wargame_batch = None
+    st.session_state.wargame_game = None
     result_placeholder = st.empty() 
 
     if not topic_input:
@@ -90,28 +171,37 @@ if st.button("🚀 הפעל ניתוח מודיעין"):
         result_placeholder.error("מפתח OpenAI API לא הוגדר בקובץ .env")
     else:
         try:
-            crew = IntelligenceCrew(workflow_name=selected_workflow)
+            csv_index = None
+            if csv_context_string:
+                csv_index = load_csv_index(stage_upload(uploaded_file), uploaded_file.name)
             run_topic = topic_input
             if csv_context_string:
                  run_topic = f"{topic_input}\n\n{csv_context_string}"
                  st.info(f"מנתח את השאילתה תוך התייחסות לנתונים מקובץ '{uploaded_file.name}'...")
 
-            with st.spinner(f"מעבד את הבקשה באמצעות זרימת עבודה '{selected_workflow}'... זה עשוי לקחת מספר דקות...⏳"):
-                result = crew.run(topic=run_topic) 
-            
-            result_str = str(result)
-            if result_str.startswith("An error occurred"):
-                result_placeholder.error(f"הריצה נכשלה: {result_str}")
-            else: 
-                result_placeholder.empty() 
-                st.success("ניתוח המודיעין הושלם!")
-                # 👇 שמירת הדוח ב-Session State
-                st.session_state.intelligence_report = result_str
+            # שליחת הריצה לתור העבודות ברקע - העמוד לא נחסם עד שהיא מסתיימת
+            job_id = job_runner.submit(
+                "intelligence",
+                workflow_name=selected_workflow,
+                topic=run_topic,
+                csv_index_path=csv_index.path if csv_index else None,
+                csv_name=csv_index.name if csv_index else None,
+            )
+            st.query_params["job"] = job_id
+            st.query_params.pop("wargame_job", None)
             
         except Exception as e:
             result_placeholder.error(f"אירעה שגיאה בלתי צפויה במהלך הריצה: {e}")
             st.exception(e) 
 
+# --- מעקב אחרי ריצת המודיעין (גם אחרי רענון העמוד) ---
+if "job" in st.query_params:
+    intelligence_job = show_job(st.query_params["job"], "ניתוח מודיעין")
+    if intelligence_job and st.session_state.intelligence_report != intelligence_job["result"]:
+        # 👇 שמירת הדוח ב-Session State
+        st.session_state.intelligence_report = intelligence_job["result"]
+        st.success("ניתוח המודיעין הושלם!")
+
 # --- הצגת דוח המודיעין (אם קיים) ---
 if st.session_state.intelligence_report:
     st.markdown("---")
@@ -123,43 +213,117 @@ if st.session_state.intelligence_report:
     st.header("שלב 2: הפעלת סימולציית משחק מלחמה (אופציונלי)")
     st.info("בהתבסס על הדוח שהתקבל, הזן מהלך שברצונך לדמות.")
     
-    wargame_action_input = st.text_input(
-        "הזן את המהלך שלך (למשל, 'הטלת סנקציות כלכליות על מדינה X', 'הזזת כוחות לגבול'):",
-        placeholder="מה אם נבצע תקיפה אווירית מוגבלת?"
-    )
-    
+    wargame_mode = st.radio("מצב סימולציה:", ["מהלך יחיד", "השוואת מהלכים", "משחק רב-שלבי"], horizontal=True)
+
+    if wargame_mode != "השוואת מהלכים":
+        wargame_action_input = st.text_input(
+            "הזן את המהלך שלך (למשל, 'הטלת סנקציות כלכליות על מדינה X', 'הזזת כוחות לגבול'):",
+            placeholder="מה אם נבצע תקיפה אווירית מוגבלת?"
+        )
+        if wargame_mode == "משחק רב-שלבי":
+            wargame_max_turns = st.slider("מספר תורות מקסימלי:", min_value=1, max_value=12, value=6)
+    else:
+        wargame_actions_input = st.text_area(
+            "הזן כמה מהלכים חלופיים, מהלך אחד בכל שורה. כולם ידומו במקביל וידורגו לפי רווח אסטרטגי מול סיכון הסלמה:",
+            height=150,
+            placeholder="הטלת סנקציות כלכליות\nהזזת כוחות לגבול\nפנייה למועצת הביטחון"
+        )
+
     if st.button("👾 הפעל סימולציה"):
         st.session_state.wargame_report = None # איפוס דוח סימולציה קודם
+        st.session_state.wargame_batch = None
+        st.session_state.wargame_game = None
         wargame_placeholder = st.empty()
+        wargame_job_id = None
         
-        if not wargame_action_input:
-            wargame_placeholder.error("אנא הזן מהלך לסימולציה.")
-        else:
-            try:
-                # אתחול צוות משחק המלחמה
-                wargames_crew = WargamesCrew()
-                
-                with st.spinner("מריץ סימולציית תגובה... 🎲"):
-                    # העברת דוח המודיעין והמהלך של המשתמש
-                    wargame_result = wargames_crew.run(
+        try:
+            if wargame_mode == "השוואת מהלכים":
+                actions = [line.strip() for line in wargame_actions_input.splitlines() if line.strip()]
+                if not actions:
+                    wargame_placeholder.error("אנא הזן לפחות מהלך אחד לסימולציה.")
+                else:
+                    wargame_job_id = job_runner.submit(
+                        "wargame_batch",
                         intelligence_context=st.session_state.intelligence_report,
-                        user_action=wargame_action_input
+                        user_actions=actions
                     )
-                
-                result_str = str(wargame_result)
-                if result_str.startswith("An error occurred"):
-                    wargame_placeholder.error(f"הסימולציה נכשלה: {result_str}")
-                else: 
-                    wargame_placeholder.empty() 
-                    st.success("הסימולציה הושלמה!")
-                    # 👇 שמירת דוח הסימולציה
-                    st.session_state.wargame_report = result_str
-                    
-            except Exception as e:
-                wargame_placeholder.error(f"אירעה שגיאה בלתי צפויה במהלך הסימולציה: {e}")
-                st.exception(e)
+            elif not wargame_action_input:
+                wargame_placeholder.error("אנא הזן מהלך לסימולציה.")
+            elif wargame_mode == "משחק רב-שלבי":
+                wargame_job_id = job_runner.submit(
+                    "wargame_turns",
+                    intelligence_context=st.session_state.intelligence_report,
+                    user_action=wargame_action_input,
+                    max_turns=wargame_max_turns
+                )
+            else:
+                # העברת דוח המודיעין והמהלך של המשתמש
+                wargame_job_id = job_runner.submit(
+                    "wargame",
+                    intelligence_context=st.session_state.intelligence_report,
+                    user_action=wargame_action_input
+                )
+            if wargame_job_id:
+                st.query_params["wargame_job"] = wargame_job_id
+        except Exception as e:
+            wargame_placeholder.error(f"אירעה שגיאה בלתי צפויה במהלך הסימולציה: {e}")
+            st.exception(e)
+
+    # --- מעקב אחרי ריצת הסימולציה (גם אחרי רענון העמוד) ---
+    if "wargame_job" in st.query_params:
+        wargame_job = show_job(st.query_params["wargame_job"], "סימולציית משחק מלחמה")
+        if wargame_job and not (st.session_state.wargame_report or st.session_state.wargame_batch or st.session_state.wargame_game):
+            # 👇 שמירת תוצאת הסימולציה לפי סוג הריצה
+            if wargame_job["kind"] == "wargame_batch":
+                st.session_state.wargame_batch = wargame_job["result"]
+            elif wargame_job["kind"] == "wargame_turns":
+                st.session_state.wargame_game = GameState.from_dict(wargame_job["result"])
+            else:
+                st.session_state.wargame_report = wargame_job["result"]
+            st.success("הסימולציה הושלמה!")
 
 # --- הצגת דוח משחק המלחמה (אם קיים) ---
 if st.session_state.wargame_report:
     st.subheader("🕹️ סיכום משחק המלחמה:")
-    st.markdown(wrap_text_rtl(st.session_state.wargame_report), unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(wrap_text_rtl(st.session_state.wargame_report), unsafe_allow_html=True)
+# --- הצגת השוואת המהלכים (אם קיימת) ---
+if st.session_state.wargame_batch:
+    st.subheader("📊 השוואת מהלכים:")
+    st.dataframe([
+        {
+            "דירוג": branch["rank"],
+            "מהלך": branch["action"],
+            "רווח אסטרטגי": branch.get("strategic_gain"),
+            "סיכון הסלמה": branch.get("escalation_risk"),
+            "ציון נטו": branch.get("net_score"),
+            "שגיאה": branch.get("error", ""),
+        }
+        for branch in st.session_state.wargame_batch
+    ], hide_index=True)
+    for branch in st.session_state.wargame_batch:
+        with st.expander(f"#{branch['rank']} - {branch['action']}"):
+            if branch.get("error"):
+                st.error(branch["error"])
+            else:
+                st.markdown(wrap_text_rtl(branch["summary"]), unsafe_allow_html=True)
+
+# --- הצגת המשחק הרב-שלבי (אם קיים) ---
+if st.session_state.wargame_game:
+    game_state = st.session_state.wargame_game
+    stop_reasons = {
+        "escalation": "רמת ההסלמה עברה את הסף",
+        "converged": "המצב התייצב לפי שופט המשחק",
+        "stable": "רמת ההסלמה לא השתנתה במשך כמה תורות",
+        "max_turns": "הגיע למספר התורות המקסימלי",
+    }
+    st.subheader("♟️ משחק רב-שלבי:")
+    st.caption(f"{game_state.turns_played} תורות · רמת הסלמה סופית {game_state.escalation_level:g}/10 · "
+               f"סיבת עצירה: {stop_reasons.get(game_state.stop_reason, game_state.stop_reason)}")
+    st.markdown(wrap_text_rtl(game_state.summary), unsafe_allow_html=True)
+    st.line_chart({"רמת הסלמה": game_state.escalation_history})
+    for entry in game_state.transcript:
+        with st.expander(f"תור {entry['turn']}"):
+            st.markdown("**Red:**")
+            st.markdown(wrap_text_rtl(entry["red"]), unsafe_allow_html=True)
+            st.markdown("**Blue:**")
+            st.markdown(wrap_text_rtl(entry["blue"]), unsafe_allow_html=True)